@@ -7,21 +7,26 @@
 
 import cv2
 import numpy as np
-import pyautogui
-import pydirectinput
-import time
-import threading
-import os
 from typing import Optional, Tuple, List, Dict
+from vision_module import template_matcher, ChangeDetector
+from backend_module import sleep, now
+from input_module import input_source
+from recorder_module import record_frame
+from metrics_module import bot_metrics
+from scheduler_module import spawn, Offload
 
 class AdditionalFunctionsBot:
     """Класс для дополнительных игровых функций"""
     
     def __init__(self):
         self.running = False
-        self.thread = None
+        self.task = None
         self.function_images = {}
         self.confidence = 0.8
+        self.change_detector = ChangeDetector()
+        self.last_result = None
+        self.metrics = bot_metrics('functions')
+        self.input = input_source('functions')
         self.load_function_images()
         
     def load_function_images(self):
@@ -38,53 +43,64 @@ class AdditionalFunctionsBot:
         }
         
         for func_id, filename in functions.items():
-            if os.path.exists(filename):
+            if template_matcher.load(filename, remember_hit=True):
                 self.function_images[func_id] = filename
                 print(f"✅ Загружена функция {func_id}: {filename}")
             else:
                 print(f"⚠️ Не найдена функция {func_id}: {filename}")
+        template_matcher.save_cache()
     
-    def find_function(self, func_id) -> Optional[Tuple[int, int, int, int]]:
-        """Ищет конкретную функцию на экране"""
+    def find_function(self, func_id, frame=None, origin: Tuple[int, int] = (0, 0)) -> Optional[Tuple[int, int, int, int]]:
+        """Ищет конкретную функцию на экране (или на переданном кадре)"""
         if func_id not in self.function_images:
             print(f"Изображение для функции {func_id} не найдено")
             return None
         
         try:
-            location = pyautogui.locateOnScreen(
+            return template_matcher.find(
                 self.function_images[func_id], 
+                frame=frame,
+                origin=origin,
                 confidence=self.confidence
             )
-            if location:
-                return (location.left, location.top, location.width, location.height)
         except Exception as e:
             print(f"Ошибка поиска функции {func_id}: {e}")
         return None
     
-    def find_any_function(self) -> Optional[Tuple[int, int, int, int, int]]:
-        """Ищет любую функцию на экране и возвращает её ID и позицию"""
+    def find_any_function(self, frame=None, origin: Tuple[int, int] = (0, 0)) -> Optional[Tuple[int, int, int, int, int]]:
+        """Ищет любую функцию на экране (или на переданном кадре) и возвращает её ID и позицию"""
+        try:
+            if frame is None:
+                frame, origin = template_matcher.capture()
+            frame = template_matcher.prepare(frame)
+        except Exception as e:
+            print(f"Ошибка захвата экрана: {e}")
+            return None
+        
         for func_id, filename in self.function_images.items():
             try:
-                location = pyautogui.locateOnScreen(
+                location = template_matcher.find(
                     filename, 
+                    frame=frame,
+                    origin=origin,
                     confidence=self.confidence
                 )
                 if location:
-                    return (func_id, location.left, location.top, location.width, location.height)
+                    return (func_id,) + location
             except Exception as e:
                 continue
         return None
     
-    def click_function(self, location: Tuple[int, int, int, int]) -> bool:
-        """Кликает по функции"""
+    def click_function(self, location: Tuple[int, int, int, int], pause: float = 0.5) -> bool:
+        """Кликает по функции (и ждёт pause секунд, пока игра отреагирует)"""
         try:
             # Вычисляем центр изображения
             center_x = location[0] + location[2] // 2
             center_y = location[1] + location[3] // 2
             
             # Кликаем по центру
-            pydirectinput.click(center_x, center_y)
-            time.sleep(0.5)
+            self.input.direct_click(center_x, center_y)
+            sleep(pause)
             return True
         except Exception as e:
             print(f"Ошибка клика по функции: {e}")
@@ -110,45 +126,56 @@ class AdditionalFunctionsBot:
         return None
     
     def run_function_loop(self, target_function: Optional[int] = None, debug: bool = False):
-        """Основной цикл работы с функциями"""
+        """Основной цикл работы с функциями (задача планировщика)"""
         print(f"⚙️ Запуск цикла функций (цель: {target_function or 'любая'})...")
         
         while self.running:
             try:
-                if target_function:
-                    # Ищем конкретную функцию
-                    location = self.find_function(target_function)
-                    if location:
-                        if debug:
-                            print(f"Найдена функция {target_function} в позиции: {location}")
-                        
-                        if self.click_function(location):
-                            print(f"✅ Кликнул по функции {target_function}")
-                            time.sleep(1)
-                    else:
-                        if debug:
-                            print(f"Функция {target_function} не найдена")
+                frame, origin = yield from template_matcher.capture_task()
+                self.metrics.observe('capture', template_matcher.capture_duration)
+                timestamp = now()
+                clicked = None
+                
+                # Сопоставляем шаблоны только если экран изменился
+                with self.metrics.stage('match'):
+                    if self.change_detector.changed(frame):
+                        if target_function:
+                            # Ищем конкретную функцию
+                            location = yield Offload(self.find_function, target_function, frame, origin)
+                            self.last_result = (target_function,) + location if location else None
+                        else:
+                            # Ищем любую функцию
+                            self.last_result = yield Offload(self.find_any_function, frame, origin)
+                    elif debug:
+                        print("Экран не изменился, использую предыдущий результат")
+                
+                result = self.last_result
+                self.metrics.iteration(hit=result is not None)
+                if result:
+                    func_id, x, y, w, h = result
+                    if debug:
+                        print(f"Найдена функция {func_id} в позиции: ({x}, {y}, {w}, {h})")
+                    
+                    request = yield self.input.direct_click(x + w // 2, y + h // 2, wait=False)
+                    if request.error is None:
+                        print(f"✅ Кликнул по функции {func_id}")
+                        clicked = func_id
+                        yield 1.5
                 else:
-                    # Ищем любую функцию
-                    result = self.find_any_function()
-                    if result:
-                        func_id, x, y, w, h = result
-                        if debug:
-                            print(f"Найдена функция {func_id} в позиции: ({x}, {y}, {w}, {h})")
-                        
-                        if self.click_function((x, y, w, h)):
-                            print(f"✅ Кликнул по функции {func_id}")
-                            time.sleep(1)
-                    else:
-                        if debug:
-                            print("Функции не найдены")
+                    if debug:
+                        print(f"Функция {target_function} не найдена" if target_function else "Функции не найдены")
+                
+                record_frame('functions', frame, origin, timestamp, {
+                    'result': result,
+                    'click': clicked,
+                })
                 
                 # Пауза между циклами
-                time.sleep(2)
+                yield 2
                 
             except Exception as e:
                 print(f"Ошибка в цикле функций: {e}")
-                time.sleep(1)
+                yield 1
         
         print("🛑 Цикл функций остановлен")
     
@@ -159,12 +186,9 @@ class AdditionalFunctionsBot:
             return False
         
         self.running = True
-        self.thread = threading.Thread(
-            target=self.run_function_loop, 
-            args=(target_function, debug),
-            daemon=True
-        )
-        self.thread.start()
+        self.change_detector.reset()
+        self.last_result = None
+        self.task = spawn(self.run_function_loop(target_function, debug), "functions")
         print(f"✅ Работа с функциями запущена (цель: {target_function or 'любая'})")
         return True
     
@@ -175,8 +199,9 @@ class AdditionalFunctionsBot:
             return False
         
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=2)
+        if self.task:
+            self.task.cancel()
+            self.task = None
         print("🛑 Работа с функциями остановлена")
         return True
     
@@ -206,7 +231,7 @@ class AdditionalFunctionsBot:
                 
             print(f"🎯 Выполняю функцию {func_id}")
             if self.click_specific_function(func_id):
-                time.sleep(1)
+                sleep(1)
             else:
                 print(f"❌ Не удалось выполнить функцию {func_id}")
                 return False
@@ -5,49 +5,56 @@
 Модуль для анти-афк (предотвращение отключения за неактивность)
 """
 
-import time
 import random
-import pydirectinput
-import threading
+from input_module import input_source, INPUT_BACKGROUND
+from metrics_module import bot_metrics
+from scheduler_module import spawn, PRIORITY_LOW
 
 class AntiAFKBot:
     def __init__(self):
         self.running = False
+        self.task = None
         self.directions = ['w', 'a', 's', 'd']
         self.min_delay = 8
         self.max_delay = 14
+        self.metrics = bot_metrics('anti_afk')
+        self.input = input_source('anti_afk', INPUT_BACKGROUND)
         
     def anti_afk_loop(self):
-        """Основной цикл анти-афк"""
+        """Основной цикл анти-афк (задача планировщика)"""
         print("Анти-афк запущен!")
         
-        while self.running:
-            # Выбираем случайное направление
-            key = random.choice(self.directions)
-            
-            # Нажимаем клавишу
-            pydirectinput.keyDown(key)
-            time.sleep(0.01)  # Очень короткое нажатие
-            pydirectinput.keyUp(key)
-            
-            # Случайная задержка между нажатиями
-            delay = random.uniform(self.min_delay, self.max_delay)
-            time.sleep(delay)
-        
-        print("Анти-афк остановлен!")
+        try:
+            while self.running:
+                # Выбираем случайное направление
+                key = random.choice(self.directions)
+                
+                # Очень короткое нажатие целиком в диспетчере ввода: ждать его не нужно,
+                # а отложено оно будет, пока качалка жмёт пробел
+                self.input.tap(key, 0.01, wait=False)
+                self.metrics.iteration()
+                
+                # Случайная задержка между нажатиями
+                delay = random.uniform(self.min_delay, self.max_delay)
+                yield delay
+        finally:
+            print("Анти-афк остановлен!")
     
     def start(self):
         """Запускает анти-афк"""
         if not self.running:
             self.running = True
-            thread = threading.Thread(target=self.anti_afk_loop, daemon=True)
-            thread.start()
+            self.task = spawn(self.anti_afk_loop(), "anti_afk", PRIORITY_LOW)
             return True
         return False
     
     def stop(self):
         """Останавливает анти-афк"""
         self.running = False
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        self.input.cancel_pending()
 
 # Глобальный экземпляр бота анти-афк
 anti_afk_bot = AntiAFKBot()
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль бэкендов ввода-вывода - источник кадров экрана, приёмник ввода и часы.
+
+Боты не обращаются к mss, pyautogui, pydirectinput и keyboard напрямую, а
+вызывают функции этого модуля. Настоящие бэкенды оборачивают эти библиотеки,
+а поддельные (экран из numpy-кадров, запись ввода, виртуальные часы) позволяют
+запускать и профилировать циклы ботов без игры и рабочего стола Windows.
+"""
+
+import time
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from collections import namedtuple
+from typing import Optional, Sequence, Dict, List, Tuple
+
+# Действие ввода, записанное поддельным приёмником
+InputAction = namedtuple('InputAction', ['timestamp', 'action', 'args'])
+
+class ScreenSource(ABC):
+    """Источник кадров экрана.
+
+    open() вызывается в потоке захвата и возвращает прямоугольник монитора
+    {'left', 'top', 'width', 'height'}; grab() возвращает кадр BGRA (h, w, 4)
+    указанной области в экранных координатах. Источник без open/grab/size
+    не создаётся (TypeError при конструировании, а не посреди прогона).
+    """
+
+    # False - кадры выдаются по одному на каждое чтение подписчика, без
+    # ожидания реального времени между кадрами
+    realtime = True
+    # True - кадры настоящего рабочего стола (на нём можно искать окно игры)
+    desktop = False
+
+    @abstractmethod
+    def open(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def grab(self, area: Dict[str, int]) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def size(self) -> Tuple[int, int]:
+        """Возвращает (ширина, высота) монитора"""
+
+    def next_timestamp(self) -> float:
+        """Время кадра, который вернёт следующий grab() (по умолчанию - текущее время часов)"""
+        return now()
+
+    def close(self):
+        pass
+
+class MssScreenSource(ScreenSource):
+    """Захват экрана через mss (дескриптор создаётся в потоке захвата)"""
+
+    desktop = True
+
+    def __init__(self, monitor_index: int = 1):
+        self.monitor_index = monitor_index
+        self.sct = None
+
+    def open(self) -> Dict[str, int]:
+        import mss
+        self.sct = mss.mss()
+        return dict(self.sct.monitors[self.monitor_index])
+
+    def grab(self, area: Dict[str, int]) -> np.ndarray:
+        shot = self.sct.grab(area)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(area['height'], area['width'], 4)
+
+    def size(self) -> Tuple[int, int]:
+        import mss
+        with mss.mss() as sct:
+            monitor = sct.monitors[self.monitor_index]
+        return monitor['width'], monitor['height']
+
+    def close(self):
+        if self.sct is not None:
+            self.sct.close()
+            self.sct = None
+
+class FakeScreenSource(ScreenSource):
+    """Экран в памяти: по очереди отдаёт заданные numpy-кадры (BGR или BGRA).
+
+    Каждый захват продвигает часы на frame_interval, поэтому с виртуальными
+    часами время кадров идёт так же, как при заданной частоте экрана.
+    Время кадра совпадает с временем часов сразу после захвата.
+    """
+
+    realtime = False
+
+    def __init__(self, frames: Sequence[np.ndarray], left: int = 0, top: int = 0,
+                 frame_interval: Optional[float] = 1 / 60, loop: bool = True):
+        self.frames = [self._to_bgra(frame) for frame in frames]
+        if not self.frames:
+            raise ValueError("Нужен хотя бы один кадр")
+        self.left = left
+        self.top = top
+        self.frame_interval = frame_interval
+        self.loop = loop
+        self.index = 0
+        self.grabs = 0
+
+    @staticmethod
+    def _to_bgra(frame: np.ndarray) -> np.ndarray:
+        if frame.ndim == 2:
+            frame = np.dstack([frame, frame, frame])
+        if frame.shape[2] == 3:
+            alpha = np.full(frame.shape[:2] + (1,), 255, dtype=np.uint8)
+            frame = np.concatenate([frame, alpha], axis=2)
+        return np.ascontiguousarray(frame, dtype=np.uint8)
+
+    def open(self) -> Dict[str, int]:
+        height, width = self.frames[0].shape[:2]
+        return {'left': self.left, 'top': self.top, 'width': width, 'height': height}
+
+    def next_timestamp(self) -> float:
+        if self.frame_interval:
+            sleep(self.frame_interval)
+        return now()
+
+    def grab(self, area: Dict[str, int]) -> np.ndarray:
+        frame = self.frames[self.index]
+        self.grabs += 1
+        if self.loop:
+            self.index = (self.index + 1) % len(self.frames)
+        else:
+            self.index = min(self.index + 1, len(self.frames) - 1)
+
+        x0, y0 = area['left'] - self.left, area['top'] - self.top
+        return frame[y0:y0 + area['height'], x0:x0 + area['width']]
+
+    def size(self) -> Tuple[int, int]:
+        height, width = self.frames[0].shape[:2]
+        return width, height
+
+class InputSink(ABC):
+    """Приёмник ввода: клавиатура и мышь (все методы обязательны)"""
+
+    @abstractmethod
+    def press(self, key: str):
+        """Нажимает и отпускает клавишу (DirectInput, с паузой библиотеки)"""
+
+    @abstractmethod
+    def key_down(self, key: str):
+        ...
+
+    @abstractmethod
+    def key_up(self, key: str):
+        ...
+
+    @abstractmethod
+    def send(self, key: str):
+        """Мгновенно нажимает и отпускает клавишу, без пауз"""
+
+    @abstractmethod
+    def click(self, x: int, y: int):
+        """Клик мышью через SendInput (pyautogui) - так кликает рулетка"""
+
+    @abstractmethod
+    def direct_click(self, x: int, y: int):
+        """Клик мышью через DirectInput (pydirectinput) - так кликают токарка,
+        номера и функции"""
+
+    @abstractmethod
+    def hotkey(self, *keys: str):
+        ...
+
+    @abstractmethod
+    def write(self, text: str):
+        ...
+
+class DesktopInputSink(InputSink):
+    """Настоящий ввод: pydirectinput для клавиш игры и кликов direct_click,
+    keyboard для быстрых нажатий, pyautogui для click, сочетаний клавиш и ввода
+    текста - каждый бот кликает той же библиотекой, что и до бэкендов.
+    Библиотеки импортируются при первом использовании."""
+
+    def __init__(self):
+        self._modules: Dict[str, object] = {}
+
+    def _module(self, name: str):
+        module = self._modules.get(name)
+        if module is None:
+            module = __import__(name)
+            self._modules[name] = module
+        return module
+
+    def press(self, key: str):
+        self._module('pydirectinput').press(key)
+
+    def key_down(self, key: str):
+        self._module('pydirectinput').keyDown(key)
+
+    def key_up(self, key: str):
+        self._module('pydirectinput').keyUp(key)
+
+    def send(self, key: str):
+        self._module('keyboard').send(key)
+
+    def click(self, x: int, y: int):
+        self._module('pyautogui').click(x, y)
+
+    def direct_click(self, x: int, y: int):
+        self._module('pydirectinput').click(x, y)
+
+    def hotkey(self, *keys: str):
+        self._module('pyautogui').hotkey(*keys)
+
+    def write(self, text: str):
+        self._module('pyautogui').typewrite(text)
+
+class FakeInputSink(InputSink):
+    """Записывает действия ввода с отметкой времени часов"""
+
+    def __init__(self):
+        self.actions: List[InputAction] = []
+        self.lock = threading.Lock()
+
+    def _record(self, action: str, *args):
+        with self.lock:
+            self.actions.append(InputAction(now(), action, args))
+
+    def press(self, key: str):
+        self._record('press', key)
+
+    def key_down(self, key: str):
+        self._record('key_down', key)
+
+    def key_up(self, key: str):
+        self._record('key_up', key)
+
+    def send(self, key: str):
+        self._record('send', key)
+
+    def click(self, x: int, y: int):
+        self._record('click', x, y)
+
+    def direct_click(self, x: int, y: int):
+        self._record('direct_click', x, y)
+
+    def hotkey(self, *keys: str):
+        self._record('hotkey', *keys)
+
+    def write(self, text: str):
+        self._record('write', text)
+
+    def count(self, action: str, *args) -> int:
+        """Считает записанные действия (с указанными аргументами, если заданы)"""
+        with self.lock:
+            return sum(1 for item in self.actions
+                       if item.action == action and (not args or item.args == args))
+
+    def clear(self):
+        with self.lock:
+            self.actions.clear()
+
+class Clock:
+    """Системные часы (монотонное время в секундах)"""
+
+    # False - время идёт только через sleep(), ждать его в реальном времени не нужно
+    realtime = True
+
+    def time(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+class FakeClock(Clock):
+    """Виртуальные часы: sleep() сразу сдвигает время, не дожидаясь его.
+
+    Время общее для всех потоков, поэтому паузы ботов не замедляют прогон.
+    """
+
+    realtime = False
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self.lock = threading.Lock()
+
+    def time(self) -> float:
+        with self.lock:
+            return self.now
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            with self.lock:
+                self.now += seconds
+        # Отдаём GIL другим потокам, как это сделал бы настоящий sleep
+        time.sleep(0)
+
+    def advance_to(self, timestamp: float):
+        """Переводит часы вперёд до timestamp (назад время не идёт)"""
+        with self.lock:
+            self.now = max(self.now, timestamp)
+
+# Текущие бэкенды
+screen_source: ScreenSource = MssScreenSource()
+input_sink: InputSink = DesktopInputSink()
+clock: Clock = Clock()
+
+def use_backends(source: Optional[ScreenSource] = None, sink: Optional[InputSink] = None,
+                 new_clock: Optional[Clock] = None):
+    """Заменяет бэкенды (незаданные остаются прежними) и перезапускает захват экрана"""
+    global screen_source, input_sink, clock
+    if new_clock is not None:
+        clock = new_clock
+    if sink is not None:
+        input_sink = sink
+    if source is not None:
+        screen_source = source
+        from capture_module import screen_capture
+        screen_capture.set_source(source)
+
+def use_fake_backends(frames: Sequence[np.ndarray], **kwargs) -> Tuple[FakeScreenSource, FakeInputSink, FakeClock]:
+    """Подключает поддельный экран, запись ввода и виртуальные часы"""
+    source, sink, fake_clock = FakeScreenSource(frames, **kwargs), FakeInputSink(), FakeClock()
+    use_backends(source, sink, fake_clock)
+    return source, sink, fake_clock
+
+def get_screen_source() -> ScreenSource:
+    """Возвращает текущий источник кадров"""
+    return screen_source
+
+def get_input_sink() -> InputSink:
+    """Возвращает текущий приёмник ввода"""
+    return input_sink
+
+# Функции, которыми пользуются боты (всегда обращаются к текущему бэкенду)
+def now() -> float:
+    """Текущее время часов в секундах"""
+    return clock.time()
+
+def sleep(seconds: float):
+    """Пауза по часам"""
+    clock.sleep(seconds)
+
+def press(key: str):
+    input_sink.press(key)
+
+def key_down(key: str):
+    input_sink.key_down(key)
+
+def key_up(key: str):
+    input_sink.key_up(key)
+
+def send(key: str):
+    input_sink.send(key)
+
+def click(x: int, y: int):
+    input_sink.click(x, y)
+
+def direct_click(x: int, y: int):
+    input_sink.direct_click(x, y)
+
+def hotkey(*keys: str):
+    input_sink.hotkey(*keys)
+
+def write(text: str):
+    input_sink.write(text)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль замеров производительности - время горячих путей распознавания на
+синтетических (и записанных) кадрах 1080p, 1440p и 4K со сравнением с базовой линией.
+
+Запуск:
+    python benchmark_module.py                      # замер и сравнение с benchmark_baseline.json
+    python benchmark_module.py --save-baseline      # сохранить результаты как базовую линию
+    python benchmark_module.py --frames records/    # добавить записанные кадры (png/jpg)
+    python benchmark_module.py --gate               # проверка перед слиянием: без базовой линии - ошибка
+
+Код возврата 1, если какой-то путь стал медленнее базовой линии больше допуска,
+и 2 в режиме --gate, если базовой линии (или замера в ней) нет - сравнивать не с чем.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+import backend_module
+
+RESOLUTIONS = {
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4K': (3840, 2160),
+}
+RESULTS_PATH = "benchmark_results.json"
+BASELINE_PATH = "benchmark_baseline.json"
+
+# Допуск замедления медианы и p99 (p99 шумнее)
+MEDIAN_TOLERANCE = 0.2
+P99_TOLERANCE = 0.5
+
+# Область качалки в кадре 1080p: (x, y, ширина, высота)
+KACHALKA_AREA = (775, 567, 353, 382)
+
+def _paste(frame: np.ndarray, image: np.ndarray, x: int, y: int):
+    """Вставляет изображение BGR в кадр BGRA"""
+    height, width = image.shape[:2]
+    frame[y:y + height, x:x + width, :3] = image
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Кадр BGRA с плавным шумным фоном, всеми шаблонами ботов и кругами качалки,
+    отмасштабированными под разрешение так же, как интерфейс игры"""
+    rng = np.random.default_rng(seed)
+    scale = height / 1080
+
+    coarse = rng.integers(20, 120, size=(height // 60 + 1, width // 60 + 1, 3), dtype=np.uint8)
+    background = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(0, 12, size=(height, width, 3), dtype=np.uint8)
+    frame = np.full((height, width, 4), 255, dtype=np.uint8)
+    frame[:, :, :3] = cv2.add(background, noise)
+
+    def place(path: str, x: int, y: int):
+        image = cv2.imread(path)
+        if image is None:
+            return
+        if scale != 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        _paste(frame, image, int(x * scale), int(y * scale))
+
+    for i, number in enumerate(range(1, 7)):
+        place(f"number_{number}.jpg", 120 + i * 90, 120)
+    for i, name in enumerate(["1.png", "2.png", "3.png", "4.png"]):
+        place(name, 120 + i * 140, 300)
+    place("Tokarka.png", 1300, 200)
+    place("food.png", 1500, 700)
+
+    # Круги качалки: зелёная зона и белый круг рядом с ней
+    kx, ky, kw, kh = (int(value * scale) for value in KACHALKA_AREA)
+    gx, gy = kx + kw // 2, ky + kh // 2
+    cv2.circle(frame, (gx, gy), int(60 * scale), (0, 200, 0, 255), max(1, int(6 * scale)))
+    cv2.circle(frame, (gx - int(45 * scale), gy + int(20 * scale)), int(30 * scale),
+               (255, 255, 255, 255), max(1, int(4 * scale)))
+    return frame
+
+def recorded_frames(directory: str) -> Dict[str, np.ndarray]:
+    """Загружает записанные кадры (png/jpg) из папки как BGRA"""
+    frames = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(('.png', '.jpg', '.jpeg')):
+            continue
+        image = cv2.imread(os.path.join(directory, name))
+        if image is not None:
+            frames[f"rec:{os.path.splitext(name)[0]}"] = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    return frames
+
+def measure(func: Callable[[], object], runs: int = 50, warmup: int = 3,
+            budget: float = 5.0) -> Dict[str, float]:
+    """Вызывает func, возвращает медиану, p99 (мс) и пропускную способность (вызовов/с).
+    Замер прерывается раньше, если занял больше budget секунд"""
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    started = time.perf_counter()
+    for _ in range(runs):
+        call_started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - call_started)
+        if time.perf_counter() - started > budget and len(timings) >= 5:
+            break
+    total = time.perf_counter() - started
+
+    samples = np.array(timings) * 1000
+    return {
+        'median_ms': float(np.median(samples)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'throughput': len(timings) / total,
+        'runs': len(timings),
+    }
+
+class BenchmarkSuite:
+    """Набор замеров горячих путей ботов на одном кадре"""
+
+    def __init__(self, runs: int = 50, budget: float = 5.0):
+        self.runs = runs
+        self.budget = budget
+        self.results: Dict[str, Dict[str, float]] = {}
+
+        # Боты не должны видеть настоящий экран и слать ввод во время замеров
+        backend_module.use_fake_backends([synthetic_frame(*RESOLUTIONS['1080p'])])
+
+        from vision_module import template_matcher
+        import number_module
+        import additional_functions_module
+        import tokarka_module
+        import kachalka_module
+        from capture_module import encode_png
+        import screenshot_module
+
+        self.matcher = template_matcher
+        self.number_bot = number_module.number_bot
+        self.functions_bot = additional_functions_module.additional_bot
+        self.tokarka_bot = tokarka_module.tokarka_bot
+        self.kachalka = kachalka_module
+        self.kachalka_bot = kachalka_module.kachalka_bot
+        self.encode_png = encode_png
+        self.screenshot = screenshot_module
+
+    def _forget_hits(self):
+        """Сбрасывает окна последних попаданий, чтобы замерить полный поиск"""
+        for template in self.matcher.templates.values():
+            template.last_hit = None
+
+    def _cases(self, frame: np.ndarray) -> List[Tuple[str, Callable[[], object], bool]]:
+        """Замеряемые пути: (имя, вызов, сбрасывать ли попадания перед каждым вызовом)"""
+        scale = frame.shape[0] / 1080
+        kx, ky, kw, kh = (int(value * scale) for value in KACHALKA_AREA)
+        kachalka_frame = np.ascontiguousarray(frame[ky:ky + kh, kx:kx + kw])
+        kachalka_bgr = cv2.cvtColor(kachalka_frame, cv2.COLOR_BGRA2BGR)
+
+        def food():
+            image = self.matcher.prepare(frame)
+            for food_image in self.kachalka_bot.food_images:
+                self.matcher.find(food_image, frame=image, confidence=self.kachalka_bot.food_confidence)
+
+        return [
+            ('numbers', lambda: self.number_bot.detect_numbers(frame), False),
+            ('functions', lambda: self.functions_bot.find_any_function(frame), False),
+            ('functions.full', lambda: self.functions_bot.find_any_function(frame), True),
+            ('tokarka', lambda: self.tokarka_bot.find_tokarka(frame), False),
+            ('tokarka.full', lambda: self.tokarka_bot.find_tokarka(frame), True),
+            ('food', food, False),
+            ('circle.white', lambda: self.kachalka_bot.get_circle(
+                kachalka_bgr, self.kachalka.WHITE_LOWER, self.kachalka.WHITE_UPPER), False),
+            ('circle.green', lambda: self.kachalka_bot.get_circle(
+                kachalka_bgr, self.kachalka.GREEN_LOWER, self.kachalka.GREEN_UPPER), False),
+            ('circle.detector', lambda: self.kachalka_bot.circle_detector.detect(kachalka_frame), False),
+            ('screenshot.encode', lambda: self.encode_png(frame), False),
+            ('screenshot.jpeg', lambda: self.screenshot.encode_image(
+                frame, self.screenshot.ScreenshotOptions()), False),
+        ]
+
+    def run_frame(self, label: str, frame: np.ndarray):
+        """Замеряет все пути на кадре; масштаб шаблонов определяется заново"""
+        self.matcher.scale = None
+        self.matcher.scale_hint = frame.shape[0] / 1080
+        self._forget_hits()
+
+        for name, func, forget_hits in self._cases(frame):
+            if forget_hits:
+                call = lambda func=func: (self._forget_hits(), func())
+            else:
+                call = func
+            runs = self.runs if not name.startswith('screenshot.') else max(5, self.runs // 5)
+            result = measure(call, runs=runs, budget=self.budget)
+            self.results[f"{label}/{name}"] = result
+            print(f"  {label:>8} {name:<18} median {result['median_ms']:8.2f} мс   "
+                  f"p99 {result['p99_ms']:8.2f} мс   {result['throughput']:8.1f} /с")
+
+    def run(self, frames: Dict[str, np.ndarray]) -> Dict[str, Dict[str, float]]:
+        """Замеряет все пути на всех кадрах, не трогая кэш шаблонов на диске"""
+        cache, self.matcher.cache = self.matcher.cache, None
+        scale = self.matcher.scale
+        try:
+            for label, frame in frames.items():
+                self.run_frame(label, frame)
+        finally:
+            self.matcher.cache = cache
+            self.matcher.scale = scale
+        return self.results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            median_tolerance: float = MEDIAN_TOLERANCE,
+            p99_tolerance: float = P99_TOLERANCE) -> List[str]:
+    """Возвращает описания путей, замедлившихся относительно базовой линии"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key, tolerance in (('median_ms', median_tolerance), ('p99_ms', p99_tolerance)):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {base[key]:.2f} -> {result[key]:.2f} мс "
+                                   f"(+{(result[key] / base[key] - 1) * 100:.0f}%)")
+    return regressions
+
+def save_results(path: str, results: Dict[str, Dict[str, float]]):
+    """Сохраняет результаты замеров в JSON"""
+    data = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+        },
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def load_results(path: str) -> Optional[Dict[str, Dict[str, float]]]:
+    """Читает результаты замеров из JSON (None, если файла нет)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Замеры горячих путей распознавания")
+    parser.add_argument('--resolutions', nargs='*', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--frames', help="папка с записанными кадрами (png/jpg)")
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="сохранить результаты как базовую линию")
+    parser.add_argument('--tolerance', type=float, default=MEDIAN_TOLERANCE,
+                        help="допустимое замедление медианы (доля)")
+    parser.add_argument('--gate', action='store_true',
+                        help="завершаться с ошибкой, если базовой линии или замера в ней нет")
+    args = parser.parse_args(argv)
+
+    frames = {label: synthetic_frame(*RESOLUTIONS[label]) for label in args.resolutions}
+    if args.frames:
+        frames.update(recorded_frames(args.frames))
+
+    print("⏱️ Замеры горячих путей...")
+    results = BenchmarkSuite(runs=args.runs).run(frames)
+    save_results(args.output, results)
+    print(f"📄 Результаты сохранены в {args.output}")
+
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print(f"📌 Базовая линия сохранена в {args.baseline}")
+        return 0
+
+    baseline = load_results(args.baseline)
+    if baseline is None:
+        print(f"⚠️ БАЗОВОЙ ЛИНИИ {args.baseline} НЕТ - замедления не проверены. "
+              f"Сохраните её на эталонной машине с --save-baseline")
+        return 2 if args.gate else 0
+
+    missing = sorted(set(results) - set(baseline))
+    if missing:
+        print(f"⚠️ В базовой линии нет замеров: {', '.join(missing)} - они не проверены")
+        if args.gate:
+            return 2
+
+    regressions = compare(results, baseline, args.tolerance, max(P99_TOLERANCE, args.tolerance))
+    if regressions:
+        print("❌ Замедление относительно базовой линии:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+
+    print("✅ Замедлений относительно базовой линии нет")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль захвата экрана - один общий поток захвата с постоянным источником кадров
+(mss или поддельный экран) и кольцевым буфером, на области которого подписываются боты
+"""
+
+import time
+import threading
+from io import BytesIO
+import numpy as np
+from typing import Optional, Tuple, List, Dict, Callable
+import backend_module
+from backend_module import ScreenSource
+
+# Область экрана: (left, top, width, height)
+Region = Tuple[int, int, int, int]
+
+class Subscription:
+    """Подписка потребителя на область экрана"""
+
+    def __init__(self, service: "ScreenCapture", region: Optional[Region], fps: Optional[float]):
+        self.service = service
+        self.region = region
+        self.fps = fps  # None - разовый захват как можно скорее
+        self.seq = 0
+        self.timestamp = 0.0
+        self.duration = 0.0  # Сколько длился захват последнего прочитанного кадра
+        self.waiting = False  # Потребитель ждёт кадр в read()
+
+    def read(self, timeout: float = 1.0, copy: bool = False) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """Ждёт кадр новее последнего прочитанного и возвращает (кадр BGRA, левый верхний угол)"""
+        return self.service.read(self, timeout, copy)
+
+    def wait(self, timeout: float = 1.0) -> bool:
+        """Ждёт кадр новее последнего прочитанного, не забирая его"""
+        return self.service.wait(self, timeout)
+
+    def set_fps(self, fps: float):
+        """Меняет желаемую частоту кадров подписки"""
+        self.service.set_fps(self, fps)
+
+    def intact(self) -> bool:
+        """Проверяет, что слот последнего прочитанного кадра ещё не перезаписан
+        (кадр, прочитанный без копирования, после обработки сверяют этой проверкой)"""
+        return self.service.intact(self)
+
+    def close(self):
+        """Отписывается от захвата"""
+        self.service.unsubscribe(self)
+
+class ScreenCapture:
+    """Общий сервис захвата экрана.
+
+    Поток захвата держит открытый источник кадров, снимает объединённую область
+    всех подписок с максимальной запрошенной частотой и копирует кадр в заранее
+    выделенный слот кольцевого буфера. Потребители получают представления (views)
+    на слот без копирования; представление остаётся валидным, пока буфер не
+    обернётся (slots кадров), поэтому медленным потребителям нужен read(copy=True),
+    а читающие без копирования после обработки проверяют Subscription.intact() и
+    отбрасывают кадр, слот которого уже начали перезаписывать.
+    Источник не в реальном времени (поддельный экран, повтор записи) снимает кадр
+    только когда подписчик ждёт его в read(), без пауз между кадрами, поэтому
+    виртуальное время не уходит вперёд, пока бот обрабатывает предыдущий кадр.
+    """
+
+    def __init__(self, slots: int = 3, source: Optional[ScreenSource] = None):
+        self.slots = slots
+        self.source = source or backend_module.get_screen_source()
+        self.generation = 0  # Меняется при смене источника, старый поток завершается
+        self.condition = threading.Condition()
+        self.subscriptions: List[Subscription] = []
+        self.listeners: Dict[Subscription, Callable[[], None]] = {}  # Разовые уведомления о кадре
+        self.thread = None
+
+        # Кольцевой буфер (выделяется в потоке захвата под размер монитора)
+        self.monitor: Optional[Dict[str, int]] = None
+        self.buffers: List[np.ndarray] = []
+        self.slot_seq = [0] * slots
+        self.slot_time = [0.0] * slots
+        self.slot_duration = [0.0] * slots
+        self.slot_bbox: List[Optional[Tuple[int, int, int, int]]] = [None] * slots
+        self.seq = 0
+
+        # Статистика
+        self.started_at = 0.0
+        self.capture_time = 0.0
+
+    def _ensure_started(self):
+        """Запускает поток захвата при первой подписке (вызывается под блокировкой)"""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._capture_loop,
+                                           args=(self.source, self.generation),
+                                           name="capture", daemon=True)
+            self.thread.start()
+
+    def set_source(self, source: ScreenSource):
+        """Переключает захват на другой источник кадров"""
+        with self.condition:
+            self.source = source
+            self.generation += 1
+            thread, self.thread = self.thread, None
+            self.monitor = None
+            self.condition.notify_all()
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+
+        with self.condition:
+            if self.subscriptions:
+                self._ensure_started()
+
+    def screen_size(self) -> Tuple[int, int]:
+        """Возвращает (ширина, высота) монитора источника"""
+        return self.source.size()
+
+    def subscribe(self, region: Optional[Region] = None, fps: Optional[float] = 30.0) -> Subscription:
+        """Подписывается на область экрана (None - весь монитор)"""
+        with self.condition:
+            subscription = Subscription(self, region, fps)
+            subscription.seq = self.seq
+            self.subscriptions.append(subscription)
+            self._ensure_started()
+            self.condition.notify_all()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Удаляет подписку"""
+        with self.condition:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+            self.listeners.pop(subscription, None)
+            self.condition.notify_all()
+
+    def set_fps(self, subscription: Subscription, fps: float):
+        """Меняет частоту подписки и будит поток захвата"""
+        with self.condition:
+            subscription.fps = fps
+            self.condition.notify_all()
+
+    def _local_bbox(self, region: Optional[Region]) -> Optional[Tuple[int, int, int, int]]:
+        """Переводит область экрана в (x0, y0, x1, y1) внутри монитора"""
+        width, height = self.monitor['width'], self.monitor['height']
+        if region is None:
+            return (0, 0, width, height)
+
+        left, top, region_width, region_height = region
+        x0 = max(0, left - self.monitor['left'])
+        y0 = max(0, top - self.monitor['top'])
+        x1 = min(width, x0 + region_width)
+        y1 = min(height, y0 + region_height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return (x0, y0, x1, y1)
+
+    def _plan(self, lockstep: bool = False) -> Tuple[Optional[Tuple[int, int, int, int]], float, bool]:
+        """Вычисляет объединённую область, интервал захвата и нужен ли кадр немедленно
+        (lockstep - кадр нужен, только когда подписчик ждёт его в read())"""
+        bbox = None
+        max_fps = 0.0
+        immediate = False
+        for subscription in self.subscriptions:
+            local = self._local_bbox(subscription.region)
+            if local is None:
+                continue
+            if bbox is None:
+                bbox = local
+            else:
+                bbox = (min(bbox[0], local[0]), min(bbox[1], local[1]),
+                        max(bbox[2], local[2]), max(bbox[3], local[3]))
+
+            if lockstep:
+                immediate = immediate or (subscription.waiting and subscription.seq == self.seq)
+            elif subscription.fps is None:
+                immediate = immediate or subscription.seq == self.seq
+            else:
+                max_fps = max(max_fps, subscription.fps)
+
+        interval = 1.0 / max_fps if max_fps > 0 else 0.1
+        return bbox, interval, immediate
+
+    def _capture_loop(self, source: ScreenSource, generation: int):
+        """Поток захвата: источник открывается в этом потоке (дескриптор mss
+        нельзя использовать из других потоков)"""
+        monitor = source.open()
+        try:
+            with self.condition:
+                if generation != self.generation:
+                    return
+                self.monitor = dict(monitor)
+                self.buffers = [np.zeros((monitor['height'], monitor['width'], 4), dtype=np.uint8)
+                                for _ in range(self.slots)]
+                self.started_at = time.perf_counter()
+                self.condition.notify_all()
+
+            next_time = 0.0
+            while True:
+                with self.condition:
+                    if generation != self.generation:
+                        return
+                    bbox, interval, immediate = self._plan(lockstep=not source.realtime)
+                    now = time.perf_counter()
+                    if bbox is None or (not immediate and not source.realtime):
+                        self.condition.wait()
+                        continue
+                    if not immediate and now < next_time:
+                        self.condition.wait(next_time - now)
+                        continue
+                    area = {
+                        'left': self.monitor['left'] + bbox[0],
+                        'top': self.monitor['top'] + bbox[1],
+                        'width': bbox[2] - bbox[0],
+                        'height': bbox[3] - bbox[1],
+                    }
+                    slot = (self.seq + 1) % self.slots
+                    target = self.buffers[slot]
+                    self.slot_seq[slot] = 0  # Слот перезаписывается - его старый кадр больше не цел
+
+                x0, y0, x1, y1 = bbox
+                started = time.perf_counter()
+                timestamp = source.next_timestamp()
+                np.copyto(target[y0:y1, x0:x1], source.grab(area))
+
+                with self.condition:
+                    if generation != self.generation:
+                        return
+                    self.seq += 1
+                    self.slot_seq[slot] = self.seq
+                    self.slot_time[slot] = timestamp
+                    self.slot_duration[slot] = time.perf_counter() - started
+                    self.slot_bbox[slot] = bbox
+                    self.capture_time += self.slot_duration[slot]
+                    self.condition.notify_all()
+                    callbacks = self._pop_listeners()
+
+                for callback in callbacks:
+                    callback()
+                next_time = started + interval
+        finally:
+            source.close()
+
+    def _covers(self, bbox: Optional[Tuple[int, int, int, int]], local: Tuple[int, int, int, int]) -> bool:
+        """Проверяет, что захваченная область содержит область подписки"""
+        return (bbox is not None and bbox[0] <= local[0] and bbox[1] <= local[1]
+                and bbox[2] >= local[2] and bbox[3] >= local[3])
+
+    def _ready(self, subscription: Subscription) -> Optional[Tuple[int, int, int, int]]:
+        """Область подписки в мониторе, если для неё есть непрочитанный кадр
+        (вызывается под блокировкой)"""
+        if self.monitor is None or self.seq <= subscription.seq:
+            return None
+        local = self._local_bbox(subscription.region)
+        if local is None or not self._covers(self.slot_bbox[self.seq % self.slots], local):
+            return None
+        return local
+
+    def _pop_listeners(self) -> List[Callable[[], None]]:
+        """Забирает уведомления подписок, для которых появился кадр (под блокировкой)"""
+        callbacks = []
+        for subscription in [s for s in self.listeners if self._ready(s) is not None]:
+            callbacks.append(self.listeners.pop(subscription))
+            subscription.waiting = False
+        return callbacks
+
+    def notify(self, subscription: Subscription, callback: Callable[[], None]):
+        """Вызывает callback один раз, когда для подписки появится новый кадр (сразу,
+        если он уже есть). Вызов идёт из потока захвата, поэтому callback должен быть быстрым"""
+        with self.condition:
+            ready = self._ready(subscription) is not None
+            if not ready:
+                self.listeners[subscription] = callback
+                subscription.waiting = True
+                self.condition.notify_all()  # Источнику без реального времени нужен кадр
+        if ready:
+            callback()
+
+    def cancel_notify(self, subscription: Subscription):
+        """Отменяет уведомление о кадре"""
+        with self.condition:
+            if self.listeners.pop(subscription, None) is not None:
+                subscription.waiting = False
+
+    def wait(self, subscription: Subscription, timeout: float = 1.0) -> bool:
+        """Ждёт кадр новее последнего прочитанного подпиской (False по таймауту)"""
+        deadline = time.perf_counter() + timeout
+        with self.condition:
+            while self._ready(subscription) is None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False
+                if self.monitor is not None and self._local_bbox(subscription.region) is None:
+                    return False  # Область целиком за пределами монитора
+                subscription.waiting = True
+                self.condition.notify_all()  # Источнику без реального времени нужен кадр
+                self.condition.wait(remaining)
+                subscription.waiting = subscription in self.listeners
+            return True
+
+    def intact(self, subscription: Subscription) -> bool:
+        """Цел ли ещё кадр, прочитанный подпиской последним"""
+        with self.condition:
+            return subscription.seq > 0 and self.slot_seq[subscription.seq % self.slots] == subscription.seq
+
+    def read(self, subscription: Subscription, timeout: float = 1.0,
+             copy: bool = False) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """Возвращает свежий кадр области подписки или None по таймауту"""
+        with self.condition:
+            if not self.wait(subscription, timeout):
+                return None
+            local = self._ready(subscription)
+            slot = self.seq % self.slots
+
+            subscription.seq = self.seq
+            subscription.timestamp = self.slot_time[slot]
+            subscription.duration = self.slot_duration[slot]
+            x0, y0, x1, y1 = local
+            frame = self.buffers[slot][y0:y1, x0:x1]
+            origin = (self.monitor['left'] + x0, self.monitor['top'] + y0)
+
+        if copy:
+            frame = frame.copy()
+        return frame, origin
+
+    def grab(self, region: Optional[Region] = None, timeout: float = 1.0) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Разовый захват: возвращает собственную копию кадра области"""
+        subscription = self.subscribe(region, fps=None)
+        try:
+            result = subscription.read(timeout, copy=True)
+        finally:
+            subscription.close()
+
+        if result is None:
+            raise TimeoutError("Не удалось получить кадр экрана")
+        return result
+
+    def get_stats(self) -> Dict[str, float]:
+        """Возвращает количество кадров, среднюю частоту и время захвата"""
+        with self.condition:
+            frames = self.seq
+            elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+            return {
+                'frames': frames,
+                'fps': frames / elapsed if elapsed else 0.0,
+                'avg_capture_ms': self.capture_time / frames * 1000 if frames else 0.0,
+                'subscriptions': len(self.subscriptions),
+            }
+
+# Глобальный экземпляр сервиса захвата
+screen_capture = ScreenCapture()
+
+def subscribe(region: Optional[Region] = None, fps: Optional[float] = 30.0) -> Subscription:
+    """Подписывается на область экрана"""
+    return screen_capture.subscribe(region, fps)
+
+def grab(region: Optional[Region] = None, timeout: float = 1.0) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Разовый захват области экрана"""
+    return screen_capture.grab(region, timeout)
+
+def screen_size() -> Tuple[int, int]:
+    """Возвращает (ширина, высота) монитора"""
+    return screen_capture.screen_size()
+
+def encode_png(frame: np.ndarray, name: str = 'screenshot.png') -> BytesIO:
+    """Кодирует кадр BGRA (или BGR) в PNG для отправки в Telegram"""
+    from PIL import Image
+    image = Image.fromarray(np.ascontiguousarray(frame[:, :, 2::-1]))
+    bio = BytesIO()
+    bio.name = name
+    image.save(bio, 'PNG')
+    bio.seek(0)
+    return bio
+
+def get_capture_stats() -> Dict[str, float]:
+    """Возвращает статистику захвата"""
+    return screen_capture.get_stats()
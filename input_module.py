@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль диспетчера ввода - все нажатия и клики ботов проходят через один поток.
+
+Боты не вызывают приёмник ввода сами, а ставят действия в общую очередь с
+приоритетом через свой источник ввода (input_source). Поток диспетчера выполняет
+их по одному: первым - самое важное (пробел качалки), среди равных - поставленное
+раньше. Одинаковое действие, которое ещё ждёт в очереди, не ставится второй раз, а
+сливается с уже ждущим. Фоновые действия (движения анти-афк) откладываются, пока
+недавно было критичное нажатие, чтобы не попасть в середину подхода качалки, а
+нажатие с удержанием (tap) выполняется целиком, без вклинивания других действий.
+У каждого действия есть время постановки в очередь и выполнения по часам бэкенда,
+по ним считается задержка ввода для каждого источника.
+
+Задачи планировщика не ждут выполнения в своём потоке (это остановило бы всех ботов),
+а отдают действие планировщику: request = yield self.input.press('e', wait=False).
+"""
+
+import heapq
+import itertools
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import backend_module
+from backend_module import now
+from metrics_module import Histogram, bot_metrics, _ms
+
+# Приоритеты ввода (меньше - важнее)
+INPUT_CRITICAL = 0     # Критичные ко времени нажатия (пробел качалки)
+INPUT_NORMAL = 10      # Обычные действия ботов
+INPUT_BACKGROUND = 20  # Фоновые действия (анти-афк)
+
+# Сколько секунд после критичного нажатия откладываются фоновые действия
+GUARD_SECONDS = 1.0
+# Сколько секунд ждать выполнения действия по умолчанию
+WAIT_TIMEOUT = 2.0
+# Сколько последних выполненных действий хранить
+HISTORY_SIZE = 256
+# Действия, которые не сливаются с одинаковыми ждущими (повтор ввода текста - намеренный)
+NO_MERGE = ('write',)
+
+_order = itertools.count()
+
+class InputRequest:
+    """Действие ввода в очереди диспетчера"""
+
+    def __init__(self, source: str, action: str, args: Tuple, priority: int, hold: float = 0.0):
+        self.source = source
+        self.action = action
+        self.args = args
+        self.priority = priority
+        self.hold = hold  # Удержание клавиши для tap (секунды)
+        self.order = next(_order)
+        self.queued_at = now()
+        self.started_at: Optional[float] = None
+        self.executed_at: Optional[float] = None
+        self.merged = 0  # Сколько одинаковых действий слилось с этим
+        self.deferred = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+        self.callbacks: List[Callable[[], Any]] = []
+        self.lock = threading.Lock()
+
+    def key(self) -> Tuple:
+        # Действия разных источников не сливаются: иначе одно из них пропадёт из их статистики
+        return (self.source, self.action, self.args, self.hold)
+
+    def wait(self, timeout: Optional[float] = WAIT_TIMEOUT) -> bool:
+        """Ждёт выполнения действия"""
+        return self.done.wait(timeout)
+
+    def on_done(self, callback: Callable[[], Any]):
+        """Вызывает callback после выполнения или отмены действия (сразу, если уже)"""
+        with self.lock:
+            if not self.done.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def finish(self):
+        """Отмечает действие завершённым и вызывает ждущих"""
+        with self.lock:
+            self.done.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def queue_delay(self) -> Optional[float]:
+        """Время ожидания в очереди (секунды часов бэкенда)"""
+        return None if self.started_at is None else self.started_at - self.queued_at
+
+    def latency(self) -> Optional[float]:
+        """Время от постановки в очередь до конца выполнения"""
+        return None if self.executed_at is None else self.executed_at - self.queued_at
+
+class SourceStats:
+    """Статистика ввода одного источника"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.executed = 0
+        self.merged = 0
+        self.deferred = 0
+        self.cancelled = 0
+        self.queue_delay = Histogram()
+        self.latency = Histogram()
+
+class InputDispatcher:
+    """Очередь ввода с приоритетами и поток, который её выполняет"""
+
+    def __init__(self, guard: float = GUARD_SECONDS):
+        self.guard = guard
+        self.condition = threading.Condition()
+        self.heap: List[Tuple[int, int, InputRequest]] = []
+        self.pending: Dict[Tuple, InputRequest] = {}
+        self.thread = None
+        self.last_critical: Optional[float] = None
+        self.history: deque = deque(maxlen=HISTORY_SIZE)
+        self.stats: Dict[str, SourceStats] = {}
+
+    def _ensure_started(self):
+        """Запускает поток диспетчера при первом действии (вызывается под блокировкой)"""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="input", daemon=True)
+            self.thread.start()
+
+    def _source_stats(self, source: str) -> SourceStats:
+        stats = self.stats.get(source)
+        if stats is None:
+            stats = self.stats[source] = SourceStats()
+        return stats
+
+    def submit(self, source: str, action: str, args: Tuple = (), priority: int = INPUT_NORMAL,
+               hold: float = 0.0, wait: bool = True, timeout: Optional[float] = WAIT_TIMEOUT) -> InputRequest:
+        """Ставит действие в очередь и (если wait) ждёт его выполнения.
+        Если такое же действие уже ждёт в очереди, возвращается оно"""
+        request = InputRequest(source, action, tuple(args), priority, hold)
+        with self.condition:
+            self._ensure_started()
+            stats = self._source_stats(source)
+            stats.submitted += 1
+            if priority <= INPUT_CRITICAL:
+                self.last_critical = request.queued_at
+
+            existing = None if action in NO_MERGE else self.pending.get(request.key())
+            if existing is not None:
+                existing.merged += 1
+                stats.merged += 1
+                if priority < existing.priority:
+                    # Старая запись в куче станет устаревшей и будет пропущена
+                    existing.priority = priority
+                    heapq.heappush(self.heap, (priority, existing.order, existing))
+                request = existing
+            else:
+                self.pending[request.key()] = request
+                heapq.heappush(self.heap, (priority, request.order, request))
+            self.condition.notify_all()
+
+        if wait and threading.current_thread() is not self.thread:
+            request.wait(timeout)
+        return request
+
+    def cancel_source(self, source: str) -> int:
+        """Снимает с очереди ещё не начатые действия источника, возвращает их число"""
+        cancelled = []
+        with self.condition:
+            for key, request in list(self.pending.items()):
+                if request.source == source:
+                    request.cancelled = True
+                    del self.pending[key]
+                    cancelled.append(request)
+            if cancelled:
+                self._source_stats(source).cancelled += len(cancelled)
+                self.condition.notify_all()
+        for request in cancelled:
+            request.finish()
+        return len(cancelled)
+
+    def _next(self) -> InputRequest:
+        """Ждёт и возвращает следующее действие (под блокировкой снимает его с очереди)"""
+        with self.condition:
+            while True:
+                while self.heap:
+                    priority, _, request = self.heap[0]
+                    if request.cancelled or request.started_at is not None or priority != request.priority:
+                        heapq.heappop(self.heap)
+                    else:
+                        break
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+
+                priority, _, request = self.heap[0]
+                if priority >= INPUT_BACKGROUND and self.last_critical is not None:
+                    remaining = self.last_critical + self.guard - now()
+                    if remaining > 0:
+                        # Всё более важное уже выполнено - фоновое ждёт конца окна
+                        if not request.deferred:
+                            request.deferred = True
+                            self._source_stats(request.source).deferred += 1
+                        # Виртуальное время двигают другие потоки, поэтому проверяем его чаще
+                        self.condition.wait(remaining if backend_module.clock.realtime else 0.005)
+                        continue
+
+                heapq.heappop(self.heap)
+                if self.pending.get(request.key()) is request:
+                    del self.pending[request.key()]
+                request.started_at = now()
+                return request
+
+    def _execute(self, request: InputRequest):
+        """Выполняет действие через текущий приёмник ввода"""
+        sink = backend_module.input_sink
+        try:
+            if request.action == 'tap':
+                key = request.args[0]
+                sink.key_down(key)
+                try:
+                    backend_module.sleep(request.hold)
+                finally:
+                    sink.key_up(key)
+            else:
+                getattr(sink, request.action)(*request.args)
+        except Exception as e:
+            request.error = e
+            print(f"Ошибка ввода {request.action}{request.args} от {request.source}: {e}")
+        request.executed_at = now()
+
+        with self.condition:
+            if request.priority <= INPUT_CRITICAL:
+                self.last_critical = request.executed_at
+            self.history.append(request)
+            stats = self._source_stats(request.source)
+            stats.executed += 1
+            stats.queue_delay.observe(request.queue_delay())
+            stats.latency.observe(request.latency())
+        bot_metrics(request.source).observe('input', request.latency())
+        request.finish()
+
+    def _run(self):
+        while True:
+            self._execute(self._next())
+
+    def get_history(self) -> List[InputRequest]:
+        """Последние выполненные действия, старые сначала"""
+        with self.condition:
+            return list(self.history)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Статистика по источникам: число действий, слитых, отложенных и задержки"""
+        with self.condition:
+            return {source: {
+                'submitted': stats.submitted,
+                'executed': stats.executed,
+                'merged': stats.merged,
+                'deferred': stats.deferred,
+                'cancelled': stats.cancelled,
+                'queue_p50': stats.queue_delay.quantile(0.5),
+                'queue_p99': stats.queue_delay.quantile(0.99),
+                'latency_p50': stats.latency.quantile(0.5),
+                'latency_p99': stats.latency.quantile(0.99),
+            } for source, stats in self.stats.items()}
+
+    def summary(self) -> str:
+        """Компактная сводка для /stats: по строке на источник ввода"""
+        lines = []
+        for source, stats in sorted(self.get_stats().items()):
+            if not stats['executed']:
+                continue
+            lines.append(
+                f"⌨️ {source}: {stats['executed']} действий, слито {stats['merged']}, "
+                f"отложено {stats['deferred']}, очередь {_ms(stats['queue_p50'])}/"
+                f"{_ms(stats['queue_p99'])} мс, ввод {_ms(stats['latency_p50'])}/"
+                f"{_ms(stats['latency_p99'])} мс")
+        return "\n".join(lines)
+
+class InputSource:
+    """Ввод от имени одного источника (бота) с приоритетом по умолчанию.
+    Каждый метод возвращает InputRequest; при wait=True - уже выполненный.
+    Задачи планировщика передают wait=False и отдают запрос через yield"""
+
+    def __init__(self, dispatcher: InputDispatcher, name: str, priority: int = INPUT_NORMAL):
+        self.dispatcher = dispatcher
+        self.name = name
+        self.priority = priority
+
+    def submit(self, action: str, *args, priority: Optional[int] = None, hold: float = 0.0,
+               wait: bool = True) -> InputRequest:
+        return self.dispatcher.submit(self.name, action, args,
+                                      self.priority if priority is None else priority, hold, wait)
+
+    def press(self, key: str, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        return self.submit('press', key, priority=priority, wait=wait)
+
+    def key_down(self, key: str, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        return self.submit('key_down', key, priority=priority, wait=wait)
+
+    def key_up(self, key: str, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        return self.submit('key_up', key, priority=priority, wait=wait)
+
+    def tap(self, key: str, hold: float, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        """Нажимает клавишу и отпускает через hold секунд, без других действий между ними"""
+        return self.submit('tap', key, priority=priority, hold=hold, wait=wait)
+
+    def send(self, key: str, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        return self.submit('send', key, priority=priority, wait=wait)
+
+    def click(self, x: int, y: int, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        return self.submit('click', x, y, priority=priority, wait=wait)
+
+    def direct_click(self, x: int, y: int, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        return self.submit('direct_click', x, y, priority=priority, wait=wait)
+
+    def hotkey(self, *keys: str, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        return self.submit('hotkey', *keys, priority=priority, wait=wait)
+
+    def write(self, text: str, priority: Optional[int] = None, wait: bool = True) -> InputRequest:
+        return self.submit('write', text, priority=priority, wait=wait)
+
+    def cancel_pending(self) -> int:
+        """Снимает с очереди ещё не выполненные действия источника"""
+        return self.dispatcher.cancel_source(self.name)
+
+# Глобальный диспетчер ввода
+input_dispatcher = InputDispatcher()
+
+def input_source(name: str, priority: int = INPUT_NORMAL) -> InputSource:
+    """Возвращает источник ввода с заданным приоритетом по умолчанию"""
+    return InputSource(input_dispatcher, name, priority)
+
+def get_input_stats() -> Dict[str, Dict[str, Any]]:
+    """Возвращает статистику ввода по источникам"""
+    return input_dispatcher.get_stats()
+
+def get_summary() -> str:
+    """Возвращает сводку ввода для /stats"""
+    return input_dispatcher.summary()
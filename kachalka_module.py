@@ -6,52 +6,349 @@
 """
 
 import time
+import math
+from collections import deque
 import cv2
 import numpy as np
-import pyautogui
-import pydirectinput
-import keyboard
-from PIL import Image
-import mss
+from vision_module import template_matcher, center, to_bgr
+from capture_module import screen_capture
+from backend_module import sleep, now
+from input_module import input_source, INPUT_CRITICAL, INPUT_NORMAL
+from recorder_module import record_frame
+from metrics_module import bot_metrics
+from scheduler_module import spawn, every, WaitFrame, Offload, PRIORITY_HIGH, PRIORITY_LOW
+from window_module import game_window
+
+# Измеренные области кругов качалки (x1, y1, x2, y2) в координатах игры (эталонное окно
+# 1920x1080) по масштабу окна, на котором каждая измерена. Интерфейс мини-игры при другом
+# разрешении смещается не строго пропорционально, поэтому берётся область, измеренная
+# при ближайшем масштабе, а не одна область, растянутая на все разрешения
+KACHALKA_RECTS = {
+    1.0: (775, 567, 1128, 949),  # 1920x1080
+    1440 / 1080: tuple(v * 1080 / 1440 for v in (1100, 950, 1450, 1300)),  # 2560x1440
+}
+
+# Диапазоны HSV для белого и зеленого кругов
+WHITE_LOWER, WHITE_UPPER = np.array([0, 0, 200]), np.array([180, 30, 255])
+GREEN_LOWER, GREEN_UPPER = np.array([40, 50, 50]), np.array([80, 255, 255])
+
+def contour_circle(mask, min_area=100):
+    """Находит круг по самому большому контуру маски"""
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    
+    if contours:
+        largest_contour = max(contours, key=cv2.contourArea)
+        if cv2.contourArea(largest_contour) > min_area:
+            (x, y), radius = cv2.minEnclosingCircle(largest_contour)
+            return int(x), int(y), int(radius)
+    
+    return None
+
+class CircleDetector:
+    """Детектор кругов качалки без выделения памяти на каждый кадр.
+    
+    Кадр один раз переводится в HSV в заранее выделенный буфер, обе маски
+    строятся через inRange на месте, а центр и радиус считаются по моментам
+    внутри ограничивающего прямоугольника маски. Для кольца с радиусами R и r
+    сумма дисперсий равна (R² + r²) / 2, а площадь pi * (R² - r²), откуда
+    внешний радиус R² = дисперсия + площадь / (2 * pi). Если форма пятна не
+    похожа на круг или кольцо, используются контуры. Круг по моментам сверяется
+    с ограничивающим прямоугольником маски (у целого кольца центры и радиусы
+    совпадают): если белый круг закрыл часть зелёного кольца или на маске есть
+    посторонние пятна, центр тяжести смещается, и тогда тоже используются контуры -
+    результат не отличается от старого поиска больше чем на fit_tolerance пикселей.
+    """
+    
+    def __init__(self, min_area=100, isotropy=0.2, ring_tolerance=0.1, fit_tolerance=1.5):
+        self.min_area = min_area
+        self.isotropy = isotropy  # Допустимая анизотропия разброса точек
+        self.ring_tolerance = ring_tolerance  # Допуск для внутреннего радиуса
+        self.fit_tolerance = fit_tolerance  # Допустимое расхождение с прямоугольником маски (пикс)
+        self.shape = None
+        
+        # Статистика
+        self.moment_hits = 0
+        self.contour_fallbacks = 0
+    
+    def _allocate(self, shape):
+        """Выделяет буферы под размер кадра"""
+        height, width = shape
+        self.shape = shape
+        self.hsv = np.empty((height, width, 3), dtype=np.uint8)
+        self.white_mask = np.empty((height, width), dtype=np.uint8)
+        self.green_mask = np.empty((height, width), dtype=np.uint8)
+    
+    def detect(self, frame):
+        """Находит белый и зеленый круги на кадре (BGR или BGRA)"""
+        if frame.shape[:2] != self.shape:
+            self._allocate(frame.shape[:2])
+        
+        # BGR2HSV принимает и BGRA, поэтому альфа-канал не нужно отбрасывать отдельно
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self.hsv)
+        cv2.inRange(self.hsv, WHITE_LOWER, WHITE_UPPER, dst=self.white_mask)
+        cv2.inRange(self.hsv, GREEN_LOWER, GREEN_UPPER, dst=self.green_mask)
+        
+        return self.circle_from_mask(self.white_mask), self.circle_from_mask(self.green_mask)
+    
+    def circle_from_mask(self, mask):
+        """Вычисляет центр и внешний радиус по моментам маски"""
+        left, top, width, height = cv2.boundingRect(mask)
+        if width * height <= self.min_area:
+            return None
+        
+        # Маска хранит 0/255, поэтому m00 - это площадь, умноженная на 255
+        moments = cv2.moments(mask[top:top + height, left:left + width])
+        area = moments['m00'] / 255
+        if area <= self.min_area:
+            return None
+        
+        var_x = moments['mu20'] / moments['m00']
+        var_y = moments['mu02'] / moments['m00']
+        cov = moments['mu11'] / moments['m00']
+        spread = var_x + var_y
+        
+        # Вытянутое пятно, дуга или несколько пятен - форма неоднозначна
+        ambiguous = (abs(var_x - var_y) > self.isotropy * spread
+                     or abs(cov) > self.isotropy * spread)
+        
+        half_area = area / (2 * math.pi)
+        inner_sq = spread - half_area
+        if ambiguous or inner_sq < -self.ring_tolerance * spread:
+            self.contour_fallbacks += 1
+            return contour_circle(mask, self.min_area)
+        
+        x = left + moments['m10'] / moments['m00']
+        y = top + moments['m01'] / moments['m00']
+        radius = math.sqrt(spread + half_area)
+        
+        # Круг по моментам должен совпасть с прямоугольником маски
+        if (abs(x - (left + (width - 1) / 2)) > self.fit_tolerance
+                or abs(y - (top + (height - 1) / 2)) > self.fit_tolerance
+                or abs(radius - max(width, height) / 2) > self.fit_tolerance):
+            self.contour_fallbacks += 1
+            return contour_circle(mask, self.min_area)
+        
+        self.moment_hits += 1
+        return int(x), int(y), int(radius)
+
+class MotionTracker:
+    """Отслеживает положение белого круга по кадрам и предсказывает,
+    когда он войдет в зеленую зону"""
+    
+    def __init__(self, history=6, min_samples=3):
+        self.samples = deque(maxlen=history)  # (время кадра, x, y)
+        self.min_samples = min_samples
+    
+    def reset(self):
+        """Забывает историю движения"""
+        self.samples.clear()
+    
+    def update(self, timestamp, x, y):
+        """Добавляет положение круга на кадре с указанным временем"""
+        if self.samples and timestamp <= self.samples[-1][0]:
+            return
+        self.samples.append((timestamp, x, y))
+    
+    def velocity(self):
+        """Оценивает скорость (пикс/с) методом наименьших квадратов"""
+        if len(self.samples) < self.min_samples:
+            return None
+        
+        t = np.array([sample[0] for sample in self.samples])
+        t -= t.mean()
+        denominator = float(np.dot(t, t))
+        if denominator <= 0:
+            return None
+        
+        xs = np.array([sample[1] for sample in self.samples], dtype=np.float64)
+        ys = np.array([sample[2] for sample in self.samples], dtype=np.float64)
+        return float(np.dot(t, xs) / denominator), float(np.dot(t, ys) / denominator)
+    
+    def time_to_enter(self, x, y, gx, gy, limit):
+        """Время (с) от последнего кадра до момента, когда расстояние до центра
+        зеленого круга станет меньше limit; None - если круг туда не движется"""
+        dx, dy = x - gx, y - gy
+        c = dx * dx + dy * dy - limit * limit
+        if c <= 0:
+            return 0.0
+        
+        velocity = self.velocity()
+        if velocity is None:
+            return None
+        
+        vx, vy = velocity
+        a = vx * vx + vy * vy
+        b = 2 * (dx * vx + dy * vy)
+        discriminant = b * b - 4 * a * c
+        if a < 1e-6 or discriminant < 0:
+            return None
+        
+        eta = (-b - math.sqrt(discriminant)) / (2 * a)
+        return eta if eta >= 0 else None
+
+class FramePacer:
+    """Адаптивная частота кадров: редкий опрос, пока кругов нет на экране,
+    и максимальная частота, как только появляется белый или зеленый круг"""
+    
+    def __init__(self, idle_fps=5, active_fps=100, hold=1.0):
+        self.idle_fps = idle_fps
+        self.active_fps = active_fps
+        self.hold = hold  # Сколько секунд держать максимальную частоту после последнего круга
+        self.target_fps = idle_fps
+        self.achieved_fps = 0.0
+        self.last_active = 0.0
+        self.last_tick = None
+    
+    def reset(self):
+        """Возвращает пейсер в режим ожидания"""
+        self.target_fps = self.idle_fps
+        self.achieved_fps = 0.0
+        self.last_active = 0.0
+        self.last_tick = None
+    
+    def update(self, active):
+        """Учитывает очередной кадр и возвращает целевую частоту"""
+        tick = now()
+        if active:
+            self.last_active = tick
+        
+        self.target_fps = self.active_fps if tick - self.last_active < self.hold else self.idle_fps
+        
+        if self.last_tick is not None and tick > self.last_tick:
+            instant = 1.0 / (tick - self.last_tick)
+            self.achieved_fps = instant if self.achieved_fps == 0 else 0.9 * self.achieved_fps + 0.1 * instant
+        self.last_tick = tick
+        return self.target_fps
+    
+    def get_stats(self):
+        """Возвращает целевую и фактическую частоту кадров"""
+        return {'target_fps': self.target_fps, 'achieved_fps': self.achieved_fps}
+
+def benchmark_circle_detection(frames=300, size=(382, 353)):
+    """Сравнивает скорость старого поиска кругов и детектора на синтетических кадрах"""
+    rng = np.random.default_rng(0)
+    height, width = size
+    samples = []
+    for _ in range(16):
+        frame = np.full((height, width, 3), 30, dtype=np.uint8)
+        gx, gy = int(rng.integers(120, width - 120)), int(rng.integers(120, height - 120))
+        cv2.circle(frame, (gx, gy), 60, (0, 200, 0), 6)
+        wx, wy = gx + int(rng.integers(-40, 40)), gy + int(rng.integers(-40, 40))
+        cv2.circle(frame, (wx, wy), 30, (255, 255, 255), 4)
+        samples.append(frame)
+    
+    def legacy(frame, lower, upper):
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        return contour_circle(cv2.inRange(hsv, lower, upper))
+    
+    # Старый путь: по конвертации в HSV и контурам на каждый из двух кругов
+    start = time.perf_counter()
+    for i in range(frames):
+        legacy(samples[i % len(samples)], WHITE_LOWER, WHITE_UPPER)
+        legacy(samples[i % len(samples)], GREEN_LOWER, GREEN_UPPER)
+    legacy_fps = frames / (time.perf_counter() - start)
+    
+    detector = CircleDetector()
+    start = time.perf_counter()
+    for i in range(frames):
+        detector.detect(samples[i % len(samples)])
+    detector_fps = frames / (time.perf_counter() - start)
+    
+    # Наибольшее расхождение с кругами старого поиска (x, y или радиус, пикс)
+    deviation = 0
+    for sample in samples:
+        found = detector.detect(sample)
+        expected = (legacy(sample, WHITE_LOWER, WHITE_UPPER), legacy(sample, GREEN_LOWER, GREEN_UPPER))
+        for circle, reference in zip(found, expected):
+            if circle and reference:
+                deviation = max(deviation, max(abs(a - b) for a, b in zip(circle, reference)))
+    
+    print(f"Старый поиск: {legacy_fps:.0f} FPS")
+    print(f"Детектор:     {detector_fps:.0f} FPS (x{detector_fps / legacy_fps:.1f}, "
+          f"по моментам {detector.moment_hits}, по контурам {detector.contour_fallbacks}, "
+          f"расхождение до {deviation} пикс)")
+    return legacy_fps, detector_fps
 
 class KachalkaBot:
     def __init__(self):
         self.running = False
         self.debug = False
-        self.screen_w, self.screen_h = pyautogui.size()
-        
-        # Определяем координаты в зависимости от разрешения
-        if self.screen_w > 2000 and self.screen_h > 1100:
-            self.x1, self.y1, self.x2, self.y2 = 1100, 950, 1450, 1300
-            print("Использую координаты для 1920x1080+")
-        else:
-            self.x1, self.y1, self.x2, self.y2 = 775, 567, 1128, 949
-            print("Использую координаты для меньших разрешений")
-        
-        self.region = (self.x1, self.y1, self.x2, self.y2)
+        self.task = None
+        self.capture_fps = 100
+        self.pacer = FramePacer(active_fps=self.capture_fps)
+        self.subscription = None
+        self.circle_detector = CircleDetector()
         self.threshold = 5
         self.green_radius_offset = 6
         self.inside = False
-        self.last_e_press = 0
-        self.last_food_check = 0
+        
+        # Предсказание момента нажатия пробела
+        self.tracker = MotionTracker()
+        self.frame_time = 0.0
+        self.frame_origin = (0, 0)
+        self.capture_duration = 0.0  # Длительность захвата последнего кадра (с)
+        self.torn_frames = 0  # Кадры, слот которых перезаписали до конца обработки
+        self.press_duration = 0.0  # Время в press_space за итерацию: ожидание момента и отправка (с)
+        self.metrics = bot_metrics('kachalka')
+        self.input = input_source('kachalka', INPUT_CRITICAL)
+        self.input_latency = 0.01  # Скользящее среднее задержки отправки нажатия
+        self.last_space_press = 0.0
+        self.press_cooldown = 0.5
+        
+        # Таймеры планировщика: E каждые 15 секунд, проверка еды каждые 120 секунд
+        self.e_interval = 15
+        self.food_interval = 120
+        self.e_timer = None
+        self.food_timer = None
         
         # Настройки для поиска еды
         self.food_images = ['food.png', 'food_1.png']
         self.food_confidence = 0.85
+        for food_img in self.food_images:
+            if not template_matcher.load(food_img):
+                print(f"⚠️ Не найдено изображение еды: {food_img}")
+        template_matcher.save_cache()
+        
+    @property
+    def region(self):
+        """Область кругов на экране (x1, y1, x2, y2) по текущей калибровке окна игры"""
+        transform = game_window.get()
+        scale = min(KACHALKA_RECTS, key=lambda measured: abs(measured - transform.scale))
+        return transform.rect(*KACHALKA_RECTS[scale])
+    
+    def capture_frame(self):
+        """Возвращает свежий кадр (BGRA) области качалки без копирования"""
+        if self.subscription is not None:
+            result = self.subscription.read()
+            if result is None:
+                return None
+            frame, self.frame_origin = result
+            self.frame_time = self.subscription.timestamp
+            self.capture_duration = self.subscription.duration
+            return frame
         
-    def capture_screen(self, region):
-        """Захватывает экран в указанной области"""
-        with mss.mss() as sct:
-            screenshot = sct.grab(region)
-            img = Image.frombytes('RGB', screenshot.size, screenshot.rgb)
-            return cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+        x1, y1, x2, y2 = self.region
+        self.frame_time = now()
+        started = time.perf_counter()
+        frame, self.frame_origin = screen_capture.grab((x1, y1, x2 - x1, y2 - y1))
+        self.capture_duration = time.perf_counter() - started
+        return frame
+    
+    def capture_screen(self, region=None):
+        """Захватывает экран в указанной области через общий сервис захвата"""
+        if region is None:
+            frame = self.capture_frame()
+        else:
+            x1, y1, x2, y2 = region
+            frame, _ = screen_capture.grab((x1, y1, x2 - x1, y2 - y1))
+        return to_bgr(frame) if frame is not None else None
     
     def find_image(self, template_path, confidence=0.8):
         """Ищет изображение на экране"""
         try:
-            location = pyautogui.locateOnScreen(template_path, confidence=confidence)
+            location = template_matcher.find(template_path, confidence=confidence)
             if location:
-                return pyautogui.center(location)
+                return center(location)
             return None
         except:
             return None
@@ -60,40 +357,102 @@ class KachalkaBot:
         """Находит круг на изображении по цвету"""
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
         mask = cv2.inRange(hsv, lower_color, upper_color)
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if contours:
-            largest_contour = max(contours, key=cv2.contourArea)
-            if cv2.contourArea(largest_contour) > 100:
-                (x, y), radius = cv2.minEnclosingCircle(largest_contour)
-                return int(x), int(y), int(radius)
-        
-        return None
+        return contour_circle(mask)
     
     def check_food(self):
-        """Проверяет наличие еды на экране"""
+        """Проверяет наличие еды на экране (задача планировщика: found = yield from ...).
+        Поиск идёт в фоновом потоке, чтобы не задерживать кадры качалки"""
+        frame, origin = yield from template_matcher.capture_task()
+        return (yield Offload(self.find_food, frame, origin))
+    
+    def find_food(self, frame, origin=(0, 0)):
+        """Ищет еду на кадре"""
+        image = template_matcher.prepare(frame)
         for food_img in self.food_images:
-            food_loc = self.find_image(food_img, confidence=self.food_confidence)
+            food_loc = template_matcher.find(food_img, frame=image, origin=origin,
+                                             confidence=self.food_confidence)
             if food_loc:
                 print(f"Найдена еда: {food_img}")
                 return True
         return False
     
     def eat_food(self):
-        """Использует еду"""
+        """Использует еду (задача планировщика)"""
         print("Используем еду...")
-        keyboard.press_and_release('0')
-        time.sleep(1)
-        keyboard.press_and_release('e')
-        self.last_e_press = time.time()
+        yield self.input.send('0', INPUT_NORMAL, wait=False)
+        yield 1
+        yield from self.press_e()
+        
+        # E только что нажата - следующее нажатие по таймеру через полный интервал
+        if self.e_timer is not None:
+            self.e_timer.delay(self.e_interval)
+    
+    def food_check(self):
+        """Таймер еды: проверяет еду и ест, если она есть"""
+        if (yield from self.check_food()):
+            yield from self.eat_food()
     
     def press_e(self):
-        """Нажимает клавишу E"""
-        keyboard.press_and_release('e')
-        self.last_e_press = time.time()
+        """Нажимает клавишу E (задача планировщика)"""
+        yield self.input.send('e', INPUT_NORMAL, wait=False)
+    
+    def press_space(self, press_at=None):
+        """Нажимает пробел (в момент press_at по часам бэкенда, если он задан)
+        и обновляет оценку задержки отправки ввода. Ожидание момента идёт прямо в
+        задаче качалки (отдать планировщику поток - значит рискнуть опоздать с
+        нажатием), поэтому оно ограничено интервалом кадра на максимальной частоте
+        и не задерживает другие задачи дольше одного кадра. Саму отправку задача
+        ждёт через yield, и поток ввода работает, пока планировщик занят другими"""
+        entered = time.perf_counter()
+        if press_at is not None:
+            delay = min(press_at - now(), 1.0 / self.pacer.active_fps)
+            if delay > 0:
+                sleep(delay)
+        
+        request = yield self.input.send('space', wait=False)
+        self.press_duration += time.perf_counter() - entered
+        
+        finished = request.executed_at if request.executed_at is not None else now()
+        self.input_latency = 0.8 * self.input_latency + 0.2 * (finished - request.queued_at)
+        self.last_space_press = finished
+        self.inside = True
+    
+    def update_press(self, white_circle, green_circle):
+        """Решает, когда нажимать пробел: по предсказанию входа белого круга
+        в зеленую зону или сразу, если круг уже внутри (задача: dist = yield from ...)"""
+        xw, yw, rw = white_circle
+        xg, yg, rg = green_circle
+        
+        # Увеличиваем радиус зеленого круга
+        rg = max(1, rg + self.green_radius_offset)
+        limit = rg - rw + self.threshold
+        
+        # Вычисляем расстояние между центрами
+        dist = np.sqrt((xw - xg)**2 + (yw - yg)**2)
+        self.tracker.update(self.frame_time, xw, yw)
+        
+        if dist >= limit:
+            if self.inside and now() - self.last_space_press >= self.press_cooldown:
+                self.inside = False
+            if self.inside:
+                return dist
+            
+            # Планируем нажатие, если вход в зону ожидается раньше следующего кадра
+            eta = self.tracker.time_to_enter(xw, yw, xg, yg, limit)
+            if eta is not None:
+                press_at = self.frame_time + eta - self.input_latency
+                if press_at - now() <= 1.0 / self.pacer.active_fps:
+                    yield from self.press_space(press_at)
+                    print(f"Нажат пробел по прогнозу! Вход через {eta * 1000:.0f} мс, расстояние: {dist:.2f}")
+        elif not self.inside:
+            # Прогноз не сработал - нажимаем сразу
+            yield from self.press_space()
+            print(f"Нажат пробел! Расстояние: {dist:.2f}")
+        
+        return dist
     
     def run_kachalka(self, debug=False):
-        """Основная функция качалки"""
+        """Основной цикл качалки (задача планировщика)"""
         self.running = True
         self.debug = debug
         
@@ -102,48 +461,60 @@ class KachalkaBot:
             print("Debug окно будет открыто")
         
         # Нажимаем E для начала
-        self.press_e()
+        yield from self.press_e()
+        self.inside = False
+        self.tracker.reset()
+        self.pacer.reset()
+        
+        x1, y1, x2, y2 = self.region
+        self.subscription = screen_capture.subscribe((x1, y1, x2 - x1, y2 - y1), fps=self.pacer.target_fps)
+        self.e_timer = every(self.e_interval, self.press_e, "kachalka.e", delay=self.e_interval)
+        self.food_timer = every(self.food_interval, self.food_check, "kachalka.food", PRIORITY_LOW)
         
         try:
             while self.running:
-                now = time.time()
+                # Ждём кадр, не занимая поток планировщика
+                if not (yield WaitFrame(self.subscription)):
+                    continue
+                
+                # Забираем кадр
+                frame = self.capture_frame()
+                if frame is None:
+                    continue
+                self.metrics.observe('capture', self.capture_duration)
                 
-                # Проверяем еду каждые 120 секунд
-                if now - self.last_food_check >= 120:
-                    self.last_food_check = now
-                    if self.check_food():
-                        self.eat_food()
+                # Ищем белый и зеленый круги за один проход по кадру
+                with self.metrics.stage('match'):
+                    white_circle, green_circle = self.circle_detector.detect(frame)
                 
-                # Нажимаем E каждые 15 секунд
-                if now - self.last_e_press >= 15:
-                    self.press_e()
+                # Частота захвата: редко без кругов, максимально при их появлении.
+                # Обновляется до решения, чтобы первый кадр с кругами уже шёл на полной частоте
+                target_fps = self.pacer.update(white_circle is not None or green_circle is not None)
+                if target_fps != self.subscription.fps:
+                    self.subscription.set_fps(target_fps)
                 
-                # Захватываем экран
-                frame = self.capture_screen(self.region)
+                if not self.subscription.intact():
+                    # Слот перезаписали во время поиска - круги могли найтись на смеси кадров
+                    self.torn_frames += 1
+                    continue
+                captured = frame
+                dist = None
+                last_press = self.last_space_press
                 
-                # Ищем белый и зеленый круги
-                white_circle = self.get_circle(frame, np.array([0, 0, 200]), np.array([180, 30, 255]))
-                green_circle = self.get_circle(frame, np.array([40, 50, 50]), np.array([80, 255, 255]))
+                # Для отладочного окна рисуем на собственной копии кадра
+                if self.debug:
+                    frame = to_bgr(frame).copy()
                 
                 if white_circle and green_circle:
+                    # Решение без ожидания момента нажатия и самой отправки (стадия input)
+                    self.press_duration = 0.0
+                    decided = time.perf_counter()
+                    dist = yield from self.update_press(white_circle, green_circle)
+                    self.metrics.observe('decide', time.perf_counter() - decided - self.press_duration)
                     xw, yw, rw = white_circle
                     xg, yg, rg = green_circle
-                    
-                    # Увеличиваем радиус зеленого круга
                     rg = max(1, rg + self.green_radius_offset)
                     
-                    # Вычисляем расстояние между центрами
-                    dist = np.sqrt((xw - xg)**2 + (yw - yg)**2)
-                    
-                    # Проверяем, нужно ли нажать пробел
-                    if dist < rg - rw + self.threshold and not self.inside:
-                        time.sleep(0.1)
-                        keyboard.send('space')
-                        self.inside = True
-                        print(f"Нажат пробел! Расстояние: {dist:.2f}")
-                    elif dist >= rg - rw + self.threshold:
-                        self.inside = False
-                    
                     # Отладочная информация
                     if self.debug:
                         cv2.circle(frame, (xw, yw), rw, (255, 255, 255), 2)
@@ -151,6 +522,20 @@ class KachalkaBot:
                         cv2.line(frame, (xw, yw), (xg, yg), (0, 0, 255), 1)
                         cv2.putText(frame, f'dist={int(dist)}', (10, 30), 
                                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                else:
+                    self.tracker.reset()
+                self.metrics.iteration(hit=bool(white_circle and green_circle))
+                
+                # После нажатия слот мог уже обернуться - испорченный кадр не записываем
+                if self.subscription is None or self.subscription.intact():
+                    record_frame('kachalka', captured, self.frame_origin, self.frame_time, {
+                        'white': white_circle,
+                        'green': green_circle,
+                        'dist': round(float(dist), 2) if dist is not None else None,
+                        'press': self.last_space_press != last_press,
+                    })
+                else:
+                    self.torn_frames += 1
                 
                 # Показываем отладочное окно
                 if self.debug:
@@ -159,31 +544,60 @@ class KachalkaBot:
                     if key == 27:  # ESC для выхода
                         print("ESC нажат - останавливаем качалку")
                         self.running = False
-                
-                # Небольшая задержка для снижения нагрузки на CPU
-                time.sleep(0.01)
+
         
         except Exception as e:
             print(f"Ошибка в качалке: {e}")
         
         finally:
+            self.running = False
+            for timer in (self.e_timer, self.food_timer):
+                if timer is not None:
+                    timer.cancel()
+            self.e_timer = self.food_timer = None
+            self.subscription.close()
+            self.subscription = None
+            
             # Всегда закрываем окна при выходе
             if self.debug:
                 cv2.destroyAllWindows()
                 print("Debug окно закрыто")
             print("Качалка остановлена!")
     
+    def start(self, debug=False):
+        """Запускает качалку задачей планировщика"""
+        if self.task is not None and self.task.is_alive():
+            return self.task
+        self.task = spawn(self.run_kachalka(debug), "kachalka", PRIORITY_HIGH)
+        return self.task
+    
     def stop(self):
-        """Останавливает качалку"""
+        """Останавливает качалку сразу, не дожидаясь следующего кадра"""
         self.running = False
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+    
+    def get_fps(self):
+        """Возвращает целевую и фактическую частоту кадров и число испорченных кадров"""
+        return dict(self.pacer.get_stats(), torn_frames=self.torn_frames)
 
 # Глобальный экземпляр бота качалки
 kachalka_bot = KachalkaBot()
 
 def run_kachalka(debug=False):
-    """Главная функция для запуска качалки"""
-    kachalka_bot.run_kachalka(debug)
+    """Главная функция для запуска качалки (возвращает задачу планировщика)"""
+    return kachalka_bot.start(debug)
 
 def stop_kachalka():
     """Останавливает качалку"""
     kachalka_bot.stop()
+
+def get_kachalka_fps():
+    """Возвращает целевую и фактическую частоту кадров качалки"""
+    return kachalka_bot.get_fps()
+
+if __name__ == "__main__":
+    # Замер скорости поиска кругов на синтетических кадрах
+    print("🏋️ Замер скорости поиска кругов...")
+    benchmark_circle_detection()
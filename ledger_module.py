@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль журнала рулетки - каждый сыгранный круг дописывается в конец файла
+записью фиксированного размера (время, ставка, сумма, выпавший цвет, изменение
+баланса), а сводка сессии (доля выигрышей, прибыль и круги в час) обновляется
+за O(1) на круг и отдаётся в Telegram без перечитывания журнала.
+
+Формат файла: 8 байт MAGIC и записи LEDGER_DTYPE подряд. Файл только дописывается,
+поэтому его можно читать (read_ledger) прямо во время игры, а оборванная при
+выключении последняя запись просто отбрасывается при чтении.
+"""
+
+import os
+import sys
+import time
+import threading
+import numpy as np
+from typing import Dict, Optional
+
+MAGIC = b'BOTLDG01'
+LEDGER_PATH = os.environ.get('BOT_ROULETTE_LEDGER', os.path.join('sessions', 'roulette.ledger'))
+
+# Коды ставок и исходов в записи
+COLORS = ('unknown', 'red', 'black', 'green')
+COLOR_CODES = {color: code for code, color in enumerate(COLORS)}
+# Выплата при выигрыше (к сумме ставки): цвет 1:1, зеро 35:1
+PAYOUTS = {'red': 1, 'black': 1, 'green': 35}
+
+LEDGER_DTYPE = np.dtype([
+    ('timestamp', '<f8'),  # Время круга (Unix)
+    ('bet', 'u1'),         # Код ставки (COLORS)
+    ('outcome', 'u1'),     # Код выпавшего цвета (0 - не распознан)
+    ('amount', '<i4'),     # Сумма ставки
+    ('delta', '<i4'),      # Изменение баланса за круг
+])
+
+def settle(bet: str, amount: int, outcome: Optional[str]) -> int:
+    """Изменение баланса за круг (0, если исход не распознан)"""
+    if outcome is None or outcome == 'unknown':
+        return 0
+    if outcome == bet:
+        return amount * PAYOUTS.get(bet, 1)
+    return -amount
+
+class LedgerStats:
+    """Сводка кругов, обновляемая за O(1) на круг"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.last = self.started
+        self.live = True  # False - считать в час по времени последнего круга (разбор журнала)
+        self.rounds = 0
+        self.wins = 0
+        self.losses = 0
+        self.unknown = 0
+        self.wagered = 0
+        self.profit = 0
+        self.best_profit = 0
+        self.max_drawdown = 0
+        self.streak = 0  # > 0 - выигрыши подряд, < 0 - проигрыши подряд
+
+    def add(self, amount: int, outcome: str, delta: int, timestamp: float):
+        self.rounds += 1
+        self.last = timestamp
+        if outcome == 'unknown':
+            self.unknown += 1
+            return
+        self.wagered += amount
+        self.profit += delta
+        if delta > 0:
+            self.wins += 1
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+        else:
+            self.losses += 1
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+        self.best_profit = max(self.best_profit, self.profit)
+        self.max_drawdown = max(self.max_drawdown, self.best_profit - self.profit)
+
+    def as_dict(self) -> Dict[str, float]:
+        hours = max((time.time() if self.live else self.last) - self.started, 1.0) / 3600
+        decided = self.wins + self.losses
+        return {
+            'rounds': self.rounds,
+            'wins': self.wins,
+            'losses': self.losses,
+            'unknown': self.unknown,
+            'win_rate': self.wins / decided if decided else 0.0,
+            'wagered': self.wagered,
+            'profit': self.profit,
+            'profit_per_hour': self.profit / hours,
+            'rounds_per_hour': self.rounds / hours,
+            'max_drawdown': self.max_drawdown,
+            'streak': self.streak,
+        }
+
+class RouletteLedger:
+    """Журнал кругов рулетки: файл только на дозапись и сводка текущей сессии"""
+
+    def __init__(self, path: str = LEDGER_PATH):
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+        self.stats = LedgerStats()
+
+    def _open(self):
+        """Открывает файл на дозапись (вызывается под блокировкой)"""
+        if self.file is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size:
+            with open(self.path, 'rb') as f:
+                header = f.read(len(MAGIC))
+            if header != MAGIC:
+                if MAGIC.startswith(header):
+                    # Оборвалась запись самого заголовка - журнал пуст
+                    os.truncate(self.path, 0)
+                else:
+                    # Чужой файл не дописываем: записи в нём читались бы со сдвигом
+                    backup = self.path + '.bad'
+                    print(f"⚠️ {self.path} не журнал рулетки - переименован в {backup}")
+                    os.replace(self.path, backup)
+                size = 0
+        # Оборванную при выключении запись отрезаем до последней целой: дописанная
+        # нулями, она читалась бы как круг с нулевой ставкой
+        tail = (size - len(MAGIC)) % LEDGER_DTYPE.itemsize if size else 0
+        if tail:
+            print(f"⚠️ Журнал рулетки оборван - отрезаем {tail} байт неполной записи")
+            os.truncate(self.path, size - tail)
+        self.file = open(self.path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def record(self, bet: str, amount: int, outcome: Optional[str],
+               timestamp: Optional[float] = None) -> int:
+        """Дописывает круг в журнал, обновляет сводку и возвращает изменение баланса"""
+        outcome = outcome or 'unknown'
+        amount = int(amount)
+        delta = settle(bet, amount, outcome)
+        entry = np.zeros(1, dtype=LEDGER_DTYPE)
+        timestamp = time.time() if timestamp is None else timestamp
+        entry['timestamp'] = timestamp
+        entry['bet'] = COLOR_CODES.get(bet, 0)
+        entry['outcome'] = COLOR_CODES.get(outcome, 0)
+        entry['amount'] = amount
+        entry['delta'] = delta
+
+        with self.lock:
+            self.stats.add(amount, outcome, delta, timestamp)
+            try:
+                self._open()
+                self.file.write(entry.tobytes())
+                self.file.flush()
+            except OSError as e:
+                print(f"Ошибка записи журнала рулетки: {e}")
+        return delta
+
+    def get_stats(self) -> Dict[str, float]:
+        """Сводка текущей сессии"""
+        with self.lock:
+            return self.stats.as_dict()
+
+    def summary(self) -> str:
+        """Сводка для Telegram"""
+        stats = self.get_stats()
+        if not stats['rounds']:
+            return "🎰 Рулетка ещё не сыграла ни одного круга"
+        streak = stats['streak']
+        streak_text = f"{streak} выигр." if streak > 0 else f"{-streak} проигр." if streak < 0 else "-"
+        return (f"🎰 Кругов: {stats['rounds']} ({stats['rounds_per_hour']:.0f}/ч), "
+                f"выигрышей {stats['win_rate'] * 100:.0f}% "
+                f"({stats['wins']}/{stats['wins'] + stats['losses']}, не распознано {stats['unknown']})\n"
+                f"Прибыль: {stats['profit']:+d} ({stats['profit_per_hour']:+.0f}/ч), "
+                f"поставлено {stats['wagered']}, просадка {stats['max_drawdown']}, серия {streak_text}")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+def read_ledger(path: str = LEDGER_PATH) -> np.ndarray:
+    """Читает все записи журнала (неполная последняя запись отбрасывается)"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: не журнал рулетки")
+        data = f.read()
+    count = len(data) // LEDGER_DTYPE.itemsize
+    return np.frombuffer(data[:count * LEDGER_DTYPE.itemsize], dtype=LEDGER_DTYPE)
+
+# Глобальный журнал рулетки
+roulette_ledger = RouletteLedger()
+
+def record_round(bet: str, amount: int, outcome: Optional[str]) -> int:
+    """Записывает сыгранный круг"""
+    return roulette_ledger.record(bet, amount, outcome)
+
+def get_summary() -> str:
+    """Возвращает сводку рулетки для Telegram"""
+    return roulette_ledger.summary()
+
+if __name__ == "__main__":
+    # python ledger_module.py [журнал] - сводка по всему журналу
+    entries = read_ledger(sys.argv[1] if len(sys.argv) > 1 else LEDGER_PATH)
+    stats = LedgerStats()
+    stats.live = False
+    if len(entries):
+        stats.started = float(entries['timestamp'][0])
+    for entry in entries:
+        stats.add(int(entry['amount']), COLORS[entry['outcome']], int(entry['delta']), float(entry['timestamp']))
+    ledger = RouletteLedger()
+    ledger.stats = stats
+    print(ledger.summary())
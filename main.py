@@ -1,99 +1,137 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import time
+
+# Время старта процесса для проверки цели по времени запуска
+STARTUP_STARTED = time.perf_counter()
+STARTUP_TARGET_MS = 1000  # Бот должен быть готов ответить на /start за это время
+
 import os
 import sys
-import time
 import threading
 import random
-import cv2
-import numpy as np
-import pyautogui
-import pydirectinput
-import keyboard
-import mss
-from PIL import Image
 from io import BytesIO
 import telebot
 from telebot import types
+from registry_module import ModuleRegistry
+import outbox_module
+from outbox_module import send_message, send_document, send_photo
 
-# Импортируем модули для игровых функций
-try:
-    from roulette_module import perform_step
-    from kachalka_module import run_kachalka, stop_kachalka
-    from anti_afk_module import start_anti_afk, stop_anti_afk, is_anti_afk_running
-    from tokarka_module import start_tokarka, stop_tokarka, is_tokarka_running
-    from number_module import start_number_bot, stop_number_bot, is_number_bot_running, get_available_numbers
-    from additional_functions_module import start_additional_functions, stop_additional_functions, is_additional_functions_running, get_available_functions
-    print("✅ Все игровые модули загружены успешно")
-except ImportError as e:
-    print(f"⚠️ Предупреждение: Не удалось загрузить игровые модули: {e}")
-    print("Создайте файлы roulette_module.py, kachalka_module.py, anti_afk_module.py, tokarka_module.py, number_module.py, additional_functions_module.py")
-    
-    # Заглушки для функций
+# Заглушки для модулей, которые не удалось импортировать
+class RouletteStub:
+    """Заглушка рулетки"""
+    
+    @staticmethod
     def perform_step(step, chat_id=None):
         return (step + 1) % 6
     
+    @staticmethod
+    def step_task(step, chat_id=None):
+        yield 1
+        return (step + 1) % 6
+
+class KachalkaStub:
+    """Заглушка качалки"""
+    
+    @staticmethod
     def run_kachalka(debug=False):
         print("Качалка не доступна - модуль не найден")
     
+    @staticmethod
     def stop_kachalka():
         print("Качалка не доступна - модуль не найден")
+
+class AntiAFKStub:
+    """Заглушка анти-афк"""
     
+    @staticmethod
     def start_anti_afk():
         print("Анти-афк не доступен - модуль не найден")
         return False
     
+    @staticmethod
     def stop_anti_afk():
         print("Анти-афк не доступен - модуль не найден")
     
+    @staticmethod
     def is_anti_afk_running():
         return False
+
+class TokarkaStub:
+    """Заглушка токарки"""
     
+    @staticmethod
     def start_tokarka(debug=False):
         print("Токарка не доступна - модуль не найден")
         return False
     
+    @staticmethod
     def stop_tokarka():
         print("Токарка не доступна - модуль не найден")
         return False
     
+    @staticmethod
     def is_tokarka_running():
         return False
+
+class NumberStub:
+    """Заглушка номеров"""
     
+    @staticmethod
     def start_number_bot(target_number=None, debug=False):
         print("Номера не доступны - модуль не найден")
         return False
     
+    @staticmethod
     def stop_number_bot():
         print("Номера не доступны - модуль не найден")
         return False
     
+    @staticmethod
     def is_number_bot_running():
         return False
     
+    @staticmethod
     def get_available_numbers():
         return []
+
+class AdditionalFunctionsStub:
+    """Заглушка дополнительных функций"""
     
+    @staticmethod
     def start_additional_functions(target_function=None, debug=False):
         print("Дополнительные функции не доступны - модуль не найден")
         return False
     
+    @staticmethod
     def stop_additional_functions():
         print("Дополнительные функции не доступны - модуль не найден")
         return False
     
+    @staticmethod
     def is_additional_functions_running():
         return False
     
+    @staticmethod
     def get_available_functions():
         return []
 
+# Игровые модули загружаются при первом нажатии соответствующей кнопки
+modules = ModuleRegistry()
+modules.register('roulette', 'roulette_module', RouletteStub)
+modules.register('kachalka', 'kachalka_module', KachalkaStub)
+modules.register('anti_afk', 'anti_afk_module', AntiAFKStub)
+modules.register('tokarka', 'tokarka_module', TokarkaStub)
+modules.register('number', 'number_module', NumberStub)
+modules.register('additional_functions', 'additional_functions_module', AdditionalFunctionsStub)
+
 # Настройки бота (нужно будет указать ваш токен)
 BOT_TOKEN = "YOUR_BOT_TOKEN_HERE"
 
 # Глобальные переменные
 bot = telebot.TeleBot(BOT_TOKEN)
+outbox_module.attach_bot(bot)
 chat_id = None
 kachalka_running = False
 running_roulette = False
@@ -101,7 +139,8 @@ running_afk = False
 tokarka_running = False
 number_bot_running = False
 additional_functions_running = False
-kachalka_thread = None
+roulette_task = None
+kachalka_task = None
 
 # Направления для анти-афк
 DIRECTIONS = ['w', 'a', 's', 'd']
@@ -165,49 +204,47 @@ def start(message):
         "Используйте кнопки ниже для управления:"
     )
     
-    bot.send_message(chat_id, welcome_text, reply_markup=get_main_keyboard())
+    send_message(chat_id, welcome_text, reply_markup=get_main_keyboard())
 
 def roulette_loop(chat_id):
-    """Основной цикл рулетки"""
+    """Основной цикл рулетки (задача планировщика)"""
     step = 0
     
     try:
         while running_roulette:
-            step = perform_step(step, chat_id)
-            time.sleep(0.5)
+            # Шаги сами ждут нужного состояния экрана - без паузы между ними
+            step = yield from modules.get('roulette').step_task(step, chat_id)
     except Exception as e:
-        bot.send_message(chat_id, f'Произошла ошибка: {e}. Возврат к пункту 0')
-        pydirectinput.press('backspace')
-        pydirectinput.press('escape')
+        send_message(chat_id, f'Произошла ошибка: {e}. Возврат к пункту 0')
+        from input_module import input_source
+        keys = input_source('telegram')
+        yield keys.press('backspace', wait=False)
+        yield keys.press('escape', wait=False)
         step = 0
 
 # Функция perform_step перенесена в roulette_module.py
 
 def toggle_roulette(message):
     """Переключает состояние рулетки"""
-    global running_roulette, chat_id
+    global running_roulette, roulette_task, chat_id
     chat_id = message.chat.id
+    from scheduler_module import spawn
     
     # Переключаем состояние
     if not running_roulette:
         running_roulette = True
-        threading.Thread(target=roulette_loop, args=(chat_id,), daemon=True).start()
+        roulette_task = spawn(roulette_loop(chat_id), "roulette")
         status_text = "🟢 Рулетка запущена!"
     else:
         running_roulette = False
+        if roulette_task is not None:
+            roulette_task.cancel()
+            roulette_task = None
         status_text = "🔴 Рулетка остановлена."
     
-    # Отправляем сообщение о статусе и обновляем клавиатуру
-    try:
-        # Небольшая задержка для гарантии обновления состояния
-        time.sleep(0.1)
-        
-        # Отправляем сообщение о статусе с обновленной клавиатурой
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
-    except Exception as e:
-        print(f"Ошибка отправки сообщения: {e}")
-        # Если не удалось отправить, пробуем еще раз
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
+    # Статус с клавиатурой уходит через очередь: обработчик не ждёт сети, а частые
+    # переключения одной кнопки сливаются в последнее состояние
+    send_message(chat_id, status_text, key='roulette', reply_markup=get_main_keyboard)
 
 def toggle_anti_afk(message):
     """Переключает состояние анти-афк"""
@@ -216,105 +253,131 @@ def toggle_anti_afk(message):
     
     # Переключаем состояние
     if not running_afk:
-        if start_anti_afk():
+        if modules.get('anti_afk').start_anti_afk():
             running_afk = True
             status_text = "🟢 Анти-афк запущена!"
         else:
             status_text = "❌ Ошибка запуска анти-афк!"
     else:
-        stop_anti_afk()
+        modules.get('anti_afk').stop_anti_afk()
         running_afk = False
         status_text = "🔴 Анти-афк остановлена."
     
-    # Отправляем сообщение о статусе и обновляем клавиатуру
-    try:
-        # Небольшая задержка для гарантии обновления состояния
-        time.sleep(0.1)
-        
-        # Отправляем сообщение о статусе с обновленной клавиатурой
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
-    except Exception as e:
-        print(f"Ошибка отправки сообщения: {e}")
-        # Если не удалось отправить, пробуем еще раз
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
+    # Отправляем статус с обновленной клавиатурой (через очередь)
+    send_message(chat_id, status_text, key='anti_afk', reply_markup=get_main_keyboard)
 
 def shutdown_bot(message):
     """Выключает бота"""
     global chat_id
     chat_id = message.chat.id
     
-    bot.send_message(chat_id, 'Бот выключается...')
+    send_message(chat_id, 'Бот выключается...')
+    # Найденный за сессию масштаб шаблонов и места шаблонов на экране сохраняются здесь
+    vision_module = sys.modules.get('vision_module')
+    if vision_module is not None:
+        vision_module.save_template_cache()
+    window_module = sys.modules.get('window_module')
+    if window_module is not None:
+        window_module.save_calibration()
+    outbox_module.flush(timeout=3.0)
     os._exit(0)
 
 def screenshot_f10(message):
-    """Делает скриншот с помощью F10"""
+    """Делает скриншот с помощью F10 (нажатие, захват и кодирование - в пуле скриншотов)"""
     global chat_id
     chat_id = message.chat.id
+    from input_module import input_source
+    keys = input_source('telegram')
     
-    try:
-        pydirectinput.press('f10')
+    def before():
+        keys.press('f10')
         time.sleep(0.2)
-        screenshot = pyautogui.screenshot()
-        
-        bio = BytesIO()
-        bio.name = 'screenshot.png'
-        screenshot.save(bio, 'PNG')
-        bio.seek(0)
-        
-        bot.send_document(chat_id, bio)
-        pydirectinput.press('escape')
-        bot.send_message(chat_id, '📸 Скриншот F10 сделан и отправлен.')
-    except Exception as e:
-        bot.send_message(chat_id, f'❌ Ошибка при скриншоте F10: {e}')
+    
+    screenshot(message, before=before, after=lambda: keys.press('escape'), label='F10')
 
-def screenshot(message):
-    """Делает скриншот всех мониторов"""
+def screenshot(message, options=None, before=None, after=None, label=''):
+    """Делает скриншот в фоновом потоке и отправляет его через очередь сообщений.
+    По умолчанию - окно игры в JPEG, уменьшенное до 1920 по длинной стороне"""
+    import screenshot_module
     chat_id = message.chat.id
+    options = options or screenshot_module.ScreenshotOptions()
+    
+    def done(bio, error):
+        if error is not None:
+            send_message(chat_id, f'❌ Ошибка при скриншоте{" " + label if label else ""}: {error}')
+            return
+        caption = screenshot_module.describe(options, bio)
+        if options.fmt == 'jpeg':
+            send_photo(chat_id, bio, caption=caption)
+        else:
+            # WebP и PNG уходят файлом, без пережатия Telegram
+            send_document(chat_id, bio, caption=caption)
     
+    screenshot_module.request_screenshot(options, done, before, after)
+
+def screenshot_command(message):
+    """Скриншот с параметрами: /screenshot [game|all|<монитор>] [jpg|webp|png] [q<качество>] [x<масштаб>]"""
+    import screenshot_module
     try:
-        time.sleep(0.2)
-        with mss.mss() as sct:
-            img = sct.grab(sct.monitors[0])
-            img_pil = Image.frombytes('RGB', img.size, img.rgb)
-        
-        bio = BytesIO()
-        bio.name = 'screenshot.png'
-        img_pil.save(bio, 'PNG')
-        bio.seek(0)
-        
-        bot.send_photo(chat_id, bio)
-        bot.send_message(chat_id, '📸 Скриншот всех мониторов сделан и отправлен.')
-    except Exception as e:
-        bot.send_message(chat_id, f'❌ Ошибка при скриншоте: {e}')
+        options = screenshot_module.ScreenshotOptions.parse(message.text.split()[1:])
+    except ValueError as e:
+        send_message(message.chat.id, f"{e}\nИспользование: /screenshot [game|all|<монитор>] "
+                                      f"[jpg|webp|png] [q<качество>] [x<масштаб>]")
+        return
+    screenshot(message, options)
+
+def start_watch(message):
+    """Наблюдение за экраном: /watch <секунды> [порог %] - присылает уменьшенный
+    скриншот, только когда картинка заметно изменилась"""
+    import screenshot_module
+    chat_id = message.chat.id
+    
+    parts = message.text.split()
+    try:
+        interval = float(parts[1]) if len(parts) > 1 else screenshot_module.WATCH_INTERVAL
+        threshold = float(parts[2]) / 100 if len(parts) > 2 else screenshot_module.WATCH_THRESHOLD
+    except ValueError:
+        send_message(chat_id, "Использование: /watch <секунды> [порог изменения, %]")
+        return
+    interval = min(max(interval, screenshot_module.WATCH_MIN_INTERVAL), screenshot_module.WATCH_MAX_INTERVAL)
+    threshold = min(max(threshold, 0.0), 1.0)
+    
+    def deliver(bio, ratio):
+        # Неотправленный кадр наблюдения заменяется более свежим
+        send_photo(chat_id, bio, key='watch', caption=f"👁️ Изменилось {ratio * 100:.0f}% экрана")
+    
+    screenshot_module.watch(chat_id, interval, deliver, threshold)
+    send_message(chat_id, f"👁️ Наблюдение: проверка каждые {interval:.0f} с, скриншот при изменении "
+                          f"больше {threshold * 100:.0f}% экрана. /unwatch - остановить")
+
+def stop_watch(message):
+    """Останавливает наблюдение за экраном"""
+    import screenshot_module
+    watch = screenshot_module.unwatch(message.chat.id)
+    if watch is None:
+        send_message(message.chat.id, "👁️ Наблюдение не запущено")
+    else:
+        send_message(message.chat.id, f"👁️ Наблюдение остановлено: проверок {watch.checked}, "
+                                      f"отправлено {watch.sent}")
 
 def toggle_kachalka(message):
     """Переключает состояние качалки"""
-    global kachalka_running, kachalka_thread, chat_id
+    global kachalka_running, kachalka_task, chat_id
     chat_id = message.chat.id
     
     # Переключаем состояние
     if not kachalka_running:
         kachalka_running = True
-        kachalka_thread = threading.Thread(target=run_kachalka, args=(True,), daemon=True)  # Включаем debug
-        kachalka_thread.start()
+        kachalka_task = modules.get('kachalka').run_kachalka(True)  # Включаем debug
         status_text = "🟢 Качалка запущена! (Debug окно открыто)"
     else:
         kachalka_running = False
-        stop_kachalka()  # Останавливаем качалку через модуль
-        kachalka_thread = None
+        modules.get('kachalka').stop_kachalka()  # Останавливаем качалку через модуль
+        kachalka_task = None
         status_text = "🔴 Качалка остановлена."
     
-    # Отправляем сообщение о статусе и обновляем клавиатуру
-    try:
-        # Небольшая задержка для гарантии обновления состояния
-        time.sleep(0.1)
-        
-        # Отправляем сообщение о статусе с обновленной клавиатурой
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
-    except Exception as e:
-        print(f"Ошибка отправки сообщения: {e}")
-        # Если не удалось отправить, пробуем еще раз
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
+    # Отправляем статус с обновленной клавиатурой (через очередь)
+    send_message(chat_id, status_text, key='kachalka', reply_markup=get_main_keyboard)
 
 def toggle_tokarka(message):
     """Переключает состояние токарки"""
@@ -323,24 +386,15 @@ def toggle_tokarka(message):
     
     if not tokarka_running:
         tokarka_running = True
-        start_tokarka(debug=True)  # Запускаем с отладкой
+        modules.get('tokarka').start_tokarka(debug=True)  # Запускаем с отладкой
         status_text = "🟢 Токарка запущена!"
     else:
         tokarka_running = False
-        stop_tokarka()
+        modules.get('tokarka').stop_tokarka()
         status_text = "🔴 Токарка остановлена."
     
-    # Отправляем сообщение о статусе и обновляем клавиатуру
-    try:
-        # Небольшая задержка для гарантии обновления состояния
-        time.sleep(0.1)
-        
-        # Отправляем сообщение о статусе с обновленной клавиатурой
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
-    except Exception as e:
-        print(f"Ошибка отправки сообщения: {e}")
-        # Если не удалось отправить, пробуем еще раз
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
+    # Отправляем статус с обновленной клавиатурой (через очередь)
+    send_message(chat_id, status_text, key='tokarka', reply_markup=get_main_keyboard)
 
 def toggle_number_bot(message):
     """Переключает состояние бота номеров"""
@@ -349,24 +403,15 @@ def toggle_number_bot(message):
     
     if not number_bot_running:
         number_bot_running = True
-        start_number_bot(debug=True)  # Запускаем с отладкой
+        modules.get('number').start_number_bot(debug=True)  # Запускаем с отладкой
         status_text = "🟢 Бот номеров запущен!"
     else:
         number_bot_running = False
-        stop_number_bot()
+        modules.get('number').stop_number_bot()
         status_text = "🔴 Бот номеров остановлен."
     
-    # Отправляем сообщение о статусе и обновляем клавиатуру
-    try:
-        # Небольшая задержка для гарантии обновления состояния
-        time.sleep(0.1)
-        
-        # Отправляем сообщение о статусе с обновленной клавиатурой
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
-    except Exception as e:
-        print(f"Ошибка отправки сообщения: {e}")
-        # Если не удалось отправить, пробуем еще раз
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
+    # Отправляем статус с обновленной клавиатурой (через очередь)
+    send_message(chat_id, status_text, key='number', reply_markup=get_main_keyboard)
 
 def toggle_additional_functions(message):
     """Переключает состояние дополнительных функций"""
@@ -375,30 +420,120 @@ def toggle_additional_functions(message):
     
     if not additional_functions_running:
         additional_functions_running = True
-        start_additional_functions(debug=True)  # Запускаем с отладкой
+        modules.get('additional_functions').start_additional_functions(debug=True)  # Запускаем с отладкой
         status_text = "🟢 Дополнительные функции запущены!"
     else:
         additional_functions_running = False
-        stop_additional_functions()
+        modules.get('additional_functions').stop_additional_functions()
         status_text = "🔴 Дополнительные функции остановлены."
     
-    # Отправляем сообщение о статусе и обновляем клавиатуру
+    # Отправляем статус с обновленной клавиатурой (через очередь)
+    send_message(chat_id, status_text, key='additional_functions', reply_markup=get_main_keyboard)
+
+def toggle_recording(message):
+    """Включает или выключает запись сессии (кадры и решения ботов) для отладки"""
+    import recorder_module
+    
+    if not recorder_module.is_recording():
+        path = recorder_module.start_recording()
+        status_text = f"⏺️ Запись сессии включена: {path}"
+    else:
+        recorder_module.stop_recording()
+        stats = recorder_module.session_recorder.get_stats()
+        status_text = (f"⏹️ Запись сессии остановлена: {stats['path']}\n"
+                       f"Кадров: {stats['recorded']}, отброшено: {stats['dropped']}")
+    
+    send_message(message.chat.id, status_text)
+
+def run_profile(message):
+    """Профилирует все потоки бота заданное время и отправляет таблицу горячих функций
+    и свёрнутые стеки для flamegraph"""
+    import profiler_module
+    chat_id = message.chat.id
+    
+    parts = message.text.split()
     try:
-        # Небольшая задержка для гарантии обновления состояния
-        time.sleep(0.1)
+        seconds = float(parts[1]) if len(parts) > 1 else 10.0
+    except ValueError:
+        send_message(chat_id, "Использование: /profile <секунды>")
+        return
+    seconds = min(max(seconds, 1.0), profiler_module.MAX_SECONDS)
+    
+    if profiler_module.is_profiling():
+        send_message(chat_id, "⏱️ Профилирование уже идёт")
+        return
+    
+    def worker():
+        try:
+            result = profiler_module.profile(seconds)
+        except RuntimeError as e:
+            send_message(chat_id, f"⏱️ {e}")
+            return
         
-        # Отправляем сообщение о статусе с обновленной клавиатурой
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
-    except Exception as e:
-        print(f"Ошибка отправки сообщения: {e}")
-        # Если не удалось отправить, пробуем еще раз
-        bot.send_message(chat_id, status_text, reply_markup=get_main_keyboard())
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        report = result.report()
+        for name, text in ((f'profile_{stamp}.txt', report),
+                           (f'profile_{stamp}.folded', result.collapsed())):
+            bio = BytesIO(text.encode('utf-8'))
+            bio.name = name
+            send_document(chat_id, bio)
+        send_message(chat_id, report.split("\n", 1)[0])
+    
+    threading.Thread(target=worker, name="profiler", daemon=True).start()
+    send_message(chat_id, f"⏱️ Профилирование всех потоков {seconds:.0f} с...")
+
+def send_stats(message):
+    """Отправляет сводку метрик: частота циклов, p50/p99 стадий, CPU и память"""
+    import metrics_module
+    import input_module
+    summary = metrics_module.get_summary()
+    input_summary = input_module.get_summary()
+    if input_summary:
+        summary += "\n" + input_summary
+    summary += "\n" + outbox_module.get_summary()
+    window_module = sys.modules.get('window_module')  # Только если боты уже калибровали окно
+    if window_module is not None:
+        summary += "\n" + window_module.get_summary()
+    send_message(message.chat.id, summary)
+
+def send_roulette_summary(message):
+    """Отправляет сводку кругов рулетки из журнала текущей сессии"""
+    import ledger_module
+    send_message(message.chat.id, ledger_module.get_summary())
 
 # Обработчики команд
 @bot.message_handler(commands=['start'])
 def handle_start(message):
     start(message)
 
+@bot.message_handler(commands=['record'])
+def handle_record(message):
+    toggle_recording(message)
+
+@bot.message_handler(commands=['stats'])
+def handle_stats(message):
+    send_stats(message)
+
+@bot.message_handler(commands=['roulette'])
+def handle_roulette(message):
+    send_roulette_summary(message)
+
+@bot.message_handler(commands=['screenshot'])
+def handle_screenshot(message):
+    screenshot_command(message)
+
+@bot.message_handler(commands=['watch'])
+def handle_watch(message):
+    start_watch(message)
+
+@bot.message_handler(commands=['unwatch'])
+def handle_unwatch(message):
+    stop_watch(message)
+
+@bot.message_handler(commands=['profile'])
+def handle_profile(message):
+    run_profile(message)
+
 # Обработчик текстовых сообщений (для Reply Keyboard)
 @bot.message_handler(func=lambda message: message.text and not message.text.startswith('/'))
 def handle_text(message):
@@ -424,7 +559,7 @@ def handle_text(message):
         shutdown_bot(message)
     else:
         # Если сообщение не распознано, показываем меню
-        bot.send_message(message.chat.id, "Выберите действие:", reply_markup=get_main_keyboard())
+        send_message(message.chat.id, "Выберите действие:", reply_markup=get_main_keyboard())
 
 if __name__ == "__main__":
     print("Запуск бота...")
@@ -435,6 +570,16 @@ if __name__ == "__main__":
         print("Получите токен у @BotFather в Telegram и замените YOUR_BOT_TOKEN_HERE на ваш токен")
         sys.exit(1)
     
+    startup_ms = (time.perf_counter() - STARTUP_STARTED) * 1000
+    if startup_ms <= STARTUP_TARGET_MS:
+        print(f"✅ Бот готов за {startup_ms:.0f} мс (цель {STARTUP_TARGET_MS} мс)")
+    else:
+        print(f"⚠️ Запуск занял {startup_ms:.0f} мс - больше цели {STARTUP_TARGET_MS} мс")
+    
+    import metrics_module
+    metrics_module.start_exporter()
+    
+    threading.current_thread().name = "polling"
     try:
         bot.polling(none_stop=True)
     except Exception as e:
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль метрик - гистограммы длительности стадий циклов ботов (захват,
+сопоставление, решение, ввод), частота итераций, попадания и промахи, CPU и
+память процесса. Сводка отдаётся командой /stats, а полный набор периодически
+пишется в файл для textfile-коллектора Prometheus.
+"""
+
+import os
+import time
+import socket
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Границы корзин гистограмм (секунды)
+BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+STAGES = ('capture', 'match', 'decide', 'input')
+
+# Файл для textfile-коллектора (node_exporter / windows_exporter) и имя машины
+TEXTFILE_PATH = os.environ.get('BOT_METRICS_TEXTFILE', os.path.join('metrics', 'bot.prom'))
+EXPORT_INTERVAL = 15.0
+RIG = os.environ.get('BOT_RIG', socket.gethostname())
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (без выделения памяти на замер)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля линейной интерполяцией внутри корзины (как histogram_quantile)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        total = 0
+        for i, count in enumerate(self.counts):
+            if count and total + count >= rank:
+                if i == len(self.buckets):
+                    return float('inf')
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - total) / count
+            total += count
+        return float('inf')
+
+class BotMetrics:
+    """Метрики одного бота"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+        self.iterations = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        # Частота итераций по окну в несколько секунд
+        self.window_started = time.perf_counter()
+        self.window_iterations = 0
+        self.rate = 0.0
+
+    def observe(self, stage: str, seconds: float):
+        """Добавляет длительность стадии"""
+        with self.lock:
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Замеряет длительность блока как стадию цикла"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def iteration(self, hit: Optional[bool] = None):
+        """Отмечает завершённую итерацию цикла и её результат (нашёл / не нашёл)"""
+        with self.lock:
+            self.iterations += 1
+            self.window_iterations += 1
+            if hit is True:
+                self.hits += 1
+            elif hit is False:
+                self.misses += 1
+
+            now = time.perf_counter()
+            elapsed = now - self.window_started
+            if elapsed >= 5.0:
+                self.rate = self.window_iterations / elapsed
+                self.window_started = now
+                self.window_iterations = 0
+
+    def get_rate(self) -> float:
+        """Итераций в секунду по последнему закрытому окну (или по текущему, если
+        окна ещё не было или бот давно не отмечал итераций)"""
+        with self.lock:
+            elapsed = time.perf_counter() - self.window_started
+            if self.rate and elapsed < 10.0:
+                return self.rate
+            return self.window_iterations / elapsed if elapsed > 0 else 0.0
+
+class ProcessMetrics:
+    """CPU и память процесса через psutil (если он установлен)"""
+
+    def __init__(self):
+        self.process = None
+        try:
+            import psutil
+            self.process = psutil.Process()
+        except Exception:
+            pass
+        self.last_cpu = None
+        self.last_time = None
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.threads = 0
+        self.started = time.time()
+
+    def sample(self):
+        """Обновляет загрузку CPU (с прошлого замера) и память"""
+        if self.process is None:
+            return
+        try:
+            times = self.process.cpu_times()
+            now = time.perf_counter()
+            cpu = times.user + times.system
+            if self.last_cpu is not None and now > self.last_time:
+                self.cpu_percent = (cpu - self.last_cpu) / (now - self.last_time) * 100
+            self.last_cpu, self.last_time = cpu, now
+            self.rss = self.process.memory_info().rss
+            self.threads = self.process.num_threads()
+        except Exception:
+            pass
+
+class MetricsRegistry:
+    """Реестр метрик всех ботов и процесса"""
+
+    def __init__(self):
+        self.bots: Dict[str, BotMetrics] = {}
+        self.process = ProcessMetrics()
+        self.lock = threading.Lock()
+        self.exporter = None
+        self.exporter_stop = threading.Event()
+
+    def bot(self, name: str) -> BotMetrics:
+        """Возвращает метрики бота, создавая их при первом обращении"""
+        metrics = self.bots.get(name)
+        if metrics is None:
+            with self.lock:
+                metrics = self.bots.setdefault(name, BotMetrics(name))
+        return metrics
+
+    def summary(self) -> str:
+        """Компактная сводка для Telegram: по строке на бота, p50/p99 стадий в мс"""
+        self.process.sample()
+        uptime = int(time.time() - self.process.started)
+        lines = [
+            f"📊 {RIG}: CPU {self.process.cpu_percent:.0f}%, "
+            f"RSS {self.process.rss / 1024 / 1024:.0f} МБ, потоков {self.process.threads}, "
+            f"аптайм {uptime // 3600}ч {uptime // 60 % 60:02d}м"
+        ]
+
+        for name, metrics in sorted(self.bots.items()):
+            if not metrics.iterations:
+                continue
+            with metrics.lock:
+                total = metrics.hits + metrics.misses
+                hit_rate = f", попаданий {metrics.hits / total * 100:.0f}%" if total else ""
+                stages = []
+                for stage in STAGES:
+                    histogram = metrics.stages[stage]
+                    if histogram.count:
+                        stages.append(f"{stage} {_ms(histogram.quantile(0.5))}/{_ms(histogram.quantile(0.99))}")
+            lines.append(f"• {name}: {metrics.get_rate():.1f} ит/с{hit_rate}")
+            if stages:
+                lines.append("  " + ", ".join(stages) + " мс (p50/p99)")
+
+        if len(lines) == 1:
+            lines.append("Боты ещё не запускались")
+        return "\n".join(lines)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        self.process.sample()
+        rig = _label(RIG)
+        out: List[str] = [
+            "# HELP bot_stage_duration_seconds Длительность стадии цикла бота",
+            "# TYPE bot_stage_duration_seconds histogram",
+        ]
+        counters: List[Tuple[str, str, int]] = []
+        rates: List[Tuple[str, float]] = []
+
+        for name, metrics in sorted(self.bots.items()):
+            bot = _label(name)
+            with metrics.lock:
+                for stage in STAGES:
+                    histogram = metrics.stages[stage]
+                    labels = f'rig="{rig}",bot="{bot}",stage="{stage}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        out.append(f'bot_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    out.append(f'bot_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    out.append(f'bot_stage_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+                    out.append(f'bot_stage_duration_seconds_count{{{labels}}} {histogram.count}')
+                counters.append((bot, 'iterations', metrics.iterations))
+                counters.append((bot, 'hits', metrics.hits))
+                counters.append((bot, 'misses', metrics.misses))
+            rates.append((bot, metrics.get_rate()))
+
+        for kind in ('iterations', 'hits', 'misses'):
+            out.append(f"# TYPE bot_{kind}_total counter")
+            for bot, counter, value in counters:
+                if counter == kind:
+                    out.append(f'bot_{kind}_total{{rig="{rig}",bot="{bot}"}} {value}')
+
+        out.append("# TYPE bot_iteration_rate gauge")
+        for bot, rate in rates:
+            out.append(f'bot_iteration_rate{{rig="{rig}",bot="{bot}"}} {rate:.3f}')
+
+        out.append("# TYPE bot_process_cpu_percent gauge")
+        out.append(f'bot_process_cpu_percent{{rig="{rig}"}} {self.process.cpu_percent:.1f}')
+        out.append("# TYPE bot_process_resident_memory_bytes gauge")
+        out.append(f'bot_process_resident_memory_bytes{{rig="{rig}"}} {self.process.rss}')
+        out.append("# TYPE bot_process_threads gauge")
+        out.append(f'bot_process_threads{{rig="{rig}"}} {self.process.threads}')
+        return "\n".join(out) + "\n"
+
+    def write_textfile(self, path: str = TEXTFILE_PATH):
+        """Атомарно записывает метрики в файл (коллектор не увидит его недописанным)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def start_exporter(self, path: str = TEXTFILE_PATH, interval: float = EXPORT_INTERVAL):
+        """Запускает периодическую запись метрик в файл Prometheus"""
+        if self.exporter is not None and self.exporter.is_alive():
+            return
+
+        def export_loop():
+            while not self.exporter_stop.wait(interval):
+                try:
+                    self.write_textfile(path)
+                except Exception as e:
+                    print(f"Ошибка записи метрик: {e}")
+
+        self.exporter_stop.clear()
+        self.exporter = threading.Thread(target=export_loop, name="metrics", daemon=True)
+        self.exporter.start()
+
+    def stop_exporter(self):
+        """Останавливает запись метрик в файл"""
+        self.exporter_stop.set()
+
+def _ms(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    if seconds == float('inf'):
+        return f">{BUCKETS[-1] * 1000:.0f}"
+    return f"{seconds * 1000:.1f}"
+
+def _label(value: str) -> str:
+    """Экранирует значение метки Prometheus"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry()
+
+def bot_metrics(name: str) -> BotMetrics:
+    """Возвращает метрики бота"""
+    return metrics.bot(name)
+
+def get_summary() -> str:
+    """Возвращает сводку для /stats"""
+    return metrics.summary()
+
+def start_exporter(path: str = TEXTFILE_PATH, interval: float = EXPORT_INTERVAL):
+    """Запускает периодическую запись метрик в файл Prometheus"""
+    metrics.start_exporter(path, interval)
@@ -7,74 +7,327 @@
 
 import cv2
 import numpy as np
-import pyautogui
-import pydirectinput
-import time
-import threading
-import os
 from typing import Optional, Tuple, List
+from vision_module import template_matcher, ChangeDetector, to_gray
+from backend_module import sleep, now
+from input_module import input_source
+from recorder_module import record_frame
+from metrics_module import bot_metrics
+from scheduler_module import spawn, Offload
+
+class DigitRecognizer:
+    """Распознавание номеров по отдельным цифрам.
+    
+    Эталоны цифр 0-9 вырезаются из шаблонов number_N.jpg при загрузке. На кадре
+    яркие связные области размером с цифру группируются в кандидаты, каждый
+    кандидат проверяется по «пустой» плашке номера, затем цифры внутри плашки
+    сегментируются по связным компонентам и сравниваются с эталонами. Стоимость
+    зависит от количества цифр на экране, а не от количества возможных номеров.
+    """
+    
+    def __init__(self, glyph_size=(10, 12), threshold_ratio=0.45):
+        self.glyph_size = glyph_size  # Размер вектора признаков цифры (ширина, высота)
+        self.threshold_ratio = threshold_ratio  # Порог яркости цифры между фоном плашки и максимумом
+        self.digit_confidence = 0.6
+        self.tile_confidence = 0.45
+        self.features = np.empty((0, glyph_size[0] * glyph_size[1]), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self.tile = None  # Пустая плашка без цифр
+        self.tile_size = 34
+        self.glyph_height = 11
+    
+    @property
+    def ready(self) -> bool:
+        """Есть ли эталоны для всех цифр 0-9"""
+        return self.tile is not None and len(set(self.labels.tolist())) == 10
+    
+    def segment(self, tile: np.ndarray) -> Tuple[np.ndarray, List[Tuple[int, int, int, int]]]:
+        """Выделяет цифры на плашке: возвращает бинарную маску и рамки (x0, x1, y0, y1) слева направо"""
+        height, width = tile.shape
+        background = float(np.median(tile[height // 4:3 * height // 4, width // 4:3 * width // 4]))
+        threshold = background + self.threshold_ratio * (float(tile.max()) - background)
+        binary = (tile > threshold).astype(np.uint8)
+        
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        components = sorted((stats[i] for i in range(1, count) if stats[i][4] >= 3), key=lambda c: c[0])
+        
+        # Части одной цифры, перекрывающиеся по горизонтали, объединяем
+        glyphs = []
+        for x, y, w, h, _ in components:
+            if glyphs and x <= glyphs[-1][1]:
+                glyphs[-1] = [glyphs[-1][0], max(glyphs[-1][1], x + w),
+                              min(glyphs[-1][2], y), max(glyphs[-1][3], y + h)]
+            else:
+                glyphs.append([x, x + w, y, y + h])
+        glyphs = [g for g in glyphs if g[3] - g[2] >= height * 0.2]
+        
+        # Слипшиеся цифры разрезаем по самому тёмному столбцу в середине
+        boxes = []
+        for x0, x1, y0, y1 in glyphs:
+            glyph_width, glyph_height = x1 - x0, y1 - y0
+            if glyph_width > 1.1 * glyph_height:
+                projection = binary[y0:y1, x0:x1].sum(axis=0)
+                lo, hi = glyph_width // 3, glyph_width - glyph_width // 3
+                cut = x0 + lo + int(np.argmin(projection[lo:hi]))
+                boxes += [(x0, cut, y0, y1), (cut + 1, x1, y0, y1)]
+            else:
+                boxes.append((x0, x1, y0, y1))
+        return binary, boxes
+    
+    def feature(self, tile: np.ndarray, box: Tuple[int, int, int, int]) -> np.ndarray:
+        """Вектор признаков цифры: окно с сохранением пропорций, нормированное по яркости"""
+        x0, x1, y0, y1 = box
+        window = max(x1 - x0, int(round(0.8 * (y1 - y0))))
+        left = int(round((x0 + x1) / 2 - window / 2))
+        padded = cv2.copyMakeBorder(tile, 0, 0, window, window, cv2.BORDER_REPLICATE)
+        crop = padded[y0:y1, left + window:left + 2 * window]
+        
+        vector = cv2.resize(crop, self.glyph_size, interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        vector -= vector.mean()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def learn(self, number_images: dict):
+        """Строит эталоны цифр и пустую плашку по шаблонам номеров"""
+        features, labels, tiles, sizes, heights = [], [], [], [], []
+        for number, filename in number_images.items():
+            template = template_matcher.templates.get(filename)
+            if template is None:
+                continue
+            
+            tile = template.gray
+            binary, boxes = self.segment(tile)
+            digits = str(number)
+            if len(boxes) != len(digits):
+                print(f"⚠️ Не удалось разделить на цифры шаблон {filename}")
+                continue
+            
+            for digit, box in zip(digits, boxes):
+                features.append(self.feature(tile, box))
+                labels.append(int(digit))
+                heights.append(box[3] - box[2])
+            
+            # Пустая плашка: пиксели цифр заменяем фоном
+            height, width = tile.shape
+            background = np.median(tile[height // 4:3 * height // 4, width // 4:3 * width // 4])
+            blank = tile.copy()
+            blank[cv2.dilate(binary, np.ones((3, 3), np.uint8)) > 0] = background
+            tiles.append(blank)
+            sizes.append(max(height, width))
+        
+        if not tiles:
+            return
+        
+        self.features = np.array(features, dtype=np.float32)
+        self.labels = np.array(labels, dtype=np.int32)
+        self.tile_size = int(np.median(sizes))
+        self.glyph_height = int(np.median(heights))
+        size = (self.tile_size, self.tile_size)
+        self.tile = np.mean([cv2.resize(t, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+                             for t in tiles], axis=0).astype(np.uint8)
+    
+    def classify(self, tile: np.ndarray, box: Tuple[int, int, int, int]) -> Tuple[int, float]:
+        """Возвращает цифру и её схожесть с ближайшим эталоном"""
+        scores = self.features @ self.feature(tile, box)
+        best = int(np.argmax(scores))
+        return int(self.labels[best]), float(scores[best])
+    
+    def read(self, tile: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Читает номер на плашке: (значение, минимальная схожесть цифр)"""
+        _, boxes = self.segment(tile)
+        if not boxes:
+            return None
+        
+        digits, score = "", 1.0
+        for box in boxes:
+            digit, digit_score = self.classify(tile, box)
+            digits += str(digit)
+            score = min(score, digit_score)
+        return int(digits), score
+    
+    def detect(self, frame: np.ndarray, origin: Tuple[int, int] = (0, 0), scale: float = 1.0,
+               uncertain: Optional[List[Tuple[int, int, int, int]]] = None
+               ) -> List[Tuple[int, Tuple[int, int, int, int], float]]:
+        """Находит все номера на кадре за один проход: [(номер, (x, y, w, h), score)].
+        Плашки, цифры которых не прочитались уверенно, добавляются в uncertain"""
+        if not self.ready:
+            return []
+        
+        gray = to_gray(frame)
+        tile_size = max(8, int(round(self.tile_size * scale)))
+        glyph_height = self.glyph_height * scale
+        
+        # Яркие пятна заметно светлее локального фона
+        block = max(3, tile_size // 2 | 1)
+        bright = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                       cv2.THRESH_BINARY, block, -30)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(bright, connectivity=8)
+        x, y, w, h, area = stats[1:].T
+        keep = ((h >= glyph_height * 0.6) & (h <= glyph_height * 1.5)
+                & (w <= h * 2.2) & (area >= 3))
+        
+        # Соседние цифры одного номера объединяем в кандидатов
+        groups: List[List[Tuple[float, float]]] = []
+        for cx, cy in sorted(zip(x[keep] + w[keep] / 2, y[keep] + h[keep] / 2)):
+            for group in groups:
+                last_x, last_y = group[-1]
+                if abs(last_y - cy) < glyph_height * 0.4 and cx - last_x < glyph_height * 1.2:
+                    group.append((cx, cy))
+                    break
+            else:
+                groups.append([(cx, cy)])
+        
+        tile_template = self.tile
+        if tile_size != self.tile_size:
+            tile_template = cv2.resize(self.tile, (tile_size, tile_size), interpolation=cv2.INTER_LINEAR)
+        
+        detections = []
+        margin = max(2, tile_size // 8)
+        for group in groups:
+            cx = sum(p[0] for p in group) / len(group)
+            cy = sum(p[1] for p in group) / len(group)
+            x0, y0 = int(cx - tile_size / 2), int(cy - tile_size / 2)
+            if x0 < 0 or y0 < 0 or x0 + tile_size > gray.shape[1] or y0 + tile_size > gray.shape[0]:
+                continue
+            
+            # Проверяем, что вокруг цифр действительно плашка номера
+            roi = gray[max(0, y0 - margin):y0 + tile_size + margin, max(0, x0 - margin):x0 + tile_size + margin]
+            tile_score = float(cv2.matchTemplate(roi, tile_template, cv2.TM_CCOEFF_NORMED).max())
+            if tile_score < self.tile_confidence:
+                continue
+            
+            location = (origin[0] + x0, origin[1] + y0, tile_size, tile_size)
+            result = self.read(gray[y0:y0 + tile_size, x0:x0 + tile_size])
+            if result is None or result[1] < self.digit_confidence:
+                if uncertain is not None:
+                    uncertain.append(location)
+                continue
+            
+            value, score = result
+            detections.append((value, location, score))
+        
+        detections.sort(key=lambda item: item[2], reverse=True)
+        return detections
 
 class NumberBot:
     """Класс для автоматической работы с номерами"""
     
     def __init__(self):
         self.running = False
-        self.thread = None
+        self.task = None
         self.number_images = {}
         self.confidence = 0.8
+        self.change_detector = ChangeDetector()
+        self.last_detections = []
+        self.metrics = bot_metrics('number')
+        self.input = input_source('number')
+        self.recognizer = DigitRecognizer()
         self.load_number_images()
+        self.recognizer.learn(self.number_images)
         
     def load_number_images(self):
         """Загружает все изображения номеров"""
         for i in range(1, 21):  # number_1.jpg до number_20.jpg
             filename = f"number_{i}.jpg"
-            if os.path.exists(filename):
+            if template_matcher.load(filename, remember_hit=True):
                 self.number_images[i] = filename
                 print(f"✅ Загружен номер {i}: {filename}")
             else:
                 print(f"⚠️ Не найден номер {i}: {filename}")
+        template_matcher.save_cache()
     
     def find_number(self, number: int) -> Optional[Tuple[int, int, int, int]]:
         """Ищет конкретный номер на экране"""
         if number not in self.number_images:
-            print(f"Изображение для номера {number} не найдено")
+            # Номера без шаблона ищем распознаванием цифр
+            for value, location, _ in self.detect_numbers():
+                if value == number:
+                    return location
             return None
         
         try:
-            location = pyautogui.locateOnScreen(
+            return template_matcher.find(
                 self.number_images[number], 
                 confidence=self.confidence
             )
-            if location:
-                return (location.left, location.top, location.width, location.height)
         except Exception as e:
             print(f"Ошибка поиска номера {number}: {e}")
         return None
     
+    def detect_numbers(self, frame=None, origin: Tuple[int, int] = (0, 0)) -> List[Tuple[int, Tuple[int, int, int, int], float]]:
+        """Находит все номера на одном кадре и возвращает попадания в виде
+        (номер, (x, y, w, h), score), отсортированные по убыванию score.
+        Если эталоны цифр построены, используется распознавание цифр, а плашки с
+        неуверенно прочитанными цифрами проверяются шаблонами номеров. Без эталонов
+        шаблоны номеров сопоставляются со всем кадром"""
+        if frame is None:
+            frame, origin = template_matcher.capture()
+        frame = template_matcher.prepare(frame)
+        
+        if not self.recognizer.ready:
+            return self._deduplicate(self._match_templates(frame, origin))
+        
+        scale = template_matcher.scale or template_matcher.scale_hint
+        uncertain = []
+        detections = self.recognizer.detect(frame, origin, scale, uncertain)
+        for x, y, w, h in uncertain:
+            # Область плашки с запасом на разницу масштаба шаблонов
+            left, top = max(0, x - origin[0] - w // 2), max(0, y - origin[1] - h // 2)
+            right, bottom = x - origin[0] + w + w // 2, y - origin[1] + h + h // 2
+            detections += self._match_templates(frame[top:bottom, left:right],
+                                                (origin[0] + left, origin[1] + top))
+        return self._deduplicate(detections)
+    
+    def _match_templates(self, frame: np.ndarray,
+                         origin: Tuple[int, int]) -> List[Tuple[int, Tuple[int, int, int, int], float]]:
+        """Сопоставляет кадр (или его часть) с каждым шаблоном номера"""
+        hits = []
+        for number, filename in self.number_images.items():
+            hit = template_matcher.match(filename, frame, origin, self.confidence)
+            if hit:
+                x, y, w, h, score = hit
+                hits.append((number, (x, y, w, h), score))
+        return hits
+    
+    def _deduplicate(self, hits: List[Tuple[int, Tuple[int, int, int, int], float]]
+                     ) -> List[Tuple[int, Tuple[int, int, int, int], float]]:
+        """Из перекрывающихся попаданий оставляет самое уверенное"""
+        hits.sort(key=lambda item: item[2], reverse=True)
+        detections = []
+        for hit in hits:
+            if not any(self._overlaps(hit[1], kept[1]) for kept in detections):
+                detections.append(hit)
+        return detections
+    
+    @staticmethod
+    def _overlaps(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> bool:
+        """Проверяет, что центр одной области лежит внутри другой"""
+        cx, cy = a[0] + a[2] // 2, a[1] + a[3] // 2
+        return b[0] <= cx < b[0] + b[2] and b[1] <= cy < b[1] + b[3]
+    
     def find_any_number(self) -> Optional[Tuple[int, int, int, int, int]]:
         """Ищет любой номер на экране и возвращает его значение и позицию"""
-        for number, filename in self.number_images.items():
-            try:
-                location = pyautogui.locateOnScreen(
-                    filename, 
-                    confidence=self.confidence
-                )
-                if location:
-                    return (number, location.left, location.top, location.width, location.height)
-            except Exception as e:
-                continue
+        try:
+            detections = self.detect_numbers()
+        except Exception as e:
+            print(f"Ошибка поиска номеров: {e}")
+            return None
+        
+        if detections:
+            number, location, _ = detections[0]
+            return (number,) + location
         return None
     
-    def click_number(self, location: Tuple[int, int, int, int]) -> bool:
-        """Кликает по номеру"""
+    def click_number(self, location: Tuple[int, int, int, int], pause: float = 0.5) -> bool:
+        """Кликает по номеру (и ждёт pause секунд, пока игра отреагирует)"""
         try:
             # Вычисляем центр изображения
             center_x = location[0] + location[2] // 2
             center_y = location[1] + location[3] // 2
             
             # Кликаем по центру
-            pydirectinput.click(center_x, center_y)
-            time.sleep(0.5)
+            self.input.direct_click(center_x, center_y)
+            sleep(pause)
             return True
         except Exception as e:
             print(f"Ошибка клика по номеру: {e}")
@@ -100,45 +353,57 @@ class NumberBot:
         return None
     
     def run_number_loop(self, target_number: Optional[int] = None, debug: bool = False):
-        """Основной цикл работы с номерами"""
+        """Основной цикл работы с номерами (задача планировщика)"""
         print(f"🔢 Запуск цикла номеров (цель: {target_number or 'любой'})...")
         
         while self.running:
             try:
-                if target_number:
-                    # Ищем конкретный номер
-                    location = self.find_number(target_number)
-                    if location:
-                        if debug:
-                            print(f"Найден номер {target_number} в позиции: {location}")
-                        
-                        if self.click_number(location):
-                            print(f"✅ Кликнул по номеру {target_number}")
-                            time.sleep(1)
-                    else:
-                        if debug:
-                            print(f"Номер {target_number} не найден")
+                frame, origin = yield from template_matcher.capture_task()
+                self.metrics.observe('capture', template_matcher.capture_duration)
+                timestamp = now()
+                clicked = None
+                
+                # Сопоставляем шаблоны только если экран изменился
+                with self.metrics.stage('match'):
+                    if self.change_detector.changed(frame):
+                        self.last_detections = yield Offload(self.detect_numbers, frame, origin)
+                    elif debug:
+                        print("Экран не изменился, использую предыдущий результат")
+                
+                with self.metrics.stage('decide'):
+                    detections = self.last_detections
+                    if target_number:
+                        # Ищем конкретный номер
+                        detections = [d for d in detections if d[0] == target_number]
+                self.metrics.iteration(hit=bool(detections))
+                
+                if detections:
+                    number, location, score = detections[0]
+                    if debug:
+                        found = ", ".join(f"{n}:{s:.2f}" for n, _, s in detections)
+                        print(f"Найден номер {number} в позиции: {location} (все: {found})")
+                    
+                    x, y, w, h = location
+                    request = yield self.input.direct_click(x + w // 2, y + h // 2, wait=False)
+                    if request.error is None:
+                        print(f"✅ Кликнул по номеру {number}")
+                        clicked = number
+                        yield 1.5
                 else:
-                    # Ищем любой номер
-                    result = self.find_any_number()
-                    if result:
-                        number, x, y, w, h = result
-                        if debug:
-                            print(f"Найден номер {number} в позиции: ({x}, {y}, {w}, {h})")
-                        
-                        if self.click_number((x, y, w, h)):
-                            print(f"✅ Кликнул по номеру {number}")
-                            time.sleep(1)
-                    else:
-                        if debug:
-                            print("Номера не найдены")
+                    if debug:
+                        print(f"Номер {target_number} не найден" if target_number else "Номера не найдены")
+                
+                record_frame('number', frame, origin, timestamp, {
+                    'detections': [(n, loc, round(score, 3)) for n, loc, score in self.last_detections],
+                    'click': clicked,
+                })
                 
                 # Пауза между циклами
-                time.sleep(2)
+                yield 2
                 
             except Exception as e:
                 print(f"Ошибка в цикле номеров: {e}")
-                time.sleep(1)
+                yield 1
         
         print("🛑 Цикл номеров остановлен")
     
@@ -149,12 +414,9 @@ class NumberBot:
             return False
         
         self.running = True
-        self.thread = threading.Thread(
-            target=self.run_number_loop, 
-            args=(target_number, debug),
-            daemon=True
-        )
-        self.thread.start()
+        self.change_detector.reset()
+        self.last_detections = []
+        self.task = spawn(self.run_number_loop(target_number, debug), "number")
         print(f"✅ Работа с номерами запущена (цель: {target_number or 'любой'})")
         return True
     
@@ -165,8 +427,9 @@ class NumberBot:
             return False
         
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=2)
+        if self.task:
+            self.task.cancel()
+            self.task = None
         print("🛑 Работа с номерами остановлена")
         return True
     
@@ -180,11 +443,8 @@ class NumberBot:
     
     def test_all_numbers(self) -> dict:
         """Тестирует поиск всех номеров"""
-        results = {}
-        for number in self.get_available_numbers():
-            location = self.find_number(number)
-            results[number] = location is not None
-        return results
+        found = {number for number, _, _ in self.detect_numbers()}
+        return {number: number in found for number in self.get_available_numbers()}
 
 # Глобальный экземпляр бота
 number_bot = NumberBot()
@@ -232,13 +492,12 @@ if __name__ == "__main__":
         status = "✅" if found else "❌"
         print(f"{status} Номер {number}: {'найден' if found else 'не найден'}")
     
-    # Тестируем поиск любого номера
-    print("\n🎯 Поиск любого номера:")
-    result = number_bot.find_any_number()
-    if result:
-        number, x, y, w, h = result
-        print(f"✅ Найден номер {number} в позиции: ({x}, {y}, {w}, {h})")
-    else:
+    # Тестируем поиск всех номеров за один захват
+    print("\n🎯 Поиск всех номеров на одном кадре:")
+    detections = number_bot.detect_numbers()
+    for number, location, score in detections:
+        print(f"✅ Найден номер {number} в позиции: {location} (score {score:.2f})")
+    if not detections:
         print("ℹ️ Номера не найдены (это нормально, если игра не запущена)")
     
     print("\n🎯 Модуль номеров готов к использованию")
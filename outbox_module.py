@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль исходящих сообщений Telegram - очередь, которую разбирает один поток.
+
+Обработчики команд и задачи ботов не ждут сети: send_message / send_document /
+send_photo только ставят сообщение в очередь и сразу возвращаются. Поток отправки
+соблюдает ограничения Telegram (около 30 сообщений в секунду всего и около одного
+в секунду на чат, с небольшими всплесками), при ответе 429 ждёт указанное сервером
+время, при сетевых ошибках повторяет с нарастающей паузой. Сообщения с одинаковым
+ключом в один чат, которые ещё не ушли, сливаются: уходит только последнее, поэтому
+частые переключения кнопок не копят очередь устаревших статусов. Клавиатуру можно
+передать функцией - она построится в момент отправки и покажет текущее состояние.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, Optional
+
+# Ограничения Telegram Bot API
+GLOBAL_INTERVAL = 1 / 30   # Не чаще 30 сообщений в секунду на бота
+CHAT_RATE = 1.0            # Сообщений в секунду в один чат
+CHAT_BURST = 3             # Сколько сообщений в чат можно отправить подряд
+# Повторы при ошибках сети
+MAX_ATTEMPTS = 5
+BACKOFF_START = 1.0
+BACKOFF_MAX = 30.0
+# Сколько сообщений может ждать отправки (новые сверх этого отбрасываются)
+MAX_QUEUE = 500
+
+class OutboundMessage:
+    """Исходящее сообщение: метод бота, чат и аргументы"""
+
+    def __init__(self, method: str, chat_id: int, args: tuple, kwargs: Dict[str, Any],
+                 key: Optional[Hashable] = None):
+        self.method = method
+        self.chat_id = chat_id
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.queued_at = time.perf_counter()
+        self.attempts = 0
+        self.not_before = 0.0  # perf_counter, раньше которого повтор не отправляется
+
+    def call(self, bot):
+        """Отправляет сообщение (файлы перематываются в начало для повтора)"""
+        kwargs = dict(self.kwargs)
+        markup = kwargs.get('reply_markup')
+        if callable(markup):
+            kwargs['reply_markup'] = markup()
+        for arg in self.args:
+            if hasattr(arg, 'seek'):
+                arg.seek(0)
+        return getattr(bot, self.method)(self.chat_id, *self.args, **kwargs)
+
+class ChatLimit:
+    """Ведро токенов одного чата"""
+
+    def __init__(self):
+        self.tokens = float(CHAT_BURST)
+        self.updated = time.perf_counter()
+        self.blocked_until = 0.0  # После 429 чат ждёт retry_after
+
+    def ready_at(self, current: float) -> float:
+        """Когда в чат можно отправить следующее сообщение"""
+        self.tokens = min(CHAT_BURST, self.tokens + (current - self.updated) * CHAT_RATE)
+        self.updated = current
+        at = current if self.tokens >= 1 else current + (1 - self.tokens) / CHAT_RATE
+        return max(at, self.blocked_until)
+
+class Outbox:
+    """Очередь исходящих сообщений и поток, который её отправляет"""
+
+    def __init__(self, bot=None):
+        self.bot = bot
+        self.condition = threading.Condition()
+        self.queue: Deque[OutboundMessage] = deque()
+        self.keyed: Dict[Hashable, OutboundMessage] = {}
+        self.chats: Dict[int, ChatLimit] = {}
+        self.thread = None
+        self.next_global = 0.0
+        self.sending = False
+        self.sent = 0
+        self.merged = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def attach(self, bot):
+        """Задаёт бота, через которого уходят сообщения"""
+        with self.condition:
+            self.bot = bot
+            self.condition.notify_all()
+
+    def _ensure_started(self):
+        """Запускает поток отправки при первом сообщении (вызывается под блокировкой)"""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="telegram-out", daemon=True)
+            self.thread.start()
+
+    def put(self, method: str, chat_id: int, *args, key: Optional[Hashable] = None, **kwargs) -> bool:
+        """Ставит сообщение в очередь, не дожидаясь отправки. Сообщение с тем же ключом
+        в тот же чат, которое ещё ждёт, заменяется новым на своём месте в очереди"""
+        message = OutboundMessage(method, chat_id, args, kwargs, key)
+        with self.condition:
+            self._ensure_started()
+            if key is not None:
+                waiting = self.keyed.get((chat_id, key))
+                if waiting is not None:
+                    waiting.method, waiting.args, waiting.kwargs = method, args, kwargs
+                    waiting.attempts = 0
+                    self.merged += 1
+                    self.condition.notify_all()
+                    return True
+            if len(self.queue) >= MAX_QUEUE:
+                self.dropped += 1
+                print(f"Очередь Telegram переполнена, сообщение в чат {chat_id} отброшено")
+                return False
+            self.queue.append(message)
+            if key is not None:
+                self.keyed[(chat_id, key)] = message
+            self.condition.notify_all()
+        return True
+
+    def _chat(self, chat_id: int) -> ChatLimit:
+        limit = self.chats.get(chat_id)
+        if limit is None:
+            limit = self.chats[chat_id] = ChatLimit()
+        return limit
+
+    def _next(self) -> OutboundMessage:
+        """Ждёт сообщение, которое уже можно отправить, и снимает его с очереди.
+        Чат, упёршийся в ограничение, не задерживает сообщения в другие чаты"""
+        with self.condition:
+            while True:
+                current = time.perf_counter()
+                wait = None
+                if self.bot is not None:
+                    checked = set()
+                    for message in self.queue:
+                        if message.chat_id in checked:
+                            continue  # В каждом чате сообщения уходят по порядку
+                        checked.add(message.chat_id)
+                        at = max(self._chat(message.chat_id).ready_at(current),
+                                 message.not_before, self.next_global)
+                        if at <= current:
+                            self.queue.remove(message)
+                            if message.key is not None and self.keyed.get((message.chat_id, message.key)) is message:
+                                del self.keyed[(message.chat_id, message.key)]
+                            self.sending = True
+                            return message
+                        wait = at - current if wait is None else min(wait, at - current)
+                self.condition.wait(wait)
+
+    def _send(self, message: OutboundMessage):
+        """Отправляет сообщение; при ошибке возвращает его в начало очереди чата"""
+        current = time.perf_counter()
+        limit = self._chat(message.chat_id)
+        limit.tokens -= 1
+        self.next_global = current + GLOBAL_INTERVAL
+        message.attempts += 1
+        try:
+            message.call(self.bot)
+            self.sent += 1
+            return
+        except Exception as e:
+            error = e
+
+        code = getattr(error, 'error_code', None)
+        if code == 429:
+            # Сервер сам говорит, сколько ждать; ждёт весь чат, попытка не считается
+            parameters = (getattr(error, 'result_json', None) or {}).get('parameters') or {}
+            retry_after = float(parameters.get('retry_after', BACKOFF_START))
+            limit.blocked_until = time.perf_counter() + retry_after
+            message.attempts -= 1
+            print(f"Telegram: слишком много запросов, пауза {retry_after:.0f} с для чата {message.chat_id}")
+        elif (code is not None and 400 <= code < 500) or message.attempts >= MAX_ATTEMPTS:
+            # Ошибка в самом запросе (или сеть так и не ответила) - повтор не поможет
+            self.dropped += 1
+            print(f"Не удалось отправить сообщение в чат {message.chat_id}: {error}")
+            return
+        else:
+            backoff = min(BACKOFF_MAX, BACKOFF_START * 2 ** (message.attempts - 1))
+            message.not_before = time.perf_counter() + backoff
+            print(f"Ошибка отправки сообщения: {error}. Повтор через {backoff:.0f} с")
+
+        with self.condition:
+            self.retries += 1
+            if message.key is not None:
+                newer = self.keyed.get((message.chat_id, message.key))
+                if newer is not None:
+                    return  # Пока отправляли, пришла более свежая версия
+                self.keyed[(message.chat_id, message.key)] = message
+            self.queue.appendleft(message)
+
+    def _run(self):
+        while True:
+            message = self._next()
+            try:
+                self._send(message)
+            finally:
+                with self.condition:
+                    self.sending = False
+                    self.condition.notify_all()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Ждёт, пока очередь опустеет (например, перед выключением)"""
+        deadline = time.perf_counter() + timeout
+        with self.condition:
+            while self.queue or self.sending:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """Отправлено, слито, повторов, отброшено и ждёт в очереди"""
+        with self.condition:
+            return {'sent': self.sent, 'merged': self.merged, 'retries': self.retries,
+                    'dropped': self.dropped, 'queued': len(self.queue)}
+
+    def summary(self) -> str:
+        """Строка для /stats"""
+        stats = self.get_stats()
+        return (f"📨 Telegram: отправлено {stats['sent']}, слито {stats['merged']}, "
+                f"повторов {stats['retries']}, отброшено {stats['dropped']}, в очереди {stats['queued']}")
+
+# Глобальная очередь исходящих сообщений
+outbox = Outbox()
+
+def attach_bot(bot):
+    """Задаёт бота для отправки сообщений"""
+    outbox.attach(bot)
+
+def send_message(chat_id: int, text: str, key: Optional[Hashable] = None, **kwargs) -> bool:
+    """Ставит текстовое сообщение в очередь (reply_markup может быть функцией)"""
+    return outbox.put('send_message', chat_id, text, key=key, **kwargs)
+
+def send_document(chat_id: int, document, key: Optional[Hashable] = None, **kwargs) -> bool:
+    """Ставит файл в очередь"""
+    return outbox.put('send_document', chat_id, document, key=key, **kwargs)
+
+def send_photo(chat_id: int, photo, key: Optional[Hashable] = None, **kwargs) -> bool:
+    """Ставит фото в очередь"""
+    return outbox.put('send_photo', chat_id, photo, key=key, **kwargs)
+
+def flush(timeout: float = 5.0) -> bool:
+    """Ждёт отправки всех сообщений из очереди"""
+    return outbox.flush(timeout)
+
+def get_summary() -> str:
+    """Возвращает сводку очереди для /stats"""
+    return outbox.summary()
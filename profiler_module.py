@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль профилирования - семплирующий профайлер всех потоков процесса.
+
+Отдельный поток с заданной частотой снимает стеки всех потоков через
+sys._current_frames() и считает одинаковые стеки. Во время замера хранятся только
+кортежи объектов кода, имена функций собираются один раз в конце, поэтому профайлер
+можно запускать прямо на работающей сессии. Результат - таблица самых горячих
+функций и файл свёрнутых стеков (формат flamegraph.pl / speedscope / inferno).
+
+Боты выполняются задачами в одном потоке планировщика, поэтому снимки потоков
+планировщика подписываются задачей, которая выполнялась в момент снимка
+("scheduler/kachalka"), - иначе все боты слились бы в один поток.
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+from scheduler_module import scheduler
+
+# Частота семплирования по умолчанию (раз в секунду) и ограничения команды /profile
+SAMPLE_RATE = 100
+MAX_SECONDS = 300
+TOP_FUNCTIONS = 25
+MAX_DEPTH = 128
+
+class ProfileResult:
+    """Результат замера: число снимков и счётчик стеков (поток, коды функций)"""
+
+    def __init__(self, stacks: Counter, samples: int, duration: float, overhead: float):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.overhead = overhead
+        self._labels: Dict[object, str] = {}
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            label = self._labels[code] = label.replace(';', ',')
+        return label
+
+    def threads(self) -> List[Tuple[str, int]]:
+        """Потоки и число их снимков, самые частые сначала"""
+        counts: Counter = Counter()
+        for (thread, _), count in self.stacks.items():
+            counts[thread] += count
+        return counts.most_common()
+
+    def top(self, limit: int = TOP_FUNCTIONS) -> List[Tuple[str, int, int]]:
+        """Самые горячие функции: (функция, собственные снимки, снимки со вложенными)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for (_, codes), count in self.stacks.items():
+            if not codes:
+                continue
+            own[codes[-1]] += count
+            for code in set(codes):
+                total[code] += count
+
+        rows = sorted(total, key=lambda code: (own[code], total[code]), reverse=True)[:limit]
+        return [(self._label(code), own[code], total[code]) for code in rows]
+
+    def report(self, limit: int = TOP_FUNCTIONS) -> str:
+        """Текстовая таблица: потоки и самые горячие функции в процентах снимков стеков"""
+        stack_samples = sum(self.stacks.values()) or 1
+        lines = [
+            f"Профиль: {self.duration:.1f} с, {self.samples} снимков "
+            f"({self.samples / self.duration if self.duration else 0:.0f}/с), "
+            f"нагрузка профайлера {self.overhead * 100:.1f}% одного ядра",
+            "",
+            "Потоки (доля снимков):",
+        ]
+        for thread, count in self.threads():
+            lines.append(f"  {count / self.samples * 100 if self.samples else 0:5.1f}%  {thread}")
+
+        lines += ["", f"{'собств.':>8} {'всего':>8}  функция"]
+        for label, own, total in self.top(limit):
+            lines.append(f"{own / stack_samples * 100:7.1f}% {total / stack_samples * 100:7.1f}%  {label}")
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self) -> str:
+        """Свёрнутые стеки: 'поток;внешняя;...;внутренняя число' на строку"""
+        lines = []
+        for (thread, codes), count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+            frames = [thread.replace(';', ',').replace(' ', '_')]
+            frames.extend(self._label(code) for code in codes)
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+class SamplingProfiler:
+    """Семплирующий профайлер: один замер за раз"""
+
+    def __init__(self, rate: int = SAMPLE_RATE):
+        self.rate = rate
+        self.lock = threading.Lock()
+
+    def _sample(self, stacks: Counter, own_ident: int):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        for ident, task in scheduler.running_tasks().items():
+            if ident in names:
+                names[ident] = f"{names[ident]}/{task}"
+        for ident, frame in frames.items():
+            if ident == own_ident:
+                continue
+            codes = []
+            while frame is not None and len(codes) < MAX_DEPTH:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            codes.reverse()
+            stacks[(names.get(ident, f"thread-{ident}"), tuple(codes))] += 1
+
+    def profile(self, seconds: float) -> ProfileResult:
+        """Снимает стеки всех потоков в течение seconds секунд (реального времени)"""
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError("Профилирование уже идёт")
+        try:
+            stacks: Counter = Counter()
+            own_ident = threading.get_ident()
+            interval = 1.0 / self.rate
+            samples = 0
+            busy = 0.0
+
+            started = time.perf_counter()
+            deadline = started + seconds
+            next_sample = started
+            while True:
+                sample_started = time.perf_counter()
+                if sample_started >= deadline:
+                    break
+                self._sample(stacks, own_ident)
+                samples += 1
+                finished = time.perf_counter()
+                busy += finished - sample_started
+
+                # Снимки идут по сетке, без накопления сдвига от собственной работы
+                next_sample += interval
+                if next_sample < finished:
+                    next_sample = finished
+                time.sleep(max(0.0, min(next_sample, deadline) - finished))
+
+            duration = time.perf_counter() - started
+            return ProfileResult(stacks, samples, duration, busy / duration if duration else 0.0)
+        finally:
+            self.lock.release()
+
+    def is_running(self) -> bool:
+        return self.lock.locked()
+
+# Глобальный профайлер
+sampling_profiler = SamplingProfiler()
+
+def profile(seconds: float) -> ProfileResult:
+    """Профилирует все потоки процесса seconds секунд"""
+    return sampling_profiler.profile(seconds)
+
+def is_profiling() -> bool:
+    """Проверяет, идёт ли профилирование"""
+    return sampling_profiler.is_running()
+
+if __name__ == "__main__":
+    # Самопроверка: профиль занятого потока в этом процессе
+    def busy_loop():
+        while True:
+            sum(i * i for i in range(10000))
+
+    threading.Thread(target=busy_loop, name="busy", daemon=True).start()
+    result = profile(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
+    print(result.report(10))
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль записи сессий - кадры, которые видели боты, их время и принятые решения
+пишутся в кольцевой файл фиксированного размера, отображённый в память, а источник
+повтора подаёт записанные кадры обратно в циклы ботов быстрее реального времени.
+
+Формат файла: заголовок, таблица индекса на index_slots записей (запись seq
+лежит в ячейке seq % index_slots) и кольцо данных data_size байт. Данные записи -
+кадр, сжатый PNG без потерь, и решение бота в JSON. Записи кладутся в кольцо друг
+за другом; если запись не помещается до конца кольца, она начинается с нуля.
+Старые записи затираются новыми, в файле всегда остаются самые свежие.
+Когда поток записи не успевает сжимать кадры, они пишутся без сжатия.
+
+Качалка смотрит на экран до 100 раз в секунду, и даже сжатые кадры с такой частотой
+не поместятся в файл разумного размера на всю сессию. Поэтому каждый бот пишет не
+больше RECORD_FPS кадров в секунду, а кадры, на которых бот действовал (нажатие,
+клик), - всегда. Размер файла считается от длины сессии: SESSION_MINUTES минут при
+RECORD_FPS кадрах в секунду по FRAME_KB килобайт.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+from typing import Optional, Tuple, List, Dict, Any, Callable
+
+import backend_module
+from backend_module import ScreenSource
+
+MAGIC = b'BOTREC01'
+HEADER_SIZE = 4096
+SESSIONS_DIR = "sessions"
+
+# Длина сессии, которую должен вмещать файл записи
+SESSION_MINUTES = 30
+RECORD_FPS = 10   # Кадров в секунду на бота без действий (0 - писать все кадры)
+FRAME_KB = 150    # Средний размер кадра области бота в PNG (оценка)
+RECORD_BOTS = 2   # Сколько ботов обычно пишут одновременно
+
+# Ключи решения, по которым видно, что бот на этом кадре действовал
+ACTION_KEYS = ('press', 'click', 'interact')
+
+# Способ хранения кадра в записи
+CODEC_RAW = 0
+CODEC_PNG = 1
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('data_size', '<u8'),
+    ('index_slots', '<u8'),
+    ('records', '<u8'),       # Сколько записей сделано за всё время
+    ('write_offset', '<u8'),  # Куда в кольце данных пойдёт следующая запись
+    ('screen_width', '<u4'),  # Размер экрана, на котором шла запись
+    ('screen_height', '<u4'),
+])
+
+INDEX_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('timestamp', '<f8'),
+    ('offset', '<u8'),
+    ('span', '<u8'),  # Занятое место в кольце с учётом пропущенного хвоста
+    ('frame_length', '<u4'),
+    ('decision_length', '<u4'),
+    ('left', '<i4'),
+    ('top', '<i4'),
+    ('width', '<u4'),
+    ('height', '<u4'),
+    ('channels', 'u1'),
+    ('codec', 'u1'),
+])
+
+class SessionFile:
+    """Кольцевой файл записи сессии, отображённый в память"""
+
+    def __init__(self, path: str, size_mb: int = 1024, index_slots: int = 65536, create: bool = False,
+                 screen_size: Tuple[int, int] = (0, 0)):
+        self.path = path
+        if create:
+            data_size = size_mb * 1024 * 1024
+            with open(path, 'wb') as f:
+                f.truncate(HEADER_SIZE + index_slots * INDEX_DTYPE.itemsize + data_size)
+            self.header = np.memmap(path, dtype=HEADER_DTYPE, mode='r+', shape=(1,))
+            self.header['magic'] = MAGIC
+            self.header['data_size'] = data_size
+            self.header['index_slots'] = index_slots
+            self.header['screen_width'], self.header['screen_height'] = screen_size
+            mode = 'r+'
+        else:
+            self.header = np.memmap(path, dtype=HEADER_DTYPE, mode='r', shape=(1,))
+            if self.header['magic'][0] != MAGIC:
+                raise ValueError(f"{path} не является файлом записи сессии")
+            mode = 'r'
+
+        self.data_size = int(self.header['data_size'][0])
+        self.index_slots = int(self.header['index_slots'][0])
+        self.screen_size = (int(self.header['screen_width'][0]), int(self.header['screen_height'][0]))
+        self.index = np.memmap(path, dtype=INDEX_DTYPE, mode=mode, offset=HEADER_SIZE,
+                               shape=(self.index_slots,))
+        self.data = np.memmap(path, dtype=np.uint8, mode=mode,
+                              offset=HEADER_SIZE + self.index_slots * INDEX_DTYPE.itemsize,
+                              shape=(self.data_size,))
+
+    def append(self, timestamp: float, origin: Tuple[int, int], shape: Tuple[int, ...], codec: int,
+               frame_bytes: bytes, decision_bytes: bytes) -> bool:
+        """Дописывает запись в кольцо; False, если она больше всего кольца"""
+        length = len(frame_bytes) + len(decision_bytes)
+        if length > self.data_size:
+            return False
+
+        offset = int(self.header['write_offset'][0])
+        span = length
+        if offset + length > self.data_size:
+            span += self.data_size - offset
+            offset = 0
+
+        self.data[offset:offset + len(frame_bytes)] = np.frombuffer(frame_bytes, dtype=np.uint8)
+        self.data[offset + len(frame_bytes):offset + length] = np.frombuffer(decision_bytes, dtype=np.uint8)
+
+        seq = int(self.header['records'][0])
+        channels = shape[2] if len(shape) > 2 else 1
+        self.index[seq % self.index_slots] = (seq, timestamp, offset, span, len(frame_bytes),
+                                              len(decision_bytes), origin[0], origin[1], shape[1], shape[0],
+                                              channels, codec)
+        # Заголовок обновляется последним: запись видна читателю только целиком
+        self.header['write_offset'] = offset + length
+        self.header['records'] = seq + 1
+        return True
+
+    def entries(self) -> List[np.void]:
+        """Уцелевшие записи (не затёртые новыми) в порядке записи"""
+        records = int(self.header['records'][0])
+        entries = []
+        used = 0
+        for seq in range(records - 1, max(-1, records - 1 - self.index_slots), -1):
+            entry = self.index[seq % self.index_slots]
+            used += int(entry['span'])
+            if int(entry['seq']) != seq or used > self.data_size:
+                break
+            entries.append(entry.copy())
+        entries.reverse()
+        return entries
+
+    def frame(self, entry: np.void) -> np.ndarray:
+        """Декодирует кадр записи (BGRA)"""
+        offset = int(entry['offset'])
+        encoded = np.asarray(self.data[offset:offset + int(entry['frame_length'])])
+        if entry['codec'] == CODEC_RAW:
+            shape = (int(entry['height']), int(entry['width']), int(entry['channels']))
+            return encoded.reshape(shape).copy()
+        return cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+
+    def decision(self, entry: np.void) -> Dict[str, Any]:
+        """Возвращает решение бота, записанное вместе с кадром"""
+        start = int(entry['offset']) + int(entry['frame_length'])
+        raw = bytes(self.data[start:start + int(entry['decision_length'])])
+        return json.loads(raw.decode('utf-8')) if raw else {}
+
+    def flush(self):
+        self.header.flush()
+        self.index.flush()
+        self.data.flush()
+
+class SessionRecorder:
+    """Запись сессии: боты передают кадр и решение, кадр копируется в очередь,
+    а сжатие и запись в файл идут в отдельном потоке. Пока очередь заполнена
+    больше чем наполовину, кадры пишутся без сжатия, чтобы поток записи догнал
+    ботов; если очередь всё же переполнена, новые кадры отбрасываются, а цикл
+    бота не ждёт."""
+
+    def __init__(self, queue_size: int = 64, png_compression: int = 1):
+        self.file: Optional[SessionFile] = None
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.png_compression = png_compression
+        self.thread = None
+        self.active = False
+        self.record_fps = RECORD_FPS
+        self.last_kept: Dict[str, float] = {}  # Время последнего записанного кадра каждого бота
+
+        # Статистика
+        self.recorded = 0
+        self.dropped = 0
+        self.skipped = 0  # Кадры, пропущенные из-за ограничения RECORD_FPS
+
+    def start(self, path: Optional[str] = None, minutes: float = SESSION_MINUTES,
+              record_fps: float = RECORD_FPS, size_mb: Optional[int] = None,
+              index_slots: Optional[int] = None) -> str:
+        """Начинает запись в новый файл и возвращает путь к нему. Размер файла и индекса
+        считается от длины сессии в минутах, если не задан явно"""
+        if self.active:
+            return self.file.path
+
+        if path is None:
+            os.makedirs(SESSIONS_DIR, exist_ok=True)
+            path = os.path.join(SESSIONS_DIR, time.strftime('session_%Y%m%d_%H%M%S.rec'))
+
+        try:
+            screen_size = backend_module.get_screen_source().size()
+        except Exception:
+            screen_size = (0, 0)
+        frames = int(minutes * 60 * (record_fps or 100) * RECORD_BOTS)
+        if size_mb is None:
+            size_mb = max(64, -(-frames * FRAME_KB // 1024))
+        if index_slots is None:
+            index_slots = max(65536, frames)
+        self.file = SessionFile(path, size_mb, index_slots, create=True, screen_size=screen_size)
+        self.record_fps = record_fps
+        self.last_kept = {}
+        self.recorded = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.active = True
+        self.thread = threading.Thread(target=self._write_loop, name="recorder", daemon=True)
+        self.thread.start()
+        print(f"⏺️ Запись сессии: {path} ({size_mb} МБ, ~{minutes:g} мин)")
+        return path
+
+    def stop(self):
+        """Дописывает очередь и закрывает файл"""
+        if not self.active:
+            return
+        self.active = False
+        self.queue.put(None)
+        self.thread.join()
+        self.file.flush()
+        print(f"⏹️ Запись сессии остановлена: {self.recorded} кадров, отброшено {self.dropped}, "
+              f"пропущено {self.skipped}")
+
+    def record(self, bot: str, frame: np.ndarray, origin: Tuple[int, int], timestamp: float,
+               decision: Optional[Dict[str, Any]] = None):
+        """Ставит кадр (копию) и решение бота в очередь записи. Кадры без действия
+        пишутся не чаще record_fps раз в секунду на бота"""
+        if not self.active:
+            return
+        if self.record_fps:
+            acted = decision is not None and any(decision.get(key) for key in ACTION_KEYS)
+            last = self.last_kept.get(bot)
+            if not acted and last is not None and timestamp - last < 1.0 / self.record_fps:
+                self.skipped += 1
+                return
+            self.last_kept[bot] = timestamp
+        item = (bot, np.array(frame, copy=True), origin, timestamp, decision or {})
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        """Поток записи: сжатие кадров и запись в файл"""
+        params = [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            bot, frame, origin, timestamp, decision = item
+            codec, frame_bytes = CODEC_RAW, frame.tobytes()
+            if self.queue.qsize() * 2 < self.queue.maxsize:
+                ok, encoded = cv2.imencode('.png', frame, params)
+                if ok:
+                    codec, frame_bytes = CODEC_PNG, encoded.tobytes()
+
+            decision = dict(decision, bot=bot)
+            decision_bytes = json.dumps(decision, ensure_ascii=False, default=_to_json).encode('utf-8')
+            if self.file.append(timestamp, origin, frame.shape, codec, frame_bytes, decision_bytes):
+                self.recorded += 1
+            else:
+                self.dropped += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает состояние записи"""
+        return {
+            'active': self.active,
+            'path': self.file.path if self.file else None,
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'skipped': self.skipped,
+            'queued': self.queue.qsize(),
+        }
+
+def _to_json(value):
+    """Приводит numpy-типы в решениях ботов к JSON"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Не сериализуется в JSON: {type(value).__name__}")
+
+class ReplayScreenSource(ScreenSource):
+    """Источник кадров из записи сессии.
+
+    Кадры отдаются по одному на каждое чтение (без пауз реального времени), а
+    виртуальные часы переводятся на время записанного кадра, поэтому таймеры и
+    предсказание движения в ботах видят исходную шкалу времени. Кадры областей
+    рисуются на холсте размером с объединение всех записанных областей.
+    """
+
+    realtime = False
+
+    def __init__(self, path: str, bot: Optional[str] = None):
+        self.file = SessionFile(path)
+        self.entries = self.file.entries()
+        if bot is not None:
+            self.entries = [entry for entry in self.entries if self.file.decision(entry).get('bot') == bot]
+        if not self.entries:
+            raise ValueError(f"В записи {path} нет кадров")
+
+        self.position = 0
+        self.pending = None
+        self.finished = False
+        self.canvas = None
+
+        self.left = min(int(entry['left']) for entry in self.entries)
+        self.top = min(int(entry['top']) for entry in self.entries)
+        self.width = max(int(entry['left']) + int(entry['width']) for entry in self.entries) - self.left
+        self.height = max(int(entry['top']) + int(entry['height']) for entry in self.entries) - self.top
+
+    def open(self) -> Dict[str, int]:
+        self.canvas = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        return {'left': self.left, 'top': self.top, 'width': self.width, 'height': self.height}
+
+    def size(self) -> Tuple[int, int]:
+        # Боты выбирают координаты по размеру экрана, на котором шла запись
+        if all(self.file.screen_size):
+            return self.file.screen_size
+        return self.width, self.height
+
+    def next_timestamp(self) -> float:
+        """Берёт следующую запись и переводит виртуальные часы на её время"""
+        if self.position >= len(self.entries):
+            self.finished = True
+            self.pending = None
+            return backend_module.now()
+
+        self.pending = self.entries[self.position]
+        self.position += 1
+        timestamp = float(self.pending['timestamp'])
+        clock = backend_module.clock
+        if isinstance(clock, backend_module.FakeClock):
+            clock.advance_to(timestamp)
+        return timestamp
+
+    def grab(self, area: Dict[str, int]) -> np.ndarray:
+        entry = self.pending
+        if entry is not None:
+            frame = self.file.frame(entry)
+            if frame.ndim == 2:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGRA)
+            elif frame.shape[2] == 3:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA)
+            x0, y0 = int(entry['left']) - self.left, int(entry['top']) - self.top
+            self.canvas[y0:y0 + frame.shape[0], x0:x0 + frame.shape[1]] = frame
+
+        x0, y0 = area['left'] - self.left, area['top'] - self.top
+        return self.canvas[y0:y0 + area['height'], x0:x0 + area['width']]
+
+# Глобальный экземпляр записи сессии
+session_recorder = SessionRecorder()
+
+def record_frame(bot: str, frame: np.ndarray, origin: Tuple[int, int], timestamp: float,
+                 decision: Optional[Dict[str, Any]] = None):
+    """Записывает кадр и решение бота, если запись включена"""
+    if session_recorder.active:
+        session_recorder.record(bot, frame, origin, timestamp, decision)
+
+def start_recording(path: Optional[str] = None, minutes: float = SESSION_MINUTES,
+                    record_fps: float = RECORD_FPS, size_mb: Optional[int] = None) -> str:
+    """Начинает запись сессии (record_fps=0 - все кадры, для точного повтора)"""
+    return session_recorder.start(path, minutes, record_fps, size_mb)
+
+def stop_recording():
+    """Останавливает запись сессии"""
+    session_recorder.stop()
+
+def is_recording() -> bool:
+    """Проверяет, идёт ли запись"""
+    return session_recorder.active
+
+def load_decisions(path: str, bot: Optional[str] = None) -> List[Tuple[float, Dict[str, Any]]]:
+    """Возвращает записанные решения [(время, решение)] в порядке записи"""
+    session = SessionFile(path)
+    decisions = [(float(entry['timestamp']), session.decision(entry)) for entry in session.entries()]
+    if bot is not None:
+        decisions = [item for item in decisions if item[1].get('bot') == bot]
+    return decisions
+
+def compare_sessions(original: str, replayed: str,
+                     bot: Optional[str] = None) -> List[Tuple[int, float, Dict[str, Any], Dict[str, Any]]]:
+    """Сравнивает решения двух записей кадр за кадром (по общему числу кадров)
+    и возвращает расхождения [(номер кадра, время, решение в оригинале, решение при повторе)]"""
+    before = load_decisions(original, bot)
+    after = load_decisions(replayed, bot)
+    differences = []
+    for i, ((timestamp, old), (_, new)) in enumerate(zip(before, after)):
+        if old != new:
+            differences.append((i, timestamp, old, new))
+    return differences
+
+def replay_session(path: str, start: Callable[[], object], stop: Callable[[], object],
+                   bot: Optional[str] = None, record_to: Optional[str] = None,
+                   timeout: float = 600.0) -> backend_module.FakeInputSink:
+    """Прогоняет запись через цикл бота быстрее реального времени.
+
+    start запускает цикл бота (блокирующий или в своём потоке), stop останавливает его.
+    Ввод не отправляется, а записывается в возвращаемый FakeInputSink; если задан
+    record_to, решения при повторе пишутся в новую запись для compare_sessions.
+    """
+    source = ReplayScreenSource(path, bot)
+    sink = backend_module.FakeInputSink()
+    backend_module.use_backends(source, sink, backend_module.FakeClock(float(source.entries[0]['timestamp'])))
+    if record_to:
+        # Исходная запись уже прорежена - при повторе пишется каждый кадр
+        size_mb = max(1, SessionFile(path).data_size // (1024 * 1024))
+        start_recording(record_to, record_fps=0, size_mb=size_mb)
+
+    runner = threading.Thread(target=start, daemon=True)
+    runner.start()
+    deadline = time.perf_counter() + timeout
+    try:
+        while not source.finished and time.perf_counter() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop()
+        runner.join(timeout=5)
+        if record_to:
+            stop_recording()
+    return sink
+
+if __name__ == "__main__":
+    # python recorder_module.py session.rec          - сводка по записи
+    # python recorder_module.py old.rec new.rec      - расхождения решений
+    if len(sys.argv) == 2:
+        session = SessionFile(sys.argv[1])
+        entries = session.entries()
+        bots: Dict[str, int] = {}
+        for entry in entries:
+            name = session.decision(entry).get('bot', '?')
+            bots[name] = bots.get(name, 0) + 1
+        if entries:
+            duration = float(entries[-1]['timestamp']) - float(entries[0]['timestamp'])
+            print(f"📼 {len(entries)} кадров за {duration:.1f} с: {bots}")
+        else:
+            print("📼 Запись пуста")
+    elif len(sys.argv) == 3:
+        differences = compare_sessions(sys.argv[1], sys.argv[2])
+        for i, timestamp, old, new in differences:
+            print(f"#{i} t={timestamp:.3f}: {old} -> {new}")
+        print(f"Кадров: {len(load_decisions(sys.argv[1]))} / {len(load_decisions(sys.argv[2]))}, "
+              f"расхождений: {len(differences)}")
+    else:
+        print("Использование: recorder_module.py <запись> [<запись для сравнения>]")
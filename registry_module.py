@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль реестра игровых модулей - ленивый импорт при первом обращении
+"""
+
+import time
+import importlib
+import threading
+from typing import Dict, Any
+
+class ModuleRegistry:
+    """Реестр игровых модулей.
+
+    Модуль импортируется (и создаёт свой глобальный экземпляр бота) только при
+    первом обращении. Если импорт (или создание бота при импорте) не удался,
+    вместо модуля возвращается заглушка.
+    """
+
+    def __init__(self):
+        self.specs: Dict[str, tuple] = {}
+        self.modules: Dict[str, Any] = {}
+        self.load_times: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def register(self, name: str, module_name: str, fallback: Any):
+        """Регистрирует модуль и заглушку на случай ошибки импорта"""
+        self.specs[name] = (module_name, fallback)
+
+    def get(self, name: str) -> Any:
+        """Возвращает модуль, импортируя его при первом обращении"""
+        module = self.modules.get(name)
+        if module is not None:
+            return module
+
+        with self.lock:
+            if name in self.modules:
+                return self.modules[name]
+
+            module_name, fallback = self.specs[name]
+            started = time.perf_counter()
+            try:
+                module = importlib.import_module(module_name)
+                print(f"✅ Модуль {module_name} загружен")
+            except Exception as e:
+                print(f"⚠️ Предупреждение: Не удалось загрузить модуль {module_name}: {e}")
+                module = fallback
+            self.load_times[name] = time.perf_counter() - started
+            self.modules[name] = module
+            return module
+
+    def is_loaded(self, name: str) -> bool:
+        """Проверяет, был ли модуль уже загружен"""
+        return name in self.modules
+
+    def get_load_times(self) -> Dict[str, float]:
+        """Возвращает время загрузки каждого модуля в секундах"""
+        return dict(self.load_times)
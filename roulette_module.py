@@ -2,16 +2,90 @@
 # -*- coding: utf-8 -*-
 
 """
-Модуль для автоматической игры в рулетку
+Модуль для автоматической игры в рулетку.
+
+Шаги рулетки - машина состояний: каждый шаг ждёт не фиксированную паузу, а видимое
+условие на экране (меню открылось, стол отреагировал на клик, колесо закрутилось,
+колесо остановилось) с таймаутом и переходит дальше, как только условие выполнено.
+Если условие не наступило или на экране неожиданное состояние, бот определяет, что
+сейчас на экране (меню, стол, вращение или ничего), и продолжает с подходящего шага,
+а не начинает круг заново.
+
+Условия смотрят не на весь стол, а на то место, которое должно отозваться: стол
+узнаётся по шаблону или по снимку прошлого открытия, выбор ставки - по подсветке
+вокруг точки клика, вращение и остановка - по области колеса, сбор выигрыша - по
+плашке результата.
+
+Клики и области заданы в координатах игры (эталонное окно 1920x1080) и переводятся
+в экранные через window_module, поэтому бот работает при любом размере окна. Разметка
+стола (области и точки) измеряется на экране игры и хранится в roulette_layout.json;
+без файла используются приблизительные значения по умолчанию.
+Значок рулетки, как и любой найденный шаблон, проверяет калибровку окна.
 """
 
-import time
+import os
+import sys
+import json
 import random
-import pyautogui
-import pydirectinput
-from PIL import Image
+from typing import Callable, Dict, Optional, Tuple
 import cv2
 import numpy as np
+from vision_module import template_matcher, center, to_gray, to_bgr, ChangeDetector
+from capture_module import screen_capture
+from backend_module import now
+from input_module import input_source
+from metrics_module import bot_metrics
+from ledger_module import roulette_ledger
+from scheduler_module import run_sync, Offload, WaitFrame
+from window_module import game_point, game_region
+
+LAYOUT_PATH = os.environ.get('BOT_ROULETTE_LAYOUT', 'roulette_layout.json')
+LAYOUT_PREVIEW = "roulette_layout.png"
+
+# Разметка стола в координатах игры: области (left, top, width, height) и точки
+# кликов (x, y). Значения по умолчанию не измерены на экране игры - настоящие
+# записываются в LAYOUT_PATH (проверка: python roulette_module.py layout)
+DEFAULT_LAYOUT = {
+    'table': (350, 200, 450, 350),    # Стол целиком: по его виду стол узнаётся
+    'wheel': (475, 275, 200, 200),    # Колесо: движение здесь - вращение
+    'amount': (520, 380, 160, 40),    # Поле суммы ставки
+    'result': (540, 260, 70, 70),     # Плашка выпавшего числа после остановки колеса
+    'red': (400, 300),                # Поля ставок
+    'black': (500, 300),
+    'green': (450, 250),
+    'amount_point': (600, 400),       # Поле ввода суммы
+    'button': (700, 500),             # Кнопка "Поставить" / "Забрать" / "Новая игра"
+}
+
+# Необязательный шаблон открытого стола: если файл есть, стол узнаётся по нему
+TABLE_TEMPLATE = "roulette_table.png"
+REACT_SIZE = 80  # Сторона квадрата вокруг точки клика, в котором ждём подсветку
+
+# Таймауты условий (секунды)
+MENU_TIMEOUT = 3.0         # Меню рулетки появилось после R
+REACT_TIMEOUT = 1.0        # Стол отреагировал на клик или ввод
+FOCUS_TIMEOUT = 0.3        # Поле суммы получило фокус
+SPIN_START_TIMEOUT = 3.0   # Ставка принята - началось вращение
+SPIN_TIMEOUT = 20.0        # Вращение закончилось
+PROBE_TIMEOUT = 0.5        # Проверка движения при определении состояния
+
+WATCH_FPS = 15             # Частота кадров при ожидании условий
+SPIN_FRAMES = 2            # Кадров подряд с изменениями - идёт вращение
+SETTLE_FRAMES = 5          # Кадров подряд без изменений - стол успокоился
+TABLE_TOLERANCE = 20.0     # Средняя разница миниатюр, при которой стол считается тем же
+
+# Плашка результата: точки, изменившиеся относительно снимка до вращения
+RESULT_CHANGE = 30        # Разница с фоном (по любому каналу), с которой точка относится к плашке
+RESULT_MIN_PLATE = 0.05   # Доля области, которая должна измениться (плашка появилась)
+
+# Цвет плашки (HSV): доля точек плашки и перевес над следующим цветом
+RESULT_MIN_SHARE = 0.4
+RESULT_DOMINANCE = 2.0
+RESULT_SATURATION = 100   # Красный и зелёный - насыщенные, чёрный - нет
+RESULT_DARK = 60          # Чёрный - тёмный
+
+# Состояние экрана -> шаг, с которого продолжать
+STATE_STEPS = {'closed': 0, 'menu': 0, 'table': 1, 'spinning': 4}
 
 class RouletteBot:
     def __init__(self):
@@ -19,126 +93,411 @@ class RouletteBot:
         self.running = False
         self.bet_amount = 100  # Сумма ставки
         self.bet_type = "red"  # Тип ставки: red, black, green, number
-        
+        self.roulette_image = "roulette.png"
+        self.metrics = bot_metrics('roulette')
+        self.input = input_source('roulette')
+        self.layout, self.layout_measured = load_layout()
+
+        # Миниатюра стола, снятая при его открытии, - по ней стол узнаётся при восстановлении
+        self.table_reference: Optional[np.ndarray] = None
+
+        # Текущий круг: ставка сделана (колесо закрутилось) и выпавший цвет
+        self.bet_placed = False
+        self.outcome: Optional[str] = None
+        self.result_background: Optional[np.ndarray] = None  # Область плашки до вращения
+
+        # Статистика
+        self.rounds = 0
+        self.recoveries = 0
+
+        if not template_matcher.load(self.roulette_image):
+            print(f"⚠️ Не найдено изображение рулетки: {self.roulette_image}")
+        self.table_template = TABLE_TEMPLATE if template_matcher.load(TABLE_TEMPLATE) else None
+        template_matcher.save_cache()
+
     def perform_step(self, step, chat_id=None):
-        """Выполняет один шаг рулетки"""
+        """Выполняет один шаг рулетки в текущем потоке"""
+        return run_sync(self.step_task(step, chat_id))
+
+    def step_task(self, step, chat_id=None):
+        """Выполняет один шаг рулетки (задача планировщика: step = yield from ...).
+        Возвращает следующий шаг: по порядку, если условие шага выполнено, иначе -
+        шаг, подходящий тому, что сейчас на экране"""
+        self.metrics.iteration()
         try:
             if step == 0:
-                # Шаг 0: Открыть меню рулетки
-                self.open_roulette_menu()
-                return 1
-                
+                # Шаг 0: Открыть меню рулетки и стол
+                done = yield from self.open_roulette_menu()
+
             elif step == 1:
                 # Шаг 1: Выбрать тип ставки
-                self.select_bet_type()
-                return 2
-                
+                done = yield from self.select_bet_type()
+
             elif step == 2:
                 # Шаг 2: Установить сумму ставки
-                self.set_bet_amount()
-                return 3
-                
+                done = yield from self.set_bet_amount()
+
             elif step == 3:
-                # Шаг 3: Сделать ставку
-                self.place_bet()
-                return 4
-                
+                # Шаг 3: Сделать ставку и дождаться начала вращения
+                done = yield from self.place_bet()
+
             elif step == 4:
-                # Шаг 4: Дождаться результата
-                self.wait_for_result()
-                return 5
-                
+                # Шаг 4: Дождаться остановки колеса
+                done = yield from self.wait_for_result()
+
             elif step == 5:
-                # Шаг 5: Забрать выигрыш или начать заново
-                self.collect_winnings()
-                return 0  # Начать заново
-                
+                # Шаг 5: Забрать выигрыш; дальше - по тому, что на экране
+                yield from self.collect_winnings()
+                self.rounds += 1
+                return (yield from self.recover(step, quiet=True))
+
             else:
-                return 0
-                
+                done = False
+
+            if done:
+                return step + 1
+            return (yield from self.recover(step))
+
         except Exception as e:
             print(f"Ошибка в шаге {step}: {e}")
-            return 0
-    
-    def open_roulette_menu(self):
-        """Открывает меню рулетки"""
-        # Нажимаем клавишу для открытия меню (например, R)
-        pydirectinput.press('r')
-        time.sleep(1)
-        
-        # Ищем изображение рулетки на экране
+            return (yield from self.recover(step))
+
+    # Ожидание условий на экране
+
+    def wait_for(self, region: Optional[Tuple[int, int, int, int]],
+                 condition: Callable[[np.ndarray, Tuple[int, int]], object], timeout: float):
+        """Ждёт, пока condition(кадр, угол) станет истинным на свежих кадрах области, не
+        дольше timeout секунд по часам бэкенда. condition может вернуть Offload - тогда
+        проверка выполняется в фоновом потоке. Возвращает истинное значение условия
+        или False по таймауту. region - в координатах игры (None - весь экран)"""
+        subscription = screen_capture.subscribe(game_region(*region) if region else None, WATCH_FPS)
+        deadline = now() + timeout
         try:
-            location = pyautogui.locateOnScreen('roulette.png', confidence=0.8)
-            if location:
-                center = pyautogui.center(location)
-                pyautogui.click(center)
-                time.sleep(0.5)
-        except:
-            print("Не удалось найти изображение рулетки")
-    
+            while now() < deadline:
+                if not (yield WaitFrame(subscription)):
+                    continue
+                result = subscription.read(timeout=0, copy=True)
+                if result is None:
+                    continue
+                value = condition(*result)
+                if isinstance(value, Offload):
+                    value = yield value
+                if value:
+                    return value
+            return False
+        finally:
+            subscription.close()
+
+    def capture(self, region: Tuple[int, int, int, int]):
+        """Кадр области, заданной в координатах игры (задача: frame, origin = yield from ...)"""
+        return (yield from template_matcher.capture_task(game_region(*region)))
+
+    def click(self, point: Tuple[int, int]):
+        """Клик по точке в координатах игры (задача: yield from ...)"""
+        yield self.input.click(*game_point(*point), wait=False)
+
+    @staticmethod
+    def around(point: Tuple[int, int], size: int = REACT_SIZE) -> Tuple[int, int, int, int]:
+        """Квадрат вокруг точки клика, где видна реакция на клик (подсветка)"""
+        x, y = point
+        return (x - size // 2, y - size // 2, size, size)
+
+    def snapshot(self, region: Tuple[int, int, int, int]) -> ChangeDetector:
+        """Запоминает текущий вид области (задача: detector = yield from ...)"""
+        frame, _ = yield from self.capture(region)
+        detector = ChangeDetector()
+        detector.changed(frame)
+        return detector
+
+    def reacted(self, detector: ChangeDetector, region: Tuple[int, int, int, int],
+                timeout: float = REACT_TIMEOUT):
+        """Ждёт, пока область изменится относительно снимка detector (снимок при этом
+        обновляется, поэтому тот же detector ждёт и следующее изменение)"""
+        return (yield from self.wait_for(region, lambda frame, origin: detector.changed(frame), timeout))
+
+    def spinning(self, detector: ChangeDetector, timeout: float):
+        """Ждёт движения на столе: изменения несколько кадров подряд"""
+        frames = 0
+
+        def moving(frame, origin):
+            nonlocal frames
+            frames = frames + 1 if detector.changed(frame) else 0
+            return frames >= SPIN_FRAMES
+
+        return (yield from self.wait_for(self.layout['wheel'], moving, timeout))
+
+    def settled(self, timeout: float):
+        """Ждёт, пока колесо перестанет меняться несколько кадров подряд"""
+        detector = ChangeDetector()
+        frames = 0
+
+        def still(frame, origin):
+            nonlocal frames
+            frames = 0 if detector.changed(frame) else frames + 1
+            return frames >= SETTLE_FRAMES
+
+        return (yield from self.wait_for(self.layout['wheel'], still, timeout))
+
+    def find_menu(self, frame: np.ndarray, origin: Tuple[int, int]) -> Offload:
+        """Поиск значка рулетки на кадре (в фоновом потоке планировщика). Найденный
+        значок заодно проверяет калибровку окна игры"""
+        return Offload(self.locate_menu, frame, origin)
+
+    def locate_menu(self, frame: np.ndarray, origin: Tuple[int, int]):
+        return template_matcher.find(self.roulette_image, frame=frame, origin=origin, confidence=0.8)
+
+    @staticmethod
+    def table_thumbnail(frame: np.ndarray) -> np.ndarray:
+        return cv2.resize(to_gray(frame), (64, 48), interpolation=cv2.INTER_AREA)
+
+    def knows_table(self) -> bool:
+        """Есть ли, по чему узнать стол: шаблон или снимок прошлого открытия"""
+        return self.table_template is not None or self.table_reference is not None
+
+    def is_table(self, frame: np.ndarray, origin: Tuple[int, int]) -> Optional[bool]:
+        """Открыт ли стол на кадре его области: по шаблону стола, если он есть, иначе
+        по сходству со снимком прошлого открытия (None - узнать не по чему).
+        С шаблоном вызывается в фоновом потоке (table_visible)"""
+        if self.table_template is not None:
+            return template_matcher.find(self.table_template, frame=frame, origin=origin) is not None
+        if self.table_reference is None:
+            return None
+        return cv2.absdiff(self.table_thumbnail(frame), self.table_reference).mean() <= TABLE_TOLERANCE
+
+    def table_visible(self, frame: np.ndarray, origin: Tuple[int, int]) -> Offload:
+        """Проверка стола для wait_for и шагов (в фоновом потоке планировщика)"""
+        return Offload(self.is_table, frame, origin)
+
+    def detect_state(self):
+        """Определяет, что на экране: 'menu' - видно меню рулетки, 'spinning' - стол
+        в движении, 'table' - неподвижный стол, 'closed' - ничего из этого"""
+        frame, origin = yield from template_matcher.capture_task()
+        with self.metrics.stage('match'):
+            location = yield self.find_menu(frame, origin)
+        if location:
+            return 'menu'
+
+        detector = yield from self.snapshot(self.layout['wheel'])
+        if (yield from self.spinning(detector, PROBE_TIMEOUT)):
+            return 'spinning'
+
+        if self.knows_table():
+            table, origin = yield from self.capture(self.layout['table'])
+            if (yield self.table_visible(table, origin)):
+                return 'table'
+        return 'closed'
+
+    def recover(self, step, quiet=False):
+        """Возвращает шаг, подходящий состоянию экрана (вместо сброса в 0)"""
+        try:
+            state = yield from self.detect_state()
+        except Exception as e:
+            print(f"Не удалось определить состояние рулетки: {e}")
+            state = 'closed'
+        next_step = STATE_STEPS[state]
+        if not quiet:
+            self.recoveries += 1
+            print(f"Шаг {step} не дождался условия, на экране '{state}' - продолжаем с шага {next_step}")
+        return next_step
+
+    # Шаги
+
+    def open_roulette_menu(self):
+        """Открывает меню рулетки (если оно ещё не открыто) и стол"""
+        frame, origin = yield from template_matcher.capture_task()
+        with self.metrics.stage('match'):
+            location = yield self.find_menu(frame, origin)
+
+        if not location:
+            # Нажимаем клавишу для открытия меню (например, R) и ждём значок рулетки
+            yield self.input.press('r', wait=False)
+            location = yield from self.wait_for(None, self.find_menu, MENU_TIMEOUT)
+            if not location:
+                print("Не удалось найти изображение рулетки")
+                return False
+
+        # Открываем стол и ждём, пока он появится. Узнать стол не по чему (первое
+        # открытие без шаблона) - ждём, пока область стола отреагирует на клик
+        known = self.knows_table()
+        detector = None if known else (yield from self.snapshot(self.layout['table']))
+        yield self.input.click(*center(location), wait=False)
+        if known:
+            opened = yield from self.wait_for(self.layout['table'], self.table_visible, MENU_TIMEOUT)
+        else:
+            opened = yield from self.reacted(detector, self.layout['table'], MENU_TIMEOUT)
+        if not opened:
+            return False
+        yield from self.settled(REACT_TIMEOUT)
+
+        table, _ = yield from self.capture(self.layout['table'])
+        self.table_reference = self.table_thumbnail(table)
+        return True
+
     def select_bet_type(self):
         """Выбирает тип ставки"""
         # Случайный выбор типа ставки
         bet_types = ["red", "black", "green"]
         self.bet_type = random.choice(bet_types)
-        
-        # Кликаем по соответствующей области
-        if self.bet_type == "red":
-            # Клик по красной области
-            pyautogui.click(400, 300)
-        elif self.bet_type == "black":
-            # Клик по черной области
-            pyautogui.click(500, 300)
-        elif self.bet_type == "green":
-            # Клик по зеленой области (0)
-            pyautogui.click(450, 250)
-        
-        time.sleep(0.5)
-    
+
+        # Стол закрыт или сменился - пусть восстановление решит, что на экране
+        table, origin = yield from self.capture(self.layout['table'])
+        if (yield self.table_visible(table, origin)) is False:
+            return False
+
+        # Кликаем по области выбранного цвета (зелёная - 0) и ждём её подсветки
+        point = self.layout[self.bet_type]
+        detector = yield from self.snapshot(self.around(point))
+        yield from self.click(point)
+
+        # Подсветка выбора видна не всегда - без неё продолжаем по таймауту
+        yield from self.reacted(detector, self.around(point))
+        return True
+
     def set_bet_amount(self):
         """Устанавливает сумму ставки"""
-        # Кликаем по полю ввода суммы
-        pyautogui.click(600, 400)
-        time.sleep(0.2)
-        
+        # Кликаем по полю ввода суммы и ждём фокуса (поле подсвечивается)
+        detector = yield from self.snapshot(self.layout['amount'])
+        yield from self.click(self.layout['amount_point'])
+        yield from self.reacted(detector, self.layout['amount'], FOCUS_TIMEOUT)
+
         # Очищаем поле
-        pyautogui.hotkey('ctrl', 'a')
-        time.sleep(0.1)
-        
-        # Вводим сумму ставки
-        pyautogui.typewrite(str(self.bet_amount))
-        time.sleep(0.5)
-    
+        yield self.input.hotkey('ctrl', 'a', wait=False)
+
+        # Вводим сумму ставки и ждём, пока она появится в поле
+        yield self.input.write(str(int(self.bet_amount)), wait=False)
+        yield from self.reacted(detector, self.layout['amount'])
+        return True
+
     def place_bet(self):
-        """Делает ставку"""
+        """Делает ставку: условие - колесо начало вращаться"""
+        detector = yield from self.snapshot(self.layout['wheel'])
+        self.result_background, _ = yield from self.capture(self.layout['result'])
+
         # Кликаем по кнопке "Поставить"
-        pyautogui.click(700, 500)
-        time.sleep(1)
-    
+        yield from self.click(self.layout['button'])
+        self.outcome = None
+        self.bet_placed = yield from self.spinning(detector, SPIN_START_TIMEOUT)
+        return self.bet_placed
+
     def wait_for_result(self):
-        """Ждет результата рулетки"""
-        # Ждем завершения вращения
-        time.sleep(5)
-        
-        # Можно добавить логику для определения результата
-        # по изображению или другим способом
-        pass
-    
+        """Ждет результата рулетки (стол перестал меняться) и распознаёт выпавший цвет"""
+        if not (yield from self.settled(SPIN_TIMEOUT)):
+            return False
+        plate, _ = yield from self.capture(self.layout['result'])
+        self.outcome = recognize_outcome(plate, self.result_background)
+        print(f"Выпало: {self.outcome or 'не распознано'}")
+        return True
+
     def collect_winnings(self):
-        """Забирает выигрыш"""
+        """Забирает выигрыш: условие - плашка результата убрана"""
+        detector = yield from self.snapshot(self.layout['result'])
+
         # Кликаем по кнопке "Забрать" или "Новая игра"
-        pyautogui.click(700, 500)
-        time.sleep(1)
-        
-        # Обновляем сумму ставки (может увеличить при выигрыше)
-        if random.random() < 0.3:  # 30% шанс увеличить ставку
+        yield from self.click(self.layout['button'])
+        if (yield from self.reacted(detector, self.layout['result'])):
+            yield from self.settled(REACT_TIMEOUT)
+
+        # Круг без нашей ставки (восстановились посреди чужого вращения) не записываем
+        if not self.bet_placed:
+            return
+        self.bet_placed = False
+        delta = roulette_ledger.record(self.bet_type, self.bet_amount, self.outcome)
+
+        # Обновляем сумму ставки: больше после выигрыша, меньше после проигрыша
+        if delta > 0:
             self.bet_amount = min(self.bet_amount * 1.5, 1000)
-        else:
+        elif delta < 0:
             self.bet_amount = max(self.bet_amount * 0.8, 50)
 
+    def get_stats(self):
+        """Возвращает число сыгранных кругов и восстановлений"""
+        return {'rounds': self.rounds, 'recoveries': self.recoveries}
+
+def recognize_outcome(plate: np.ndarray, background: Optional[np.ndarray] = None) -> Optional[str]:
+    """Цвет плашки результата: 'red', 'black', 'green' или None. Цвета считаются только
+    на плашке - точках, изменившихся относительно background (та же область до
+    вращения; без него - вся область). Чёрный - тёмные ненасыщенные точки, а не любые
+    тёмные. None - плашка не появилась или ни один цвет не преобладает"""
+    plate = to_bgr(plate)
+    if background is not None and background.shape[:2] == plate.shape[:2]:
+        # По каналам, а не по яркости: красная плашка на зелёном сукне почти той же яркости
+        difference = cv2.absdiff(plate, to_bgr(background)).max(axis=2)
+        mask = difference >= RESULT_CHANGE
+    else:
+        mask = np.ones(plate.shape[:2], dtype=bool)
+    area = np.count_nonzero(mask)
+    if area < RESULT_MIN_PLATE * mask.size:
+        return None
+
+    hsv = cv2.cvtColor(plate, cv2.COLOR_BGR2HSV)
+    hue, saturation, value = hsv[:, :, 0], hsv[:, :, 1], hsv[:, :, 2]
+    saturated = mask & (saturation >= RESULT_SATURATION) & (value >= RESULT_DARK)
+    counts = {
+        'red': np.count_nonzero(saturated & ((hue <= 10) | (hue >= 170))),
+        'green': np.count_nonzero(saturated & (hue >= 40) & (hue <= 85)),
+        'black': np.count_nonzero(mask & (saturation < RESULT_SATURATION) & (value < RESULT_DARK)),
+    }
+    (color, count), (_, runner_up) = sorted(counts.items(), key=lambda item: -item[1])[:2]
+    if count < RESULT_MIN_SHARE * area or count < RESULT_DOMINANCE * runner_up:
+        return None
+    return color
+
+def load_layout(path: str = LAYOUT_PATH) -> Tuple[Dict[str, Tuple[int, ...]], bool]:
+    """Разметка стола: значения по умолчанию, поверх - измеренные из файла.
+    Возвращает разметку и признак, что она прочитана из файла"""
+    layout = dict(DEFAULT_LAYOUT)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ Разметка рулетки не измерена ({path}) - области и точки приблизительные, "
+              f"проверьте их: python roulette_module.py layout")
+        return layout, False
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Не удалось прочитать разметку рулетки {path}: {e}")
+        return layout, False
+    for name, value in data.items():
+        if name in layout and len(value) == len(layout[name]):
+            layout[name] = tuple(int(v) for v in value)
+    return layout, True
+
+def draw_layout(frame: np.ndarray, layout: Dict[str, Tuple[int, ...]]) -> np.ndarray:
+    """Рисует области и точки разметки на снимке экрана (для проверки на глаз)"""
+    image = to_bgr(frame).copy()
+    for name, value in layout.items():
+        if len(value) == 4:
+            left, top, width, height = game_region(*value)
+            cv2.rectangle(image, (left, top), (left + width, top + height), (0, 255, 255), 2)
+            position = (left + 4, top + 18)
+        else:
+            x, y = game_point(*value)
+            cv2.circle(image, (x, y), 6, (255, 0, 255), -1)
+            position = (x + 8, y - 8)
+        cv2.putText(image, name, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+    return image
+
 # Глобальный экземпляр бота рулетки
 roulette_bot = RouletteBot()
 
 def perform_step(step, chat_id=None):
     """Главная функция для выполнения шага рулетки"""
     return roulette_bot.perform_step(step, chat_id)
+
+def step_task(step, chat_id=None):
+    """Шаг рулетки как задача планировщика (step = yield from step_task(step))"""
+    return roulette_bot.step_task(step, chat_id)
+
+if __name__ == "__main__":
+    # python roulette_module.py layout - снимает экран с открытым столом, рисует на нём
+    # разметку (roulette_layout.png) и создаёт файл разметки для правки, если его нет
+    if sys.argv[1:2] != ['layout']:
+        print("Использование: python roulette_module.py layout")
+        sys.exit(1)
+    frame, _ = run_sync(template_matcher.capture_task())
+    cv2.imwrite(LAYOUT_PREVIEW, draw_layout(frame, roulette_bot.layout))
+    if not roulette_bot.layout_measured:
+        with open(LAYOUT_PATH, 'w', encoding='utf-8') as f:
+            json.dump({name: list(value) for name, value in roulette_bot.layout.items()}, f, indent=2)
+        print(f"Создан {LAYOUT_PATH} - поправьте координаты по {LAYOUT_PREVIEW} и запустите снова")
+    else:
+        print(f"Разметка {LAYOUT_PATH} нарисована в {LAYOUT_PREVIEW}")
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль планировщика - все боты работают как кооперативные задачи в одном потоке.
+
+Задача - генератор, который отдаёт управление через yield:
+    yield 0.5                              - продолжить через 0.5 с по часам бэкенда
+    yield                                  - пропустить вперёд другие готовые задачи
+    ready = yield WaitFrame(subscription)  - дождаться нового кадра подписки захвата
+                                             (True - кадр есть, False - таймаут)
+    result = yield Offload(func, *args)    - выполнить тяжёлый вызов (поиск шаблонов)
+                                             в фоновом потоке и получить результат
+    request = yield input.press('e', wait=False)
+                                           - дождаться выполнения действия ввода
+                                             (InputRequest), не занимая поток
+
+Из готовых задач первой выполняется задача с наивысшим приоритетом (меньшее число),
+среди равных - готовая раньше. Шаг задачи не прерывается, поэтому долгие вычисления
+фоновых задач выносятся через Offload, и качалка продолжает получать кадры, пока
+другой бот ищет шаблоны. Отмена не ждёт конца паузы: генератор закрывается при
+ближайшем проходе планировщика, и его finally выполняются в потоке планировщика.
+С виртуальными часами планировщик сам сдвигает время до ближайшего таймера, но только
+когда ни одна задача не ждёт кадр или фоновый вызов, - иначе время задают они.
+"""
+
+import time
+import queue
+import itertools
+import threading
+from types import GeneratorType
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+import backend_module
+from backend_module import now
+from input_module import InputRequest, WAIT_TIMEOUT
+
+# Приоритеты задач (меньше - важнее)
+PRIORITY_HIGH = 0     # Критичные к задержке (качалка)
+PRIORITY_NORMAL = 10  # Циклы ботов и таймеры
+PRIORITY_LOW = 20     # Фоновый опрос (анти-афк, поиск еды)
+
+_order = itertools.count()
+
+class WaitFrame:
+    """Ожидание нового кадра подписки захвата экрана"""
+
+    def __init__(self, subscription, timeout: float = 1.0):
+        self.subscription = subscription
+        self.timeout = timeout  # Секунды реального времени
+
+class Offload:
+    """Вызов func(*args, **kwargs) в фоновом потоке планировщика. Задача получает
+    результат из yield (исключение вызова пробрасывается в задачу)"""
+
+    def __init__(self, func: Callable[..., Any], *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+class Task:
+    """Задача планировщика"""
+
+    def __init__(self, scheduler: "Scheduler", generator: Generator, name: str, priority: int):
+        self.scheduler = scheduler
+        self.generator = generator
+        self.name = name
+        self.priority = priority
+        self.order = next(_order)
+        self.deadline = 0.0  # Время часов бэкенда, с которого задача готова
+        self.waiting = None  # WaitFrame, Offload или InputRequest, которого ждёт задача
+        self.wait_deadline: Optional[float] = None  # Таймаут ожидания (perf_counter)
+        self.woken = False
+        self.wake_value: Any = None
+        self.wake_error: Optional[BaseException] = None
+        self.cancelled = False
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def cancel(self):
+        """Отменяет задачу, не дожидаясь её паузы"""
+        self.scheduler.cancel(self)
+
+    def delay(self, seconds: float):
+        """Переносит пробуждение спящей задачи на seconds от текущего момента"""
+        self.scheduler.delay(self, seconds)
+
+    def is_alive(self) -> bool:
+        return not self.done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт завершения задачи (не вызывать из задач планировщика)"""
+        return self.done.wait(timeout)
+
+class Scheduler:
+    """Кооперативный планировщик задач ботов"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.tasks: List[Task] = []
+        self.thread = None
+        self.worker = None
+        self.jobs: "queue.Queue[Tuple[Task, Offload]]" = queue.Queue()
+        self.current: Optional[Task] = None  # Задача, которая сейчас выполняется в потоке планировщика
+        self.working: Optional[Task] = None  # Задача, чей Offload сейчас выполняется
+        self.steps = 0
+
+    def _ensure_started(self):
+        """Запускает поток планировщика при первой задаче (вызывается под блокировкой)"""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+            self.thread.start()
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._work, name="scheduler-worker", daemon=True)
+            self.worker.start()
+
+    def spawn(self, generator: Generator, name: str, priority: int = PRIORITY_NORMAL,
+              delay: float = 0.0) -> Task:
+        """Запускает генератор как задачу (первый шаг - через delay секунд)"""
+        task = Task(self, generator, name, priority)
+        with self.condition:
+            task.deadline = now() + delay
+            self.tasks.append(task)
+            self._ensure_started()
+            self.condition.notify_all()
+        return task
+
+    def every(self, interval: float, func: Callable[[], Any], name: str,
+              priority: int = PRIORITY_NORMAL, delay: float = 0.0) -> Task:
+        """Таймер: вызывает func каждые interval секунд, первый раз - через delay.
+        Если func вернула генератор, он выполняется внутри задачи таймера. Ошибка одного
+        срабатывания только пишется в лог - таймер останавливает лишь отмена задачи"""
+        def timer():
+            while True:
+                started = now()
+                try:
+                    result = func()
+                    if isinstance(result, GeneratorType):
+                        yield from result
+                except Exception as e:
+                    print(f"Ошибка в таймере {name}: {e}")
+                yield max(0.0, interval - (now() - started))
+
+        return self.spawn(timer(), name, priority, delay)
+
+    def cancel(self, task: Task):
+        """Помечает задачу отменённой; планировщик закроет её генератор"""
+        with self.condition:
+            if not task.done.is_set():
+                task.cancelled = True
+                self.condition.notify_all()
+
+    def delay(self, task: Task, seconds: float):
+        """Переносит пробуждение задачи, которая спит (не ждёт кадр или фоновый вызов)"""
+        with self.condition:
+            if task.waiting is None and not task.done.is_set():
+                task.deadline = now() + seconds
+                self.condition.notify_all()
+
+    def _wake(self, task: Task, waiting, value: Any = True, error: Optional[BaseException] = None):
+        """Будит задачу, если она всё ещё ждёт того же события"""
+        with self.condition:
+            if task.waiting is waiting:
+                task.woken = True
+                task.wake_value = value
+                task.wake_error = error
+                self.condition.notify_all()
+
+    def _work(self):
+        """Фоновый поток: выполняет вызовы Offload по очереди"""
+        while True:
+            task, job = self.jobs.get()
+            self.working = task
+            try:
+                result, error = job.func(*job.args, **job.kwargs), None
+            except Exception as e:
+                result, error = None, e
+            finally:
+                self.working = None
+            self._wake(task, job, result, error)
+
+    def _next(self) -> Task:
+        """Ждёт и возвращает следующую готовую задачу"""
+        with self.condition:
+            while True:
+                current = now()
+                real = time.perf_counter()
+                best = None
+                timer_wait = None
+                external_wait = None
+                external = False
+
+                for task in self.tasks:
+                    if task.cancelled:
+                        return task
+                    if task.waiting is not None:
+                        if task.woken:
+                            pass
+                        elif task.wait_deadline is None:
+                            external = True
+                            continue
+                        elif real < task.wait_deadline:
+                            external = True
+                            remaining = task.wait_deadline - real
+                            external_wait = remaining if external_wait is None else min(external_wait, remaining)
+                            continue
+                    elif task.deadline > current:
+                        remaining = task.deadline - current
+                        timer_wait = remaining if timer_wait is None else min(timer_wait, remaining)
+                        continue
+                    if best is None or (task.priority, task.deadline, task.order) < \
+                            (best.priority, best.deadline, best.order):
+                        best = task
+
+                if best is not None:
+                    return best
+
+                clock = backend_module.clock
+                if not clock.realtime:
+                    if not external and timer_wait is not None:
+                        clock.sleep(timer_wait)  # Виртуальное время: сразу к ближайшему таймеру
+                        continue
+                    timer_wait = None
+                waits = [wait for wait in (external_wait, timer_wait) if wait is not None]
+                self.condition.wait(min(waits) if waits else None)
+
+    def _finish(self, task: Task, close: bool = False):
+        """Убирает задачу (и закрывает генератор отменённой задачи)"""
+        if isinstance(task.waiting, WaitFrame):
+            subscription = task.waiting.subscription
+            subscription.service.cancel_notify(subscription)
+        task.waiting = None
+        if close:
+            try:
+                task.generator.close()
+            except Exception as e:
+                print(f"Ошибка остановки задачи {task.name}: {e}")
+        with self.condition:
+            if task in self.tasks:
+                self.tasks.remove(task)
+        task.done.set()
+
+    def _step(self, task: Task):
+        """Выполняет задачу до следующего yield"""
+        if task.cancelled:
+            self._finish(task, close=True)
+            return
+
+        with self.condition:
+            waiting, task.waiting = task.waiting, None
+            woken, resume, error = task.woken, task.wake_value, task.wake_error
+            task.woken, task.wake_value, task.wake_error = False, None, None
+        if isinstance(waiting, WaitFrame):
+            resume = woken
+            if not woken:
+                waiting.subscription.service.cancel_notify(waiting.subscription)
+        elif isinstance(waiting, InputRequest):
+            resume = waiting  # По таймауту - ещё не выполненный запрос
+
+        self.current = task
+        try:
+            if error is not None:
+                value = task.generator.throw(error)
+            else:
+                value = task.generator.send(resume)
+        except StopIteration as e:
+            task.result = e.value
+            self._finish(task)
+            return
+        except Exception as e:
+            print(f"Ошибка в задаче {task.name}: {e}")
+            task.error = e
+            self._finish(task)
+            return
+        finally:
+            self.current = None
+            self.steps += 1
+
+        if isinstance(value, WaitFrame):
+            with self.condition:
+                task.waiting = value
+                task.wait_deadline = time.perf_counter() + value.timeout
+                task.deadline = now()
+            value.subscription.service.notify(value.subscription, lambda: self._wake(task, value))
+        elif isinstance(value, Offload):
+            with self.condition:
+                task.waiting = value
+                task.wait_deadline = None
+                task.deadline = now()
+            self.jobs.put((task, value))
+        elif isinstance(value, InputRequest):
+            with self.condition:
+                task.waiting = value
+                task.wait_deadline = time.perf_counter() + WAIT_TIMEOUT
+                task.deadline = now()
+            value.on_done(lambda: self._wake(task, value, value))
+        else:
+            with self.condition:
+                task.deadline = now() + (value or 0.0)
+
+    def _run(self):
+        while True:
+            self._step(self._next())
+
+    def running_tasks(self) -> Dict[int, str]:
+        """Имена задач, которые выполняются прямо сейчас, по идентификатору потока"""
+        running = {}
+        for thread, task in ((self.thread, self.current), (self.worker, self.working)):
+            if thread is not None and task is not None:
+                running[thread.ident] = task.name
+        return running
+
+    def get_tasks(self) -> List[Dict[str, Any]]:
+        """Возвращает список задач: имя, приоритет и чего задача ждёт"""
+        with self.condition:
+            return [{
+                'name': task.name,
+                'priority': task.priority,
+                'waiting': (type(task.waiting).__name__ if task.waiting is not None
+                            else max(0.0, task.deadline - now())),
+            } for task in self.tasks]
+
+def run_sync(generator: Generator) -> Any:
+    """Выполняет задачу в текущем потоке (паузы - обычный sleep бэкенда) и возвращает
+    её результат. Для вызовов вне планировщика, например из обработчиков Telegram"""
+    resume, error = None, None
+    while True:
+        try:
+            value = generator.throw(error) if error is not None else generator.send(resume)
+        except StopIteration as e:
+            return e.value
+        resume, error = None, None
+        if isinstance(value, WaitFrame):
+            resume = value.subscription.wait(value.timeout)
+        elif isinstance(value, Offload):
+            try:
+                resume = value.func(*value.args, **value.kwargs)
+            except Exception as e:
+                error = e
+        elif isinstance(value, InputRequest):
+            value.wait()
+            resume = value
+        else:
+            backend_module.sleep(value or 0.0)
+
+# Глобальный планировщик
+scheduler = Scheduler()
+
+def spawn(generator: Generator, name: str, priority: int = PRIORITY_NORMAL, delay: float = 0.0) -> Task:
+    """Запускает задачу в общем планировщике"""
+    return scheduler.spawn(generator, name, priority, delay)
+
+def every(interval: float, func: Callable[[], Any], name: str,
+          priority: int = PRIORITY_NORMAL, delay: float = 0.0) -> Task:
+    """Запускает таймер в общем планировщике"""
+    return scheduler.every(interval, func, name, priority, delay)
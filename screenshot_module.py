@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль скриншотов - захват и кодирование в пуле фоновых потоков.
+
+Обработчик Telegram только ставит задание и сразу возвращается; захват, уменьшение
+и кодирование идут в потоках пула, готовый файл уходит через очередь сообщений.
+Монитор игры (и окно игры на нём) снимается через общий сервис захвата, как его видят
+боты, остальные мониторы и «все мониторы» - отдельным источником mss в потоке пула.
+Кодирует OpenCV (без перестановки каналов через PIL): JPEG и WebP с заданным качеством
+во много раз меньше PNG и быстрее загружаются с машины. Наблюдение (/watch) снимает
+экран по таймеру планировщика и отправляет кадр, только если миниатюра заметно
+отличается от последней отправленной.
+"""
+
+import threading
+from io import BytesIO
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+import cv2
+import numpy as np
+
+import backend_module
+from backend_module import MssScreenSource
+from capture_module import screen_capture
+from window_module import find_game_window
+
+# Параметры по умолчанию: формат, качество и длинная сторона после уменьшения
+DEFAULT_FORMAT = 'jpeg'
+DEFAULT_QUALITY = 80
+DEFAULT_MAX_SIDE = 1920
+WORKERS = 2
+
+# Наблюдение (/watch): интервал, порог изменения и параметры отправляемого кадра
+WATCH_INTERVAL = 30.0
+WATCH_MIN_INTERVAL = 5.0
+WATCH_MAX_INTERVAL = 3600.0
+WATCH_THRESHOLD = 0.02      # Доля изменившихся точек миниатюры
+WATCH_PIXEL_DELTA = 16      # Изменение яркости точки, которое считается изменением
+WATCH_THUMBNAIL = (160, 90)
+WATCH_QUALITY = 60
+WATCH_MAX_SIDE = 1280
+
+FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+    'png': ('.png', None),
+}
+FORMAT_ALIASES = {'jpg': 'jpeg', 'jpeg': 'jpeg', 'webp': 'webp', 'png': 'png'}
+
+# Что снимать: 'game' - окно игры (или монитор игры), 'all' - все мониторы, число - монитор mss
+Target = Union[str, int]
+
+class ScreenshotOptions:
+    """Что снимать и как кодировать"""
+
+    def __init__(self, target: Target = 'game', fmt: str = DEFAULT_FORMAT,
+                 quality: int = DEFAULT_QUALITY, scale: float = 1.0,
+                 max_side: Optional[int] = DEFAULT_MAX_SIDE):
+        self.target = target
+        self.fmt = fmt
+        self.quality = quality
+        self.scale = scale  # Дополнительное уменьшение (0.5 - вдвое)
+        self.max_side = max_side  # Длинная сторона не больше (None - без ограничения)
+
+    @classmethod
+    def parse(cls, words: List[str]) -> "ScreenshotOptions":
+        """Разбирает аргументы команды в любом порядке: game / all / номер монитора,
+        jpg / webp / png, q<качество>, x<масштаб> (например: 2 webp q60 x0.5).
+        Неизвестный аргумент - ValueError"""
+        options = cls()
+        for word in words:
+            word = word.lower()
+            if word in ('game', 'all'):
+                options.target = word
+            elif word.isdigit():
+                options.target = int(word)
+            elif word in FORMAT_ALIASES:
+                options.fmt = FORMAT_ALIASES[word]
+            elif word.startswith('q') and word[1:].isdigit():
+                options.quality = min(100, max(1, int(word[1:])))
+            elif word.startswith('x'):
+                options.scale = min(1.0, max(0.05, float(word[1:])))
+            else:
+                raise ValueError(f"Неизвестный параметр: {word}")
+        if options.fmt == 'png':
+            options.max_side = None  # PNG просят ради точной картинки
+        return options
+
+def capture(target: Target = 'game') -> np.ndarray:
+    """Снимает кадр BGRA (или BGR) цели"""
+    source = backend_module.get_screen_source()
+    capture_index = getattr(source, 'monitor_index', None)
+
+    # Монитор игры - через общий сервис захвата (с поддельным экраном - всегда он)
+    if target == 'game' or capture_index is None or target == capture_index:
+        region = find_game_window() if target == 'game' else None
+        try:
+            frame, _ = screen_capture.grab(region, timeout=2.0)
+        except TimeoutError:
+            if region is None:
+                raise
+            frame, _ = screen_capture.grab(None, timeout=2.0)  # Окно вне монитора захвата
+        return frame
+
+    # Другой монитор или все сразу (mss: 0 - все мониторы вместе)
+    other = MssScreenSource(0 if target == 'all' else int(target))
+    try:
+        monitor = other.open()
+        return other.grab(monitor).copy()
+    finally:
+        other.close()
+
+def encode_image(frame: np.ndarray, options: ScreenshotOptions, name: str = 'screenshot') -> BytesIO:
+    """Уменьшает кадр и кодирует его в формат из options"""
+    if frame.ndim == 3 and frame.shape[2] == 4:
+        frame = frame[:, :, :3]
+
+    height, width = frame.shape[:2]
+    scale = options.scale
+    if options.max_side and max(width, height) * scale > options.max_side:
+        scale = options.max_side / max(width, height)
+    if scale < 1.0:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    extension, quality_flag = FORMATS[options.fmt]
+    params = [quality_flag, options.quality] if quality_flag is not None else []
+    ok, data = cv2.imencode(extension, np.ascontiguousarray(frame), params)
+    if not ok:
+        raise RuntimeError(f"Не удалось закодировать скриншот в {options.fmt}")
+    bio = BytesIO(data.tobytes())
+    bio.name = name + extension
+    return bio
+
+def take_screenshot(options: Optional[ScreenshotOptions] = None) -> BytesIO:
+    """Снимает и кодирует скриншот в текущем потоке"""
+    options = options or ScreenshotOptions()
+    return encode_image(capture(options.target), options)
+
+class ScreenshotService:
+    """Пул потоков для скриншотов: захват и кодирование не занимают обработчики"""
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="screenshot")
+            return self.pool
+
+    def submit(self, options: ScreenshotOptions,
+               callback: Callable[[Optional[BytesIO], Optional[Exception]], None],
+               before: Optional[Callable[[], None]] = None,
+               after: Optional[Callable[[], None]] = None) -> Future:
+        """Снимает скриншот в пуле и вызывает callback(файл, ошибка) в потоке пула.
+        before/after выполняются в том же потоке до и после захвата (например,
+        нажатие F10 в игре)"""
+        def job():
+            try:
+                if before is not None:
+                    before()
+                try:
+                    frame = capture(options.target)
+                finally:
+                    if after is not None:
+                        after()
+                bio = encode_image(frame, options)
+            except Exception as e:
+                callback(None, e)
+                return
+            callback(bio, None)
+
+        return self.execute(job)
+
+    def execute(self, func: Callable[[], None]) -> Future:
+        """Выполняет func в потоке пула"""
+        return self._pool().submit(func)
+
+class ScreenWatch:
+    """Наблюдение за экраном для одного чата: раз в interval секунд снимает экран и
+    отправляет уменьшенный JPEG, только если картинка заметно изменилась с прошлой
+    отправленной"""
+
+    def __init__(self, chat_id: int, interval: float, threshold: float,
+                 callback: Callable[[BytesIO, float], None], options: ScreenshotOptions):
+        self.chat_id = chat_id
+        self.interval = interval
+        self.threshold = threshold  # Доля изменившихся точек миниатюры
+        self.callback = callback
+        self.options = options
+        self.task = None
+        self.busy = False  # Прошлая проверка ещё идёт в пуле
+        self.last_thumbnail: Optional[np.ndarray] = None
+        self.checked = 0
+        self.sent = 0
+
+    def tick(self):
+        """Таймер наблюдения: ставит проверку в пул, если прошлая закончилась"""
+        if not self.busy:
+            self.busy = True
+            screenshot_service.execute(self.check)
+
+    def check(self):
+        """Снимает экран и отправляет его, если изменение выше порога"""
+        try:
+            frame = capture(self.options.target)
+            small = thumbnail(frame)
+            ratio = 1.0 if self.last_thumbnail is None else change_ratio(self.last_thumbnail, small)
+            self.checked += 1
+            if ratio >= self.threshold:
+                bio = encode_image(frame, self.options, name='watch')
+                self.last_thumbnail = small
+                self.sent += 1
+                self.callback(bio, ratio)
+        except Exception as e:
+            print(f"Ошибка наблюдения за экраном: {e}")
+        finally:
+            self.busy = False
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+class ScreenWatcher:
+    """Наблюдения за экраном по чатам (в каждом чате - не больше одного)"""
+
+    def __init__(self):
+        self.watches: Dict[int, ScreenWatch] = {}
+        self.lock = threading.Lock()
+
+    def watch(self, chat_id: int, interval: float, callback: Callable[[BytesIO, float], None],
+              threshold: float = WATCH_THRESHOLD, options: Optional[ScreenshotOptions] = None) -> ScreenWatch:
+        """Запускает наблюдение (прежнее наблюдение этого чата заменяется)"""
+        from scheduler_module import every, PRIORITY_LOW
+        options = options or ScreenshotOptions(quality=WATCH_QUALITY, max_side=WATCH_MAX_SIDE)
+        watch = ScreenWatch(chat_id, interval, threshold, callback, options)
+        with self.lock:
+            previous = self.watches.get(chat_id)
+            if previous is not None:
+                previous.stop()
+            self.watches[chat_id] = watch
+        watch.task = every(interval, watch.tick, f"watch.{chat_id}", PRIORITY_LOW)
+        return watch
+
+    def unwatch(self, chat_id: int) -> Optional[ScreenWatch]:
+        """Останавливает наблюдение чата и возвращает его (None - наблюдения не было)"""
+        with self.lock:
+            watch = self.watches.pop(chat_id, None)
+        if watch is not None:
+            watch.stop()
+        return watch
+
+def thumbnail(frame: np.ndarray) -> np.ndarray:
+    """Серая миниатюра кадра для сравнения"""
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    return cv2.resize(frame, WATCH_THUMBNAIL, interpolation=cv2.INTER_AREA)
+
+def change_ratio(previous: np.ndarray, current: np.ndarray) -> float:
+    """Доля точек миниатюры, яркость которых изменилась больше WATCH_PIXEL_DELTA"""
+    return float(np.count_nonzero(cv2.absdiff(previous, current) > WATCH_PIXEL_DELTA)) / current.size
+
+# Глобальный сервис скриншотов и наблюдения
+screenshot_service = ScreenshotService()
+screen_watcher = ScreenWatcher()
+
+def request_screenshot(options: ScreenshotOptions,
+                       callback: Callable[[Optional[BytesIO], Optional[Exception]], None],
+                       before: Optional[Callable[[], None]] = None,
+                       after: Optional[Callable[[], None]] = None) -> Future:
+    """Ставит скриншот в пул и сразу возвращается"""
+    return screenshot_service.submit(options, callback, before, after)
+
+def describe(options: ScreenshotOptions, bio: BytesIO) -> str:
+    """Подпись: что снято, формат и размер файла"""
+    target = {'game': 'окно игры', 'all': 'все мониторы'}.get(options.target, f"монитор {options.target}")
+    return f"📸 Скриншот ({target}, {options.fmt}, {len(bio.getbuffer()) / 1024:.0f} КБ)"
+
+def watch(chat_id: int, interval: float, callback: Callable[[BytesIO, float], None],
+          threshold: float = WATCH_THRESHOLD) -> ScreenWatch:
+    """Запускает наблюдение за экраном для чата"""
+    return screen_watcher.watch(chat_id, interval, callback, threshold)
+
+def unwatch(chat_id: int) -> Optional[ScreenWatch]:
+    """Останавливает наблюдение за экраном для чата"""
+    return screen_watcher.unwatch(chat_id)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+"""Общие фикстуры тестов: модули бота лежат в корне репозитория"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend_module
+
+
+@pytest.fixture
+def fake_clock():
+    """Виртуальные часы на время теста (прежние часы возвращаются после него)"""
+    previous = backend_module.clock
+    clock = backend_module.FakeClock()
+    backend_module.use_backends(new_clock=clock)
+    yield clock
+    backend_module.use_backends(new_clock=previous)
+
+
+@pytest.fixture
+def fake_sink():
+    """Запись ввода вместо настоящей клавиатуры и мыши"""
+    previous = backend_module.input_sink
+    sink = backend_module.FakeInputSink()
+    backend_module.use_backends(sink=sink)
+    yield sink
+    backend_module.use_backends(sink=previous)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""Диспетчер ввода: приоритеты, слияние одинаковых действий и окно фоновых действий"""
+
+import threading
+
+import pytest
+
+import backend_module
+from input_module import (InputDispatcher, InputSource, INPUT_CRITICAL, INPUT_NORMAL,
+                          INPUT_BACKGROUND)
+
+TIMEOUT = 5.0
+
+
+class GatedSink(backend_module.FakeInputSink):
+    """Приёмник, который держит нажатие 'gate', пока тест не откроет его, -
+    остальные действия за это время копятся в очереди диспетчера"""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.opened = threading.Event()
+
+    def press(self, key: str):
+        if key == 'gate':
+            self.entered.set()
+            self.opened.wait(TIMEOUT)
+        super().press(key)
+
+
+@pytest.fixture
+def gated_sink():
+    previous = backend_module.input_sink
+    sink = GatedSink()
+    backend_module.use_backends(sink=sink)
+    yield sink
+    sink.opened.set()
+    backend_module.use_backends(sink=previous)
+
+
+def hold_dispatcher(dispatcher: InputDispatcher, sink: GatedSink):
+    """Занимает поток диспетчера нажатием 'gate'"""
+    dispatcher.submit('test', 'press', ('gate',), wait=False)
+    assert sink.entered.wait(TIMEOUT)
+
+
+def pressed(sink):
+    return [item.args[0] for item in sink.actions if item.action == 'press' and item.args[0] != 'gate']
+
+
+def test_priority_order(fake_clock, gated_sink):
+    sink = gated_sink
+    dispatcher = InputDispatcher(guard=0.0)
+    hold_dispatcher(dispatcher, sink)
+
+    requests = [dispatcher.submit('bot', 'press', ('normal',), INPUT_NORMAL, wait=False),
+                dispatcher.submit('afk', 'press', ('background',), INPUT_BACKGROUND, wait=False),
+                dispatcher.submit('kachalka', 'press', ('critical',), INPUT_CRITICAL, wait=False),
+                dispatcher.submit('bot', 'press', ('normal-2',), INPUT_NORMAL, wait=False)]
+    sink.opened.set()
+    assert all(request.wait(TIMEOUT) for request in requests)
+    assert pressed(sink) == ['critical', 'normal', 'normal-2', 'background']
+
+
+def test_merge_within_source(fake_clock, gated_sink):
+    sink = gated_sink
+    dispatcher = InputDispatcher(guard=0.0)
+    hold_dispatcher(dispatcher, sink)
+
+    bot = InputSource(dispatcher, 'bot')
+    other = InputSource(dispatcher, 'other')
+    first = bot.press('e', wait=False)
+    second = bot.press('e', wait=False)
+    foreign = other.press('e', wait=False)
+    texts = [bot.write('hi', wait=False), bot.write('hi', wait=False)]
+    sink.opened.set()
+    assert all(request.wait(TIMEOUT) for request in (first, foreign, *texts))
+
+    assert second is first and first.merged == 1
+    assert foreign is not first
+    assert sink.count('press', 'e') == 2  # Одно от bot и одно от other
+    assert sink.count('write', 'hi') == 2  # write не сливается
+    stats = dispatcher.get_stats()
+    assert stats['bot']['merged'] == 1 and stats['bot']['executed'] == 3
+    assert stats['other']['merged'] == 0 and stats['other']['executed'] == 1
+
+
+def test_merge_raises_priority(fake_clock, gated_sink):
+    sink = gated_sink
+    dispatcher = InputDispatcher(guard=0.0)
+    hold_dispatcher(dispatcher, sink)
+
+    low = dispatcher.submit('bot', 'press', ('e',), INPUT_NORMAL, wait=False)
+    dispatcher.submit('bot', 'press', ('f',), INPUT_NORMAL, wait=False)
+    same = dispatcher.submit('bot', 'press', ('e',), INPUT_CRITICAL, wait=False)
+    sink.opened.set()
+    assert same is low and low.wait(TIMEOUT)
+    assert dispatcher.submit('bot', 'press', ('g',), wait=True).wait(TIMEOUT)
+    assert pressed(sink) == ['e', 'f', 'g']
+
+
+def test_background_waits_for_guard(fake_clock, fake_sink):
+    dispatcher = InputDispatcher(guard=1.0)
+    critical = dispatcher.submit('kachalka', 'press', ('space',), INPUT_CRITICAL)
+    assert critical.done.is_set()
+
+    background = dispatcher.submit('afk', 'press', ('w',), INPUT_BACKGROUND, wait=False)
+    assert not background.wait(0.05)
+    fake_clock.sleep(1.0)
+    assert background.wait(TIMEOUT)
+    assert background.deferred
+    assert background.started_at - critical.executed_at >= 1.0
+
+
+def test_cancel_source(fake_clock, gated_sink):
+    sink = gated_sink
+    dispatcher = InputDispatcher(guard=0.0)
+    hold_dispatcher(dispatcher, sink)
+
+    requests = [dispatcher.submit('afk', 'press', (key,), wait=False) for key in 'wasd']
+    kept = dispatcher.submit('bot', 'press', ('e',), wait=False)
+    assert dispatcher.cancel_source('afk') == 4
+    sink.opened.set()
+    assert kept.wait(TIMEOUT)
+    assert all(request.cancelled and request.done.is_set() for request in requests)
+    assert pressed(sink) == ['e']
+
+
+def test_scheduler_task_yields_request(fake_clock, gated_sink):
+    from scheduler_module import Scheduler
+
+    dispatcher = InputDispatcher(guard=0.0)
+    hold_dispatcher(dispatcher, gated_sink)
+    keys = InputSource(dispatcher, 'roulette')
+    scheduler = Scheduler()
+    other_ran = threading.Event()
+
+    def recover():
+        request = yield keys.press('escape', wait=False)
+        return request.done.is_set()
+
+    def other():
+        other_ran.set()
+        yield
+
+    task = scheduler.spawn(recover(), 'recover')
+    scheduler.spawn(other(), 'other')
+    # Пока ввод занят, планировщик выполняет другие задачи
+    assert other_ran.wait(TIMEOUT)
+    assert task.is_alive()
+    gated_sink.opened.set()
+    assert task.wait(TIMEOUT)
+    assert task.result is True
+    assert pressed(gated_sink) == ['escape']
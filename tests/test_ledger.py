@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""Журнал рулетки: дозапись, оборванные записи и чужие файлы"""
+
+import numpy as np
+import pytest
+
+from ledger_module import RouletteLedger, read_ledger, settle, MAGIC, LEDGER_DTYPE
+
+
+def test_settle():
+    assert settle('red', 100, 'red') == 100
+    assert settle('green', 10, 'green') == 350
+    assert settle('black', 100, 'red') == -100
+    assert settle('red', 100, None) == 0
+
+
+def test_record_and_read(tmp_path):
+    path = str(tmp_path / 'sessions' / 'roulette.ledger')
+    ledger = RouletteLedger(path)
+    ledger.record('red', 100, 'red', timestamp=1.0)
+    ledger.record('red', 100, 'black', timestamp=2.0)
+    ledger.record('black', 50, None, timestamp=3.0)
+    ledger.close()
+
+    entries = read_ledger(path)
+    assert len(entries) == 3
+    assert entries['delta'].tolist() == [100, -100, 0]
+    stats = ledger.get_stats()
+    assert (stats['rounds'], stats['wins'], stats['losses'], stats['unknown']) == (3, 1, 1, 1)
+    assert stats['profit'] == 0 and stats['max_drawdown'] == 100
+
+
+def test_torn_record_is_truncated(tmp_path):
+    path = str(tmp_path / 'roulette.ledger')
+    ledger = RouletteLedger(path)
+    ledger.record('red', 100, 'red', timestamp=1.0)
+    ledger.close()
+    with open(path, 'ab') as f:
+        f.write(b'\x01' * (LEDGER_DTYPE.itemsize // 2))  # Выключение посреди записи
+
+    ledger = RouletteLedger(path)
+    ledger.record('black', 20, 'black', timestamp=2.0)
+    ledger.close()
+
+    entries = read_ledger(path)
+    assert entries['timestamp'].tolist() == [1.0, 2.0]
+    assert entries['amount'].tolist() == [100, 20]
+
+
+def test_torn_header_starts_over(tmp_path):
+    path = tmp_path / 'roulette.ledger'
+    path.write_bytes(MAGIC[:3])
+
+    ledger = RouletteLedger(str(path))
+    ledger.record('red', 10, 'red', timestamp=1.0)
+    ledger.close()
+    assert len(read_ledger(str(path))) == 1
+
+
+def test_foreign_file_is_not_appended(tmp_path):
+    path = tmp_path / 'roulette.ledger'
+    foreign = b'not a ledger at all'
+    path.write_bytes(foreign)
+
+    ledger = RouletteLedger(str(path))
+    ledger.record('red', 10, 'black', timestamp=1.0)
+    ledger.close()
+
+    assert (tmp_path / 'roulette.ledger.bad').read_bytes() == foreign
+    entries = read_ledger(str(path))
+    assert entries['delta'].tolist() == [-10]
+
+
+def test_read_rejects_foreign_file(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(np.zeros(4, dtype=LEDGER_DTYPE).tobytes())
+    with pytest.raises(ValueError):
+        read_ledger(str(path))
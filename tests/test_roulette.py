@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""Распознавание цвета плашки результата рулетки"""
+
+import numpy as np
+
+from roulette_module import recognize_outcome
+
+# Сукно стола и цвета плашек (BGR)
+FELT = (40, 110, 30)
+COLORS = {'red': (30, 30, 200), 'black': (20, 20, 20), 'green': (40, 180, 40)}
+
+
+def table():
+    return np.full((60, 120, 3), FELT, dtype=np.uint8)
+
+
+def with_plate(color):
+    frame = table()
+    frame[15:45, 30:90] = COLORS[color]
+    return frame
+
+
+def test_plate_colors():
+    background = table()
+    for color in COLORS:
+        assert recognize_outcome(with_plate(color), background) == color
+
+
+def test_no_plate():
+    assert recognize_outcome(table(), table()) is None
+
+
+def test_bgra_frames():
+    background = np.dstack([table(), np.full((60, 120), 255, np.uint8)])
+    plate = np.dstack([with_plate('black'), np.full((60, 120), 255, np.uint8)])
+    assert recognize_outcome(plate, background) == 'black'
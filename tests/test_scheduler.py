@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""Планировщик: порядок задач, виртуальное время и таймеры every()"""
+
+import threading
+
+from scheduler_module import Scheduler, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+
+TIMEOUT = 5.0
+
+
+def record(log, name, steps=1, pause=0.0):
+    """Задача, которая steps раз записывает своё имя с паузой pause"""
+    for _ in range(steps):
+        log.append(name)
+        yield pause
+
+
+def test_priority_order(fake_clock):
+    scheduler = Scheduler()
+    log = []
+    # Пока планировщик заблокирован, все задачи становятся готовыми одновременно
+    with scheduler.condition:
+        tasks = [scheduler.spawn(record(log, 'low'), 'low', PRIORITY_LOW),
+                 scheduler.spawn(record(log, 'normal-1'), 'normal-1', PRIORITY_NORMAL),
+                 scheduler.spawn(record(log, 'high'), 'high', PRIORITY_HIGH),
+                 scheduler.spawn(record(log, 'normal-2'), 'normal-2', PRIORITY_NORMAL)]
+    assert all(task.wait(TIMEOUT) for task in tasks)
+    assert log == ['high', 'normal-1', 'normal-2', 'low']
+
+
+def test_pauses_follow_virtual_clock(fake_clock):
+    scheduler = Scheduler()
+    log = []
+    with scheduler.condition:
+        slow = scheduler.spawn(record(log, 'slow', steps=2, pause=2.0), 'slow')
+        fast = scheduler.spawn(record(log, 'fast', steps=3, pause=0.5), 'fast')
+    assert slow.wait(TIMEOUT) and fast.wait(TIMEOUT)
+    assert log == ['slow', 'fast', 'fast', 'fast', 'slow']
+    assert fake_clock.time() == 4.0
+
+
+def test_task_result_and_error(fake_clock):
+    scheduler = Scheduler()
+
+    def ok():
+        yield 1.0
+        return 42
+
+    def broken():
+        yield
+        raise ValueError("сломалось")
+
+    done = scheduler.spawn(ok(), 'ok')
+    failed = scheduler.spawn(broken(), 'broken')
+    assert done.wait(TIMEOUT) and failed.wait(TIMEOUT)
+    assert done.result == 42
+    assert isinstance(failed.error, ValueError)
+
+
+def test_every_survives_errors(fake_clock):
+    scheduler = Scheduler()
+    calls = []
+    reached = threading.Event()
+
+    def tick():
+        calls.append(fake_clock.time())
+        if len(calls) >= 4:
+            reached.set()
+        if len(calls) == 1:
+            raise TimeoutError("Не удалось получить кадр экрана")
+        if len(calls) == 2:
+            return failing_step()
+
+    def failing_step():
+        yield 0.1
+        raise RuntimeError("ошибка внутри генератора")
+
+    timer = scheduler.every(1.0, tick, 'timer')
+    assert reached.wait(TIMEOUT)
+    assert timer.is_alive()
+    timer.cancel()
+    assert timer.wait(TIMEOUT)
+    assert timer.error is None
+    assert calls[:4] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_cancel_closes_generator(fake_clock):
+    scheduler = Scheduler()
+    started = threading.Event()
+    closed = threading.Event()
+
+    def endless():
+        started.set()
+        try:
+            while True:
+                yield 10.0
+        finally:
+            closed.set()
+
+    task = scheduler.spawn(endless(), 'endless')
+    assert started.wait(TIMEOUT)
+    task.cancel()
+    assert task.wait(TIMEOUT)
+    assert closed.is_set()
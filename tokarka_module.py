@@ -7,44 +7,54 @@
 
 import cv2
 import numpy as np
-import pyautogui
-import pydirectinput
-import time
-import threading
 from typing import Optional, Tuple
+from vision_module import template_matcher, ChangeDetector
+from backend_module import sleep, now
+from input_module import input_source
+from recorder_module import record_frame
+from metrics_module import bot_metrics
+from scheduler_module import spawn, Offload
 
 class TokarkaBot:
     """Класс для автоматической работы с токарным станком"""
     
     def __init__(self):
         self.running = False
-        self.thread = None
+        self.task = None
         self.tokarka_image = "Tokarka.png"
         self.confidence = 0.8
+        self.change_detector = ChangeDetector()
+        self.last_location = None
+        self.metrics = bot_metrics('tokarka')
+        self.input = input_source('tokarka')
         
-    def find_tokarka(self) -> Optional[Tuple[int, int, int, int]]:
-        """Ищет токарный станок на экране"""
+        if not template_matcher.load(self.tokarka_image, remember_hit=True):
+            print(f"⚠️ Не найдено изображение токарки: {self.tokarka_image}")
+        template_matcher.save_cache()
+        
+    def find_tokarka(self, frame=None, origin: Tuple[int, int] = (0, 0)) -> Optional[Tuple[int, int, int, int]]:
+        """Ищет токарный станок на экране (или на переданном кадре)"""
         try:
-            location = pyautogui.locateOnScreen(
+            return template_matcher.find(
                 self.tokarka_image, 
+                frame=frame,
+                origin=origin,
                 confidence=self.confidence
             )
-            if location:
-                return (location.left, location.top, location.width, location.height)
         except Exception as e:
             print(f"Ошибка поиска токарки: {e}")
         return None
     
-    def click_tokarka(self, location: Tuple[int, int, int, int]) -> bool:
-        """Кликает по токарному станку"""
+    def click_tokarka(self, location: Tuple[int, int, int, int], pause: float = 0.5) -> bool:
+        """Кликает по токарному станку (и ждёт pause секунд, пока игра отреагирует)"""
         try:
             # Вычисляем центр изображения
             center_x = location[0] + location[2] // 2
             center_y = location[1] + location[3] // 2
             
             # Кликаем по центру
-            pydirectinput.click(center_x, center_y)
-            time.sleep(0.5)
+            self.input.direct_click(center_x, center_y)
+            sleep(pause)
             return True
         except Exception as e:
             print(f"Ошибка клика по токарке: {e}")
@@ -64,10 +74,10 @@ class TokarkaBot:
                 return False
             
             # Нажимаем клавиши для начала работы
-            pydirectinput.press('e')  # Взаимодействие
-            time.sleep(0.5)
-            pydirectinput.press('space')  # Подтверждение
-            time.sleep(0.5)
+            self.input.press('e')  # Взаимодействие
+            sleep(0.5)
+            self.input.press('space')  # Подтверждение
+            sleep(0.5)
             
             print("Работа с токарным станком начата")
             return True
@@ -80,8 +90,8 @@ class TokarkaBot:
         """Останавливает работу с токарным станком"""
         try:
             # Нажимаем Escape для выхода
-            pydirectinput.press('escape')
-            time.sleep(0.5)
+            self.input.press('escape')
+            sleep(0.5)
             
             print("Работа с токарным станком остановлена")
             return True
@@ -91,14 +101,24 @@ class TokarkaBot:
             return False
     
     def run_tokarka_loop(self, debug: bool = False):
-        """Основной цикл работы токарки"""
+        """Основной цикл работы токарки (задача планировщика)"""
         print("🔄 Запуск цикла токарки...")
         
         while self.running:
             try:
-                # Ищем токарку
-                location = self.find_tokarka()
+                frame, origin = yield from template_matcher.capture_task()
+                self.metrics.observe('capture', template_matcher.capture_duration)
+                timestamp = now()
+                
+                # Ищем токарку только если экран изменился
+                with self.metrics.stage('match'):
+                    if self.change_detector.changed(frame):
+                        self.last_location = yield Offload(self.find_tokarka, frame, origin)
+                    elif debug:
+                        print("Экран не изменился, использую предыдущий результат")
                 
+                location = self.last_location
+                self.metrics.iteration(hit=location is not None)
                 if location:
                     if debug:
                         print(f"Токарка найдена в позиции: {location}")
@@ -107,23 +127,28 @@ class TokarkaBot:
                     # Здесь можно добавить логику проверки состояния
                     
                     # Нажимаем E для взаимодействия
-                    pydirectinput.press('e')
-                    time.sleep(1)
+                    yield self.input.press('e', wait=False)
+                    yield 1
                     
                     # Нажимаем пробел для подтверждения
-                    pydirectinput.press('space')
-                    time.sleep(2)
+                    yield self.input.press('space', wait=False)
+                    yield 2
                     
                 else:
                     if debug:
                         print("Токарка не найдена, ожидание...")
                 
+                record_frame('tokarka', frame, origin, timestamp, {
+                    'location': location,
+                    'interact': location is not None,
+                })
+                
                 # Пауза между циклами
-                time.sleep(3)
+                yield 3
                 
             except Exception as e:
                 print(f"Ошибка в цикле токарки: {e}")
-                time.sleep(1)
+                yield 1
         
         print("🛑 Цикл токарки остановлен")
     
@@ -134,12 +159,9 @@ class TokarkaBot:
             return False
         
         self.running = True
-        self.thread = threading.Thread(
-            target=self.run_tokarka_loop, 
-            args=(debug,),
-            daemon=True
-        )
-        self.thread.start()
+        self.change_detector.reset()
+        self.last_location = None
+        self.task = spawn(self.run_tokarka_loop(debug), "tokarka")
         print("✅ Токарка запущена")
         return True
     
@@ -150,8 +172,9 @@ class TokarkaBot:
             return False
         
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=2)
+        if self.task:
+            self.task.cancel()
+            self.task = None
         print("🛑 Токарка остановлена")
         return True
     
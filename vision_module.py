@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль компьютерного зрения - общий движок поиска шаблонов на экране
+"""
+
+import os
+import json
+import hashlib
+import threading
+import cv2
+import numpy as np
+from typing import Any, Callable, Optional, Tuple, Dict, List
+from capture_module import screen_capture
+from scheduler_module import WaitFrame
+
+# Шаблоны вырезаны на экране высотой 1080 пикселей
+REFERENCE_HEIGHT = 1080
+
+# Масштабы пирамиды шаблонов: от 1366x768 до 4K
+DEFAULT_SCALES = (0.7, 0.85, 1.0, 1.15, 1.33, 1.5, 1.75, 2.0)
+# Сколько лучших совпадений на одном масштабе нужно, чтобы запомнить его
+SCALE_LOCK_HITS = 3
+# Изменение высоты экрана (доля), после которого запомненный масштаб сбрасывается
+SCALE_HINT_TOLERANCE = 0.01
+
+# Кэш декодированных шаблонов: template_cache.npy + template_cache.json
+CACHE_PATH = "template_cache"
+
+class Template:
+    """Шаблон, декодированный и отмасштабированный один раз при загрузке"""
+
+    def __init__(self, path: str, bgr: Optional[np.ndarray], remember_hit: bool = False,
+                 scales: Tuple[float, ...] = (1.0,),
+                 levels: Optional[Dict[float, Tuple[np.ndarray, np.ndarray]]] = None):
+        self.path = path
+        self.remember_hit = remember_hit
+        self.last_hit: Optional[Tuple[int, int, int, int]] = None
+        
+        # Пирамида: масштаб -> (BGR, серый); готовая пирамида приходит из кэша
+        if levels is not None:
+            self.levels = levels
+            self.bgr, self.gray = levels[1.0]
+            self.height, self.width = self.gray.shape
+            return
+        
+        self.bgr = bgr
+        self.gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        self.height, self.width = self.gray.shape
+        self.levels: Dict[float, Tuple[np.ndarray, np.ndarray]] = {}
+        for scale in scales:
+            if scale == 1.0:
+                self.levels[scale] = (self.bgr, self.gray)
+                continue
+            width = max(1, round(self.width * scale))
+            height = max(1, round(self.height * scale))
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            level_bgr = cv2.resize(bgr, (width, height), interpolation=interpolation)
+            self.levels[scale] = (level_bgr, cv2.cvtColor(level_bgr, cv2.COLOR_BGR2GRAY))
+
+    def materialize(self):
+        """Копирует пирамиду из отображённого файла кэша в память"""
+        self.levels = {scale: (np.array(level_bgr), np.array(level_gray))
+                       for scale, (level_bgr, level_gray) in self.levels.items()}
+        self.bgr, self.gray = self.levels[1.0]
+
+    def level(self, scale: float, grayscale: bool = True) -> np.ndarray:
+        """Возвращает шаблон нужного масштаба"""
+        level_bgr, level_gray = self.levels[scale]
+        return level_gray if grayscale else level_bgr
+
+def to_gray(frame: np.ndarray) -> np.ndarray:
+    """Переводит кадр (BGRA, BGR или уже серый) в оттенки серого"""
+    if frame.ndim == 2:
+        return frame
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+def to_bgr(frame: np.ndarray) -> np.ndarray:
+    """Переводит кадр в BGR без альфа-канала"""
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return frame
+
+class TemplateCache:
+    """Кэш шаблонов на диске для быстрого холодного старта.
+
+    Все уровни пирамид всех шаблонов лежат подряд в одном файле .npy, который
+    открывается одним mmap; индекс .json хранит смещения и формы массивов, а
+    также mtime, размер и хэш исходного файла. Изменённый PNG пересобирается
+    отдельно, остальные записи берутся из кэша как есть.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.data_path = path + ".npy"
+        self.index_path = path + ".json"
+        self.index = {'scales': [], 'scale': None, 'entries': {}}
+        self.data: Optional[np.ndarray] = None
+        self.dirty = False
+        self.opened = False
+        self.lock = threading.Lock()
+
+    def open(self, scales: Tuple[float, ...]):
+        """Читает индекс и отображает файл данных в память (один раз)"""
+        if self.opened:
+            return
+        self.opened = True
+        self.index = {'scales': list(scales), 'scale': None, 'entries': {}}
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            data = np.load(self.data_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return
+
+        if index.get('scales') != list(scales):
+            print("⚠️ Масштабы в кэше шаблонов устарели - кэш будет пересобран")
+            self.dirty = True
+            return
+        self.index = index
+        self.data = data
+
+    @staticmethod
+    def source_key(path: str) -> Tuple[int, int]:
+        """Быстрый ключ исходного файла: mtime и размер"""
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _view(self, spec) -> np.ndarray:
+        """Возвращает массив из отображённого файла по смещению и форме"""
+        offset, shape = spec
+        size = int(np.prod(shape))
+        return self.data[offset:offset + size].reshape(shape)
+
+    def get(self, path: str) -> Optional[Dict[float, Tuple[np.ndarray, np.ndarray]]]:
+        """Возвращает пирамиду шаблона из кэша или None, если запись устарела"""
+        entry = self.index['entries'].get(path)
+        if entry is None or self.data is None:
+            return None
+
+        mtime, size = self.source_key(path)
+        if entry['mtime'] != mtime or entry['size'] != size:
+            # mtime сменился - сверяем содержимое по хэшу
+            with open(path, 'rb') as f:
+                if hashlib.sha1(f.read()).hexdigest() != entry['hash']:
+                    return None
+            entry['mtime'], entry['size'] = mtime, size
+            self.dirty = True
+
+        try:
+            return {scale: (self._view(bgr_spec), self._view(gray_spec))
+                    for scale, bgr_spec, gray_spec in entry['levels']}
+        except ValueError:
+            return None
+
+    def put(self, path: str, digest: str):
+        """Отмечает шаблон как пересобранный; данные запишет save()"""
+        mtime, size = self.source_key(path)
+        self.index['entries'][path] = {'mtime': mtime, 'size': size, 'hash': digest, 'levels': []}
+        self.dirty = True
+
+    def set_scale(self, scale: Optional[float], hint: Optional[float] = None):
+        """Запоминает найденный масштаб шаблонов и высоту экрана (в долях эталона), при
+        которой он найден"""
+        if self.index.get('scale') != scale or self.index.get('scale_hint') != hint:
+            self.index['scale'] = scale
+            self.index['scale_hint'] = hint
+            self.dirty = True
+
+    def save(self, templates: Dict[str, Template]):
+        """Перезаписывает файл кэша, если что-то изменилось"""
+        with self.lock:
+            if not self.dirty:
+                return
+
+            blobs, offset, entries = [], 0, {}
+            for path, entry in self.index['entries'].items():
+                # Загруженные шаблоны берём из памяти, остальные - из старого файла
+                template = templates.get(path)
+                if template is not None:
+                    levels = template.levels
+                else:
+                    try:
+                        levels = self.get(path)
+                    except OSError:
+                        levels = None
+                    if levels is None:
+                        continue
+
+                entries[path] = entry
+                entry['levels'] = []
+                for scale, (level_bgr, level_gray) in levels.items():
+                    specs = []
+                    for array in (level_bgr, level_gray):
+                        blobs.append(np.ascontiguousarray(array).ravel())
+                        specs.append([offset, list(array.shape)])
+                        offset += array.size
+                    entry['levels'].append([scale] + specs)
+
+            data = np.concatenate(blobs) if blobs else np.empty(0, dtype=np.uint8)
+            self.index['entries'] = entries
+
+            # Отпускаем старое отображение, иначе на Windows файл нельзя заменить
+            for template in templates.values():
+                template.materialize()
+            self.data = None
+
+            try:
+                with open(self.data_path + ".tmp", 'wb') as f:
+                    np.save(f, data)
+                with open(self.index_path + ".tmp", 'w', encoding='utf-8') as f:
+                    json.dump(self.index, f)
+                os.replace(self.data_path + ".tmp", self.data_path)
+                os.replace(self.index_path + ".tmp", self.index_path)
+                self.dirty = False
+            except OSError as e:
+                print(f"⚠️ Не удалось сохранить кэш шаблонов: {e}")
+            self.data = data
+
+class TemplateMatcher:
+    """Движок поиска шаблонов через cv2.matchTemplate по одному захваченному кадру"""
+
+    def __init__(self, confidence: float = 0.8, grayscale: bool = True, search_padding: int = 64,
+                 scales: Tuple[float, ...] = DEFAULT_SCALES, cache_path: Optional[str] = CACHE_PATH):
+        self.templates: Dict[str, Template] = {}
+        self.confidence = confidence
+        self.grayscale = grayscale
+        self.search_padding = search_padding  # Отступ окна вокруг последнего попадания
+        
+        # Масштаб, на котором шаблоны совпали на этой машине (None - ещё не определён)
+        self.scales = scales
+        self.scale: Optional[float] = None
+        self.scale_hint = 1.0
+        self.locked_hint: Optional[float] = None  # scale_hint, при котором запомнен масштаб
+        self.scale_votes: Dict[float, int] = {}   # Лучшие совпадения по масштабам до запоминания
+        self.capture_duration = 0.0  # Длительность захвата последнего кадра capture_task (с)
+        
+        # Статистика поиска по окну последнего попадания
+        self.local_hits = 0
+        self.full_scans = 0
+        
+        # Кэш декодированных шаблонов (None - без кэша)
+        self.cache = TemplateCache(cache_path) if cache_path else None
+        
+        # Обработчики найденных совпадений: listener(path, (x, y, w, h))
+        self.hit_listeners: List[Callable[[str, Tuple[int, int, int, int]], Any]] = []
+
+    def _open_cache(self):
+        """Открывает кэш и восстанавливает сохранённый в нём масштаб"""
+        if self.cache is None or self.cache.opened:
+            return
+        self.cache.open(self.scales)
+        if self.scale is None:
+            self.scale = self.cache.index.get('scale')
+            self.locked_hint = self.cache.index.get('scale_hint')
+
+    def load(self, path: str, remember_hit: bool = False) -> bool:
+        """Декодирует шаблон с диска (только при первом обращении)"""
+        if path in self.templates:
+            if remember_hit:
+                self.templates[path].remember_hit = True
+            return True
+        if not os.path.exists(path):
+            return False
+
+        self._open_cache()
+        if self.cache is not None:
+            levels = self.cache.get(path)
+            if levels is not None:
+                self.templates[path] = Template(path, None, remember_hit, self.scales, levels)
+                return True
+
+        # Читаем файл один раз: и для декодирования, и для хэша в кэше
+        with open(path, 'rb') as f:
+            content = f.read()
+        bgr = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if bgr is None:
+            print(f"⚠️ Не удалось декодировать шаблон: {path}")
+            return False
+
+        self.templates[path] = Template(path, bgr, remember_hit, self.scales)
+        if self.cache is not None:
+            self.cache.put(path, hashlib.sha1(content).hexdigest())
+        return True
+
+    def save_cache(self):
+        """Сохраняет кэш шаблонов на диск, если были изменения"""
+        if self.cache is not None:
+            self.cache.save(self.templates)
+
+    def has(self, path: str) -> bool:
+        """Проверяет, загружен ли шаблон"""
+        return path in self.templates
+
+    def capture(self, region: Optional[Tuple[int, int, int, int]] = None) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Захватывает кадр (BGRA) через общий сервис захвата и возвращает его
+        вместе с координатами левого верхнего угла"""
+        frame, origin = screen_capture.grab(region)
+        if region is None:
+            self._update_hint(frame)
+        return frame, origin
+
+    def capture_task(self, region: Optional[Tuple[int, int, int, int]] = None):
+        """То же, что capture(), для задач планировщика: кадр ждётся через yield
+        (frame, origin = yield from template_matcher.capture_task())"""
+        subscription = screen_capture.subscribe(region, fps=None)
+        try:
+            ready = yield WaitFrame(subscription)
+            result = subscription.read(timeout=0, copy=True) if ready else None
+            self.capture_duration = subscription.duration
+        finally:
+            subscription.close()
+
+        if result is None:
+            raise TimeoutError("Не удалось получить кадр экрана")
+        frame, origin = result
+        if region is None:
+            self._update_hint(frame)
+        return frame, origin
+
+    def _update_hint(self, frame: np.ndarray):
+        """Обновляет подсказку масштаба по высоте полного кадра. Если экран стал
+        другим, чем при запоминании масштаба, масштаб ищется заново"""
+        self.scale_hint = frame.shape[0] / REFERENCE_HEIGHT
+        if (self.scale is not None and self.locked_hint is not None
+                and abs(self.scale_hint - self.locked_hint) > SCALE_HINT_TOLERANCE):
+            print(f"🔍 Разрешение экрана изменилось, масштаб шаблонов x{self.scale} сброшен")
+            self.reset_scale()
+
+    def prepare(self, frame: np.ndarray) -> np.ndarray:
+        """Один раз переводит кадр в формат сопоставления (серый или BGR),
+        чтобы не конвертировать его заново для каждого шаблона"""
+        return to_gray(frame) if self.grayscale else to_bgr(frame)
+
+    def candidate_scales(self) -> List[float]:
+        """Масштабы для перебора: найденный ранее или все, начиная с ближайшего к разрешению экрана"""
+        if self.scale is not None:
+            return [self.scale]
+        return sorted(self.scales, key=lambda scale: abs(scale - self.scale_hint))
+
+    def lock_scale(self, scale: float):
+        """Запоминает масштаб, на котором шаблоны совпадают на этой машине.
+        Вызывается из поиска (часто в фоновом потоке), поэтому кэш здесь только
+        помечается изменённым - на диск его пишет save_cache() загрузки шаблонов
+        или выключения бота, а не поток, который сейчас сопоставляет шаблоны"""
+        self.scale_votes.clear()
+        if self.scale != scale:
+            self.scale = scale
+            self.locked_hint = self.scale_hint
+            print(f"🔍 Масштаб шаблонов определён: x{scale}")
+            if self.cache is not None:
+                self.cache.set_scale(scale, self.scale_hint)
+
+    def reset_scale(self):
+        """Сбрасывает запомненный масштаб (после смены разрешения или размера окна игры)"""
+        self.scale = None
+        self.locked_hint = None
+        self.scale_votes.clear()
+        if self.cache is not None:
+            self.cache.set_scale(None)
+
+    def _vote_scale(self, scale: float):
+        """Засчитывает масштаб, давший лучшее совпадение. Масштаб запоминается только
+        после SCALE_LOCK_HITS таких совпадений, а не по первому случайному"""
+        votes = self.scale_votes.get(scale, 0) + 1
+        self.scale_votes[scale] = votes
+        if votes >= SCALE_LOCK_HITS:
+            self.lock_scale(scale)
+
+    def _match_template(self, template: Template, frame: np.ndarray, origin: Tuple[int, int],
+                        confidence: float) -> Optional[Tuple[int, int, int, int, float]]:
+        """Ищет шаблон на всём переданном кадре. Пока масштаб не запомнен,
+        проверяются все масштабы пирамиды и берётся лучшее совпадение"""
+        image = self.prepare(frame)
+        locked = self.scale is not None
+        best = None
+        best_scale = None
+
+        for scale in self.candidate_scales():
+            if scale not in template.levels:
+                continue
+            needle = template.level(scale, self.grayscale)
+            height, width = needle.shape[:2]
+            if image.shape[0] < height or image.shape[1] < width:
+                continue
+
+            result = cv2.matchTemplate(image, needle, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (x, y) = cv2.minMaxLoc(result)
+            if score >= confidence and (best is None or score > best[4]):
+                best = (origin[0] + x, origin[1] + y, width, height, float(score))
+                best_scale = scale
+
+        if best is not None and not locked:
+            self._vote_scale(best_scale)
+        return best
+
+    def _last_hit_window(self, template: Template, frame: np.ndarray,
+                         origin: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """Возвращает окно кадра (x0, y0, x1, y1) вокруг последнего попадания шаблона"""
+        if not template.remember_hit or template.last_hit is None:
+            return None
+
+        x, y, w, h = template.last_hit
+        pad = self.search_padding
+        x0 = max(0, x - origin[0] - pad)
+        y0 = max(0, y - origin[1] - pad)
+        x1 = min(frame.shape[1], x - origin[0] + w + pad)
+        y1 = min(frame.shape[0], y - origin[1] + h + pad)
+
+        if x1 - x0 < w or y1 - y0 < h:
+            return None
+        return (x0, y0, x1, y1)
+
+    def add_hit_listener(self, listener: Callable[[str, Tuple[int, int, int, int]], Any]):
+        """Подписывает listener на каждое найденное совпадение (вызывается в потоке поиска)"""
+        self.hit_listeners.append(listener)
+
+    def _notify(self, path: str, hit: Tuple[int, ...]):
+        for listener in self.hit_listeners:
+            try:
+                listener(path, hit[:4])
+            except Exception as e:
+                print(f"Ошибка обработчика попадания {path}: {e}")
+
+    def match(self, path: str, frame: np.ndarray, origin: Tuple[int, int] = (0, 0),
+              confidence: Optional[float] = None) -> Optional[Tuple[int, int, int, int, float]]:
+        """Сопоставляет шаблон с кадром и возвращает (x, y, w, h, score) лучшего совпадения.
+        Если шаблон помнит последнее попадание, сначала проверяется окно вокруг него"""
+        template = self.templates.get(path)
+        if template is None:
+            return None
+
+        if confidence is None:
+            confidence = self.confidence
+
+        window = self._last_hit_window(template, frame, origin)
+        if window:
+            x0, y0, x1, y1 = window
+            hit = self._match_template(template, frame[y0:y1, x0:x1],
+                                       (origin[0] + x0, origin[1] + y0), confidence)
+            if hit:
+                self.local_hits += 1
+                template.last_hit = hit[:4]
+                self._notify(path, hit)
+                return hit
+            self.full_scans += 1
+
+        hit = self._match_template(template, frame, origin, confidence)
+        if hit:
+            if template.remember_hit:
+                template.last_hit = hit[:4]
+            self._notify(path, hit)
+        return hit
+
+    def find(self, path: str, frame: Optional[np.ndarray] = None, origin: Tuple[int, int] = (0, 0),
+             confidence: Optional[float] = None) -> Optional[Tuple[int, int, int, int]]:
+        """Ищет шаблон на кадре (или на свежем снимке экрана) и возвращает (x, y, w, h)"""
+        if path not in self.templates:
+            return None
+
+        if frame is None:
+            frame, origin = self.capture()
+
+        hit = self.match(path, frame, origin, confidence)
+        if hit:
+            return hit[:4]
+        return None
+
+    def get_stats(self) -> Dict[str, float]:
+        """Возвращает статистику попаданий в окне против полных проходов по экрану"""
+        total = self.local_hits + self.full_scans
+        return {
+            'local_hits': self.local_hits,
+            'full_scans': self.full_scans,
+            'local_ratio': self.local_hits / total if total else 0.0,
+        }
+
+class ChangeDetector:
+    """Дешёвый детектор изменений кадра перед дорогим поиском шаблонов.
+    Кадр усредняется по ячейкам, и изменением считается разница хотя бы одной ячейки"""
+
+    def __init__(self, cell_size: int = 16, threshold: float = 6.0):
+        self.cell_size = cell_size
+        self.threshold = threshold
+        self.previous: Optional[np.ndarray] = None
+        
+        # Статистика
+        self.checked = 0
+        self.skipped = 0
+
+    def changed(self, frame: np.ndarray) -> bool:
+        """Проверяет, изменился ли кадр с момента последнего изменения"""
+        height, width = frame.shape[:2]
+        size = (max(1, width // self.cell_size), max(1, height // self.cell_size))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        self.checked += 1
+
+        if self.previous is not None and self.previous.shape == small.shape:
+            if cv2.absdiff(small, self.previous).max() <= self.threshold:
+                self.skipped += 1
+                return False
+
+        self.previous = small
+        return True
+
+    def reset(self):
+        """Забывает предыдущий кадр - следующий кадр будет считаться изменённым"""
+        self.previous = None
+
+    def get_stats(self) -> Dict[str, float]:
+        """Возвращает количество проверок и пропущенных сопоставлений"""
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / self.checked if self.checked else 0.0,
+        }
+
+def center(location: Tuple[int, int, int, int]) -> Tuple[int, int]:
+    """Возвращает центр найденной области"""
+    return (location[0] + location[2] // 2, location[1] + location[3] // 2)
+
+# Глобальный экземпляр движка
+template_matcher = TemplateMatcher()
+
+def load_template(path: str, remember_hit: bool = False) -> bool:
+    """Загружает шаблон в общий движок"""
+    return template_matcher.load(path, remember_hit)
+
+def save_template_cache():
+    """Сохраняет кэш шаблонов на диск"""
+    template_matcher.save_cache()
+
+def find_template(path: str, confidence: Optional[float] = None) -> Optional[Tuple[int, int, int, int]]:
+    """Ищет шаблон на экране"""
+    return template_matcher.find(path, confidence=confidence)
+
+def get_matcher_stats() -> Dict[str, float]:
+    """Возвращает статистику поиска шаблонов"""
+    return template_matcher.get_stats()
+
+def capture_screen(region: Optional[Tuple[int, int, int, int]] = None) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Захватывает экран"""
+    return template_matcher.capture(region)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Модуль окна игры - где на экране игра и как её координаты переводятся в экранные.
+
+Боты задают клики и области в координатах игры: в пикселях эталонного окна
+1920x1080, под которое вырезаны шаблоны. Калибровка находит окно игры (клиентскую
+область окна по заголовку через pygetwindow, без рамки и заголовка; по значку-якорю
+или, если ничего не нашлось, весь монитор захвата) и строит преобразование
+«масштаб + сдвиг», которое кэшируется.
+
+Значок рулетки виден только в рулетке, поэтому калибровку проверяет любое попадание
+шаблона любого бота: поиск шаблонов сообщает о каждом найденном совпадении, место
+шаблона в координатах игры запоминается в window_calibration.json, и окно ищется
+заново, только если шаблон сдвинулся или изменил размер. Строить преобразование без
+окна можно только по якорю и статичным элементам интерфейса; шаблоны, которые
+двигаются внутри игры (номера, функции), при первом сдвиге выходят из проверки.
+Отдельных поисков по всему экрану для калибровки нет.
+"""
+
+import os
+import json
+import threading
+from typing import Dict, Optional, Set, Tuple
+import backend_module
+from capture_module import screen_capture, Region
+from vision_module import template_matcher, REFERENCE_HEIGHT
+
+GAME_WINDOW_TITLE = os.environ.get('BOT_GAME_WINDOW', 'Grand Theft Auto V')
+
+# Эталонное окно игры (высота - та же, под которую вырезаны шаблоны)
+REFERENCE_WIDTH = 1920
+
+# Якорь - ориентир, который ищется на экране, когда окна игры не видно
+ANCHOR_IMAGE = os.environ.get('BOT_ANCHOR_IMAGE', 'roulette.png')
+CALIBRATION_PATH = "window_calibration.json"
+
+# Статичные элементы интерфейса (через запятую), по которым, как и по якорю, можно
+# калиброваться без окна игры. Остальные шаблоны только назначают поиск окна
+STATIC_TEMPLATES = tuple(path for path in os.environ.get('BOT_STATIC_TEMPLATES', '').split(',') if path)
+
+# Допуск, в пределах которого ориентир считается на месте
+ANCHOR_TOLERANCE = 3        # Пикселей по положению
+ANCHOR_SCALE_TOLERANCE = 0.05  # Доля по размеру
+
+class GameTransform:
+    """Преобразование координат игры в экранные: экран = сдвиг + масштаб * игра"""
+
+    def __init__(self, scale: float, offset_x: float, offset_y: float, source: str = ''):
+        self.scale = scale
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.source = source  # Откуда взято: окно игры, якорь или монитор
+
+    def point(self, x: float, y: float) -> Tuple[int, int]:
+        """Точка игры на экране"""
+        return round(self.offset_x + x * self.scale), round(self.offset_y + y * self.scale)
+
+    def region(self, x: float, y: float, width: float, height: float) -> Region:
+        """Область игры (left, top, width, height) на экране"""
+        left, top = self.point(x, y)
+        return left, top, max(1, round(width * self.scale)), max(1, round(height * self.scale))
+
+    def rect(self, x1: float, y1: float, x2: float, y2: float) -> Tuple[int, int, int, int]:
+        """Прямоугольник игры (x1, y1, x2, y2) на экране"""
+        return self.point(x1, y1) + self.point(x2, y2)
+
+    def to_game(self, x: float, y: float) -> Tuple[float, float]:
+        """Экранная точка в координатах игры"""
+        return (x - self.offset_x) / self.scale, (y - self.offset_y) / self.scale
+
+    def describe(self) -> str:
+        return f"x{self.scale:.3f}, сдвиг ({self.offset_x:.0f}, {self.offset_y:.0f}), {self.source}"
+
+def fit_window(left: int, top: int, width: int, height: int, source: str = '') -> GameTransform:
+    """Вписывает эталонное окно в прямоугольник экрана с сохранением пропорций
+    (при других пропорциях игра рисуется по центру с полосами)"""
+    scale = min(width / REFERENCE_WIDTH, height / REFERENCE_HEIGHT)
+    return GameTransform(scale, left + (width - REFERENCE_WIDTH * scale) / 2,
+                         top + (height - REFERENCE_HEIGHT * scale) / 2, source)
+
+def client_rect(window) -> Optional[Region]:
+    """Клиентская область окна pygetwindow - то, где игра рисует кадр, без рамки и
+    заголовка - в экранных координатах (None - не Windows или окно недоступно)"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+    except (ImportError, AttributeError):
+        return None
+    rect = wintypes.RECT()
+    corner = wintypes.POINT(0, 0)
+    handle = window._hWnd
+    if not user32.GetClientRect(handle, ctypes.byref(rect)) or \
+            not user32.ClientToScreen(handle, ctypes.byref(corner)):
+        return None
+    return (corner.x, corner.y, rect.right - rect.left, rect.bottom - rect.top)
+
+def find_game_window() -> Optional[Region]:
+    """Клиентская область окна игры на экране (None - окно не найдено или pygetwindow
+    недоступен). Если клиентскую область узнать не удалось - окно целиком"""
+    try:
+        import pygetwindow
+        windows = pygetwindow.getWindowsWithTitle(GAME_WINDOW_TITLE)
+    except Exception:
+        return None
+    for window in windows:
+        if window.width <= 0 or window.height <= 0 or window.isMinimized:
+            continue
+        try:
+            area = client_rect(window)
+        except Exception:
+            area = None
+        if area is None:
+            area = (window.left, window.top, window.width, window.height)
+        if area[2] > 0 and area[3] > 0:
+            return area
+    return None
+
+class GameWindow:
+    """Кэш преобразования координат игры и шаблоны, по которым оно проверяется.
+
+    Место каждого найденного ботами шаблона в координатах игры запоминается. Шаблон,
+    найденный не там, где его ждут, назначает калибровку заново, но строить по нему
+    преобразование можно только статичным элементам интерфейса (STATIC_TEMPLATES с
+    якорем): остальные (номера, функции, токарка) сразу считаются подвижными, а
+    калибровка ищет окно или якорь. Сама калибровка и запись файла выполняются при
+    следующем обращении к преобразованию (get), а не в потоке поиска шаблонов"""
+
+    def __init__(self, anchor: str = ANCHOR_IMAGE, path: Optional[str] = CALIBRATION_PATH,
+                 static: Tuple[str, ...] = STATIC_TEMPLATES):
+        self.anchor = anchor  # Ориентир, который ищется на экране при калибровке без окна
+        self.path = path
+        self.static: Set[str] = {anchor, *static}
+        self.lock = threading.RLock()
+        self.transform: Optional[GameTransform] = None
+        # Левый верхний угол шаблонов в координатах игры
+        self.landmarks: Dict[str, Tuple[float, float]] = {}
+        self.moving: Set[str] = set()  # Шаблоны, которые двигаются внутри игры
+        self.loaded = False
+        self.dirty = False
+        self.calibrating = False
+
+        # Назначенная калибровка: статичный шаблон, найденный не на месте, и подвижные
+        # шаблоны, которые вернутся в проверку, если сдвинулось само окно
+        self.stale = False
+        self.pending: Optional[Tuple[str, Tuple[int, int, int, int]]] = None
+        self.suspects: Dict[str, Tuple[Tuple[float, float], Tuple[int, int, int, int]]] = {}
+
+        # Статистика
+        self.calibrations = 0
+        self.checks = 0
+
+    def _load(self):
+        """Читает сохранённые места шаблонов (один раз)"""
+        if self.loaded or self.path is None:
+            return
+        self.loaded = True
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for path, (x, y) in data.get('landmarks', {}).items():
+            self.landmarks[path] = (x, y)
+        self.moving.update(data.get('moving', []))
+
+    def save(self):
+        """Записывает места шаблонов, если они изменились"""
+        with self.lock:
+            if self.path is None or not self.dirty:
+                return
+            self.dirty = False
+            data = {
+                'landmarks': {path: [x, y] for path, (x, y) in self.landmarks.items()},
+                'moving': sorted(self.moving),
+            }
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить калибровку окна игры: {e}")
+
+    def _landmark_transform(self, path: str, hit: Tuple[int, int, int, int]) -> Optional[GameTransform]:
+        """Преобразование, при котором статичный шаблон оказывается там, где его нашли"""
+        template = template_matcher.templates.get(path)
+        if path not in self.static or template is None or path not in self.landmarks:
+            return None
+        x, y, width, _ = hit
+        scale = width / template.width
+        landmark_x, landmark_y = self.landmarks[path]
+        return GameTransform(scale, x - landmark_x * scale, y - landmark_y * scale,
+                             f"ориентир {os.path.basename(path)}")
+
+    def _calibrate(self, path: Optional[str] = None,
+                   hit: Optional[Tuple[int, int, int, int]] = None) -> GameTransform:
+        """Строит преобразование заново (вызывается под блокировкой). hit - найденный
+        статичный шаблон path, по нему калибруемся, если окна не видно"""
+        self._load()
+        self.calibrating = True
+        try:
+            transform = None
+            # С поддельным экраном (повтор записи, замеры) настоящее окно игры не ищем
+            desktop = backend_module.get_screen_source().desktop
+            window = find_game_window() if desktop else None
+            if window is not None:
+                transform = fit_window(*window, source='окно игры')
+            else:
+                if not hit or path not in self.static:
+                    # Окна не видно - ищем якорь на экране (только при калибровке)
+                    path, hit = self.anchor, None
+                    if path in self.landmarks and template_matcher.load(path):
+                        try:
+                            hit = template_matcher.find(path)
+                        except Exception as e:
+                            print(f"Не удалось найти якорь {path}: {e}")
+                if hit:
+                    transform = self._landmark_transform(path, hit)
+            if transform is None:
+                width, height = screen_capture.screen_size()
+                transform = fit_window(0, 0, width, height, source='монитор')
+        finally:
+            self.calibrating = False
+
+        self.transform = transform
+        self.calibrations += 1
+        print(f"🪟 Окно игры: {transform.describe()}")
+        return transform
+
+    def _recalibrate(self):
+        """Выполняет назначенную калибровку (вызывается под блокировкой)"""
+        pending, self.pending = self.pending, None
+        suspects, self.suspects = self.suspects, {}
+        self.stale = False
+        previous = self.transform
+        transform = self._calibrate(*(pending or ()))
+
+        if pending is not None:
+            path, hit = pending
+            if not self._in_place(path, hit):
+                # Окно на месте, а статичный шаблон - нет: калиброваться по нему нельзя
+                print(f"🪟 {os.path.basename(path)} двигается внутри игры - калибровку по нему не проверяем")
+                self._forget(path)
+        if previous is not None and abs(transform.scale - previous.scale) > 1e-3:
+            # Окно игры изменило размер - запомненный масштаб шаблонов больше не подходит
+            template_matcher.reset_scale()
+        if previous is not None and transform.describe() != previous.describe():
+            # Сдвинулось окно, а не шаблоны - возвращаем их в проверку
+            for path, (position, hit) in suspects.items():
+                self.landmarks[path] = position
+                if self._in_place(path, hit):
+                    self.moving.discard(path)
+                    self.dirty = True
+                else:
+                    del self.landmarks[path]
+        self.save()
+
+    def get(self) -> GameTransform:
+        """Текущее преобразование (калибруется при первом обращении и после того, как
+        шаблон нашёлся не на своём месте)"""
+        with self.lock:
+            if self.transform is None or self.stale:
+                self._recalibrate()
+            return self.transform
+
+    def calibrate(self) -> GameTransform:
+        """Калибрует заново (например, после смены разрешения)"""
+        with self.lock:
+            self.stale = True
+            self._recalibrate()
+            return self.transform
+
+    def _in_place(self, path: str, hit: Tuple[int, int, int, int]) -> bool:
+        x, y, width, _ = hit
+        expected_x, expected_y = self.transform.point(*self.landmarks[path])
+        if abs(x - expected_x) > ANCHOR_TOLERANCE or abs(y - expected_y) > ANCHOR_TOLERANCE:
+            return False
+        template = template_matcher.templates.get(path)
+        if template is None:
+            return True
+        return abs(width / template.width / self.transform.scale - 1) <= ANCHOR_SCALE_TOLERANCE
+
+    def _forget(self, path: str):
+        """Переводит шаблон в подвижные"""
+        self.landmarks.pop(path, None)
+        self.moving.add(path)
+        self.dirty = True
+
+    def observe(self, path: str, hit: Optional[Tuple[int, ...]]) -> bool:
+        """Сообщает о найденном на экране шаблоне (x, y, w, h) - вызывается для каждого
+        попадания любого бота в потоке поиска. Если шаблон не там, где его ждут,
+        назначает калибровку заново. Возвращает True, если калибровка назначена"""
+        if not hit or self.calibrating or self.transform is None or path in self.moving:
+            return False
+        hit = tuple(hit[:4])
+        with self.lock:
+            # Свой же поиск якоря при калибровке не проверяем
+            if self.calibrating or path in self.moving:
+                return False
+            self._load()
+            self.checks += 1
+
+            if path not in self.landmarks:
+                # Первое попадание - запоминаем, где шаблон в координатах игры
+                self.landmarks[path] = self.transform.to_game(*hit[:2])
+                self.dirty = True
+                return False
+            if self._in_place(path, hit):
+                return False
+
+            name = os.path.basename(path)
+            if path in self.static:
+                print(f"🪟 {name} не на своём месте - калибруем окно игры заново")
+                self.pending = (path, hit)
+            else:
+                # Подвижный шаблон сразу выходит из проверки, а окно ищется заново
+                print(f"🪟 {name} не на своём месте - проверяем окно игры, а {name} считаем подвижным")
+                self.suspects[path] = (self.landmarks[path], hit)
+                self._forget(path)
+            self.stale = True
+            return True
+
+    def get_stats(self):
+        """Число калибровок, проверок и шаблонов"""
+        with self.lock:
+            return {'calibrations': self.calibrations, 'checks': self.checks,
+                    'landmarks': len(self.landmarks), 'moving': len(self.moving),
+                    'transform': self.transform.describe() if self.transform else None}
+
+    def summary(self) -> str:
+        """Строка для /stats"""
+        stats = self.get_stats()
+        return (f"🪟 Окно игры: {stats['transform'] or 'не калибровалось'}, калибровок "
+                f"{stats['calibrations']}, проверок {stats['checks']}, шаблонов на месте "
+                f"{stats['landmarks']}, подвижных {stats['moving']}")
+
+# Глобальное окно игры
+game_window = GameWindow()
+
+def game_point(x: float, y: float) -> Tuple[int, int]:
+    """Точка игры на экране"""
+    return game_window.get().point(x, y)
+
+def game_region(x: float, y: float, width: float, height: float) -> Region:
+    """Область игры (left, top, width, height) на экране"""
+    return game_window.get().region(x, y, width, height)
+
+def game_rect(x1: float, y1: float, x2: float, y2: float) -> Tuple[int, int, int, int]:
+    """Прямоугольник игры (x1, y1, x2, y2) на экране"""
+    return game_window.get().rect(x1, y1, x2, y2)
+
+def observe(path: str, hit) -> bool:
+    """Сообщает о попадании шаблона (для проверки калибровки)"""
+    return game_window.observe(path, hit)
+
+def get_summary() -> str:
+    """Возвращает сводку калибровки окна для /stats"""
+    return game_window.summary()
+
+def save_calibration():
+    """Записывает места шаблонов (при выключении бота)"""
+    game_window.save()
+
+# Каждое попадание шаблона любого бота проверяет калибровку
+template_matcher.add_hit_listener(game_window.observe)